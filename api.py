@@ -0,0 +1,174 @@
+# api.py
+
+"""
+Headless HTTP service for semantic search and RAG answers.
+
+Endpoints:
+- POST /search:  top-N chunks of a query (same options as `search_top_k`;
+                 `"variable_k": true` returns every chunk passing the calibrated
+                 score cutoff instead, with their count in "total")
+- POST /ask:     retrieval plus an LLM answer (`"stream": true` streams the
+                 answer as plain text; the chunk IDs are sent in X-Chunk-Ids).
+                 Pure lookups are answered from the metadata without the LLM
+                 (`"routed": true`, see `utils.query_router`)
+- GET  /health:  index size and micro-batching statistics
+- GET  /metrics: Prometheus metrics of the traced stages (see `utils.tracing`)
+
+Handlers are async. Concurrent retrievals with the same options are grouped
+by `utils.micro_batcher` for up to API_MAX_WAIT_MS (at most API_MAX_BATCH_SIZE
+queries) and sent through one `search_many` call: one batched embedding
+request for the uncached queries and one FAISS batch search. Every request
+then receives its own rows. LLM answers (streamed or not) are awaited on the
+pooled async Azure OpenAI client (`utils.azure_openai_client`), so waiting on
+the model holds no worker thread.
+
+Usage:
+    uvicorn api:app --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Literal
+
+import pandas as pd
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from openai import OpenAIError
+from pydantic import BaseModel, Field
+
+from utils.answer_generator import agenerate_answer, agenerate_cached_answer, build_prompt, stream_answer
+from utils.artifacts import lookup_rows
+from utils.azure_openai_client import aclose_async_client
+from utils.config import API_BATCH_CONCURRENCY, API_MAX_BATCH_SIZE, API_MAX_WAIT_MS, WARM_UP_ON_START
+from utils.micro_batcher import MicroBatcher
+from utils.query_router import route_query
+from utils.resources import resources
+from utils.search_engine import hits_to_frame, resolve_search_mode, score_cutoff, search_many, select_ids
+from utils.tracing import prometheus_text, trace
+
+# Metadata columns returned to clients (bookkeeping columns such as ChunkHash are left out)
+RESULT_COLUMNS = ["People", "Families", "Locations", "Events", "TextChunk", "Score"]
+
+
+class SearchRequest(BaseModel):
+    """Body of /search."""
+    query: str = Field(min_length=1)
+    k: int = Field(10, ge=1, le=1000)
+    rerank_top_n: int = Field(5, ge=1, le=1000)
+    filters: dict[str, str | list[str]] | None = None
+    mode: Literal["hybrid", "vector", "lexical"] | None = None
+    variable_k: bool = False
+
+
+class AskRequest(SearchRequest):
+    """Body of /ask."""
+    stream: bool = False
+
+
+def _search_batch(key: tuple, queries: list[str]) -> list[tuple[pd.DataFrame, int | None]]:
+    """Batch function of the micro-batcher: one `search_many` call for all queries of a key."""
+    k, rerank_top_n, filters, mode, cutoff = key
+    with trace("search_batch", queries=len(queries), mode=mode):
+        hits = search_many(queries, k=k, rerank_top_n=rerank_top_n, filters=json.loads(filters), mode=mode,
+                           cutoff=cutoff)
+        totals = [None] * len(queries) if hits.totals is None else hits.totals.tolist()
+        return [(hits_to_frame(hits, i), totals[i]) for i in range(len(queries))]
+
+
+batcher = MicroBatcher(_search_batch, max_batch_size=API_MAX_BATCH_SIZE,
+                       max_wait_ms=API_MAX_WAIT_MS, max_concurrency=API_BATCH_CONCURRENCY)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Loads the index, caches and clients before the first request is accepted; closes the LLM pool on exit."""
+    if WARM_UP_ON_START:
+        seconds = await asyncio.to_thread(resources.warm_up)
+        print(f"🔥 Warmed up {len(seconds)} resources in {sum(seconds.values()):.2f}s")
+    yield
+    await aclose_async_client()
+
+
+app = FastAPI(title="Smart Search", description="Semantic search and RAG answers over the people dataset.",
+              lifespan=lifespan)
+
+
+async def _retrieve(request: SearchRequest) -> tuple[pd.DataFrame, int | None]:
+    """Searches a query through the micro-batcher; returns the rows and, with variable k, their total."""
+    cutoff = None
+    if request.variable_k:
+        cutoff = score_cutoff()
+        if cutoff is None:
+            raise HTTPException(status_code=400, detail="The index has no calibrated score cutoff; rebuild it "
+                                                        "or set SEARCH_SCORE_THRESHOLD.")
+    key = (request.k, request.rerank_top_n, json.dumps(request.filters or {}, sort_keys=True),
+           resolve_search_mode(request.mode), cutoff)
+    try:
+        return await batcher.submit(key, request.query)
+    except ValueError as e:  # Unknown filter column
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _rows(results: pd.DataFrame) -> list[dict]:
+    """Converts result rows to JSON-serializable records with their chunk IDs."""
+    columns = [column for column in RESULT_COLUMNS if column in results.columns]
+    records = results[columns].to_dict(orient="records")
+    for chunk_id, record in zip(results.index.tolist(), records):
+        record["ChunkId"] = chunk_id
+    return records
+
+
+@app.post("/search")
+async def search(request: SearchRequest) -> dict:
+    """Returns the top-N chunks of a query."""
+    results, total = await _retrieve(request)
+    return {"query": request.query, "total": total, "results": _rows(results)}
+
+
+@app.post("/ask")
+async def ask(request: AskRequest):
+    """Retrieves the top-N chunks of a query and answers it with the LLM."""
+    try:
+        routed = route_query(request.query, select_ids(request.filters))
+    except ValueError as e:  # Unknown filter column
+        raise HTTPException(status_code=400, detail=str(e))
+    if routed is not None:
+        results = lookup_rows(resources.metadata, routed.ids[:request.rerank_top_n])
+        if request.stream:
+            return PlainTextResponse(routed.text, headers={"X-Chunk-Ids": ",".join(map(str, results.index.tolist()))})
+        return {"query": request.query, "answer": routed.text, "routed": True, "matches": len(routed.ids),
+                "results": _rows(results)}
+
+    results, total = await _retrieve(request)
+    chunks = results["TextChunk"].tolist()
+    prompt = await asyncio.to_thread(build_prompt, chunks, request.query)
+    # Lexical mode makes no embedding call, so it also bypasses the semantic answer cache
+    lexical = resolve_search_mode(request.mode) == "lexical"
+
+    if request.stream:
+        # Async iteration: the stream awaits the async client instead of holding a worker thread
+        return StreamingResponse(aiter(stream_answer(prompt, request.query, None if lexical else results.index)),
+                                 media_type="text/plain; charset=utf-8",
+                                 headers={"X-Chunk-Ids": ",".join(map(str, results.index.tolist()))})
+
+    with trace("answer", query=request.query):
+        try:
+            if lexical:
+                answer = await agenerate_answer(prompt)
+            else:
+                answer = await agenerate_cached_answer(prompt, request.query, results.index)
+        except OpenAIError as e:
+            raise HTTPException(status_code=502, detail=f"LLM request failed: {e}")
+    return {"query": request.query, "answer": answer, "routed": False, "total": total, "results": _rows(results)}
+
+
+@app.get("/health")
+async def health() -> dict:
+    """Reports the index size and how requests were batched so far."""
+    return {"status": "ok", "chunks": int(resources.index.ntotal), "batching": batcher.stats}
+
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    """Prometheus text metrics of this process."""
+    return PlainTextResponse(prometheus_text(), media_type="text/plain; version=0.0.4; charset=utf-8")
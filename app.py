@@ -1,9 +1,13 @@
 # app.py
 
-import time
 import streamlit as st
-from utils.search_engine import search_top_k
-from utils.answer_generator import build_prompt, generate_answer
+from utils.answer_generator import stream_answer
+from utils.config import METRICS_PORT, SEARCH_MAX_RESULTS, TRACE_DEBUG_PANEL, VARIABLE_K, WARM_UP_ON_START
+from utils.filters import FILTER_COLUMNS
+from utils.pipeline import retrieve
+from utils.resources import resources
+from utils.search_engine import SEARCH_MODES, filter_index, resolve_search_mode, score_cutoff
+from utils.tracing import prometheus_text, start_metrics_server, trace
 from utils.examples import get_example_prompts
 from utils.onboarding import show_onboarding
 from utils.theme import apply_theme_css
@@ -16,11 +20,46 @@ def load_local_css(file_paths):
             st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
 
 
+@st.cache_resource
+def start_warm_up():
+    """Loads the index, caches and clients in a background thread (once per server process)."""
+    return resources.warm_up_in_background()
+
+
 def set_example_query(example: str):
     """Set example query into the session input field."""
     st.session_state.query_input = example
 
 
+# Progress message shown while each pipeline stage is running
+STAGE_MESSAGES = {
+    "route": "🧭 Matching teams, locations, people and events...",
+    "embed": "🧠 Embedding query...",
+    "search": "🔍 Retrieving and reranking top-k chunks...",
+    "prompt": "🧩 Building prompt from context...",
+}
+
+
+def show_progress(placeholder, message: str):
+    """Render the loader with a progress message."""
+    placeholder.markdown(f"""
+        <div class="loader"></div>
+        <p style="text-align:center;">{message}</p>
+    """, unsafe_allow_html=True)
+
+
+def show_trace(trace_data: dict):
+    """Render the spans of a query trace and the process metrics."""
+    with st.expander(f"🐞 Debug: trace {trace_data['trace_id'][:8]} ({trace_data['seconds']:.2f}s)", expanded=True):
+        st.dataframe([
+            {"span": s["name"], "start (ms)": round(s["offset"] * 1000, 1),
+             "duration (ms)": round(s["seconds"] * 1000, 2),
+             **{key: str(value) for key, value in s["attributes"].items()}}
+            for s in trace_data["spans"]
+        ], use_container_width=True)
+        st.code(prometheus_text(), language="text")
+
+
 # ------------------ Page Config & Setup ------------------ #
 st.set_page_config(
     page_title="Smart Search with GenAI",
@@ -28,6 +67,10 @@ st.set_page_config(
     layout="wide"
 )
 
+# Open the index and clients while the page renders, not on the first query
+if WARM_UP_ON_START:
+    start_warm_up()
+
 # Load modularized CSS
 load_local_css([
     "styles/base.css",
@@ -41,6 +84,34 @@ theme = st.sidebar.radio("🌓 Theme", ("Light", "Dark"))
 st.session_state["theme"] = theme
 apply_theme_css(theme)
 
+# Sidebar retrieval mode (hybrid = BM25 + vectors; lexical needs no embedding call)
+default_mode = resolve_search_mode()
+search_mode = st.sidebar.radio("🔀 Retrieval mode", SEARCH_MODES, index=SEARCH_MODES.index(default_mode))
+
+# Sidebar result count: every chunk passing the calibrated score cutoff, or a fixed top 5
+cutoff = score_cutoff()
+variable_k = st.sidebar.checkbox(
+    "📏 Variable result count", value=VARIABLE_K and cutoff is not None,
+    disabled=cutoff is None or search_mode == "lexical",
+    help=f"Use every chunk passing the score cutoff calibrated at build time (at most {SEARCH_MAX_RESULTS}) "
+         "instead of the top 5. Needs similarity scores, so not in lexical mode."
+)
+cutoff = cutoff if variable_k and search_mode != "lexical" else None
+
+# Sidebar debug panel (per-stage spans of the last query)
+show_debug = st.sidebar.checkbox("🐞 Debug panel", value=TRACE_DEBUG_PANEL)
+
+# Prometheus metrics endpoint (started once per process)
+if METRICS_PORT:
+    start_metrics_server(METRICS_PORT)
+
+# Sidebar structured filters (values of one column are OR-ed, columns are AND-ed)
+st.sidebar.markdown("### 🎯 Filters")
+filters = {
+    column: st.sidebar.multiselect(column, filter_index().values(column), key=f"filter_{column}")
+    for column in FILTER_COLUMNS
+}
+
 # Inject body class for styling
 theme_class = "light-theme" if theme == "Light" else "dark-theme"
 st.markdown(f"<body class='{theme_class}'>", unsafe_allow_html=True)
@@ -52,6 +123,9 @@ show_onboarding()
 # ------------------ Session State Initialization ------------------ #
 st.session_state.setdefault("query_input", "")
 st.session_state.setdefault("last_query", "")
+st.session_state.setdefault("last_filters", {})
+st.session_state.setdefault("last_mode", None)
+st.session_state.setdefault("last_cutoff", None)
 st.session_state.setdefault("last_result", None)
 
 # ------------------ Input Area ------------------ #
@@ -75,48 +149,85 @@ for i in range(0, len(example_prompts), buttons_per_row):
 
 # ------------------ Search Execution ------------------ #
 query = st.session_state.query_input.strip()
+streamed_now = False
+
+search_changed = (query != st.session_state.last_query
+                  or filters != st.session_state.last_filters
+                  or search_mode != st.session_state.last_mode
+                  or cutoff != st.session_state.last_cutoff)
 
-if query and query != st.session_state.last_query:
+if query and search_changed:
     with st.container():
         progress_placeholder = st.empty()
 
-        # Step 1: Retrieve
-        progress_placeholder.markdown("""
-            <div class="loader"></div>
-            <p style="text-align:center;">🔍 Retrieving top-k chunks...</p>
-        """, unsafe_allow_html=True)
-        results = search_top_k(query, k=5)
-        time.sleep(0.5)
-
-        # Step 2: Rerank
-        progress_placeholder.markdown("""
-            <div class="loader"></div>
-            <p style="text-align:center;">🔁 Reranking chunks by relevance...</p>
-        """, unsafe_allow_html=True)
-        chunks = results["TextChunk"].tolist()
-        st.session_state["chunks"] = chunks
-        prompt = build_prompt(chunks, query)
-        time.sleep(0.5)
-
-        # Step 3: Answer with LLM
-        progress_placeholder.markdown("""
-            <div class="loader"></div>
-            <p style="text-align:center;">💬 Generating LLM answer...</p>
-        """, unsafe_allow_html=True)
-        answer = generate_answer(prompt)
-        progress_placeholder.empty()
+        # Steps 1-3: embed, retrieve + rerank, build prompt (progress follows real stage events)
+        def on_stage(event):
+            if event.status == "started":
+                show_progress(progress_placeholder, STAGE_MESSAGES[event.stage])
+
+        with trace("query", query=query, mode=search_mode) as query_trace:
+            retrieval = retrieve(query, k=5, on_event=on_stage, filters=filters, mode=search_mode, cutoff=cutoff)
+            chunks = retrieval.chunks
+            st.session_state["chunks"] = chunks
+
+            progress_placeholder.empty()
+            st.subheader("🤖 Answer")
+            if retrieval.answer is not None:
+                # Structured lookup: answered from the metadata, no LLM call
+                st.markdown(retrieval.answer)
+                answer_text, answer_timing = retrieval.answer, {"ttft": None, "total": 0.0, "cached": False,
+                                                                  "routed": True}
+            else:
+                # Step 4: Answer with LLM (streamed as it is generated)
+                show_progress(progress_placeholder, "💬 Generating LLM answer...")
+                # Lexical mode makes no embedding call, so it also bypasses the semantic answer cache
+                chunk_ids = None if search_mode == "lexical" else retrieval.results.index
+                stream = stream_answer(retrieval.prompt, query, chunk_ids)
+                progress_placeholder.empty()
+                st.write_stream(stream)
+                answer_text, answer_timing = stream.text, {"ttft": stream.ttft, "total": stream.total,
+                                                           "cached": stream.cached}
+            streamed_now = True
 
         # Cache for display
         st.session_state.last_query = query
+        st.session_state.last_filters = filters
+        st.session_state.last_mode = search_mode
+        st.session_state.last_cutoff = cutoff
         st.session_state.last_result = {
             "chunks": chunks,
-            "answer": answer
+            "answer": answer_text,
+            "timing": {**answer_timing, "stages": retrieval.timings},
+            "retrieved": {"used": len(chunks), "total": retrieval.total},
+            "trace": query_trace.to_dict()
         }
 
 # ------------------ Display Answer ------------------ #
 if st.session_state.last_result:
-    st.subheader("🤖 Answer")
-    st.markdown(st.session_state.last_result["answer"])
+    # A freshly streamed answer is already on the page
+    if not streamed_now:
+        st.subheader("🤖 Answer")
+        st.markdown(st.session_state.last_result["answer"])
+
+    timing = st.session_state.last_result.get("timing")
+    if timing and timing["total"] is not None:
+        stages = " · ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timing["stages"].items())
+        if timing.get("routed"):
+            st.caption(f"⏱️ {stages} · answered from the metadata (no LLM call)")
+        else:
+            source = "cached answer" if timing["cached"] else f"first token {timing['ttft'] or 0:.2f}s"
+            st.caption(f"⏱️ {stages} · {source} · generation {timing['total']:.2f}s")
+
+    retrieved = st.session_state.last_result.get("retrieved")
+    if retrieved and retrieved["total"] is not None:
+        if retrieved["total"] > retrieved["used"]:
+            st.warning(f"📏 {retrieved['total']} chunks passed the score cutoff; only the best "
+                       f"{retrieved['used']} were used (SEARCH_MAX_RESULTS).")
+        else:
+            st.caption(f"📏 {retrieved['used']} chunks passed the score cutoff")
+
+    if show_debug and st.session_state.last_result.get("trace"):
+        show_trace(st.session_state.last_result["trace"])
 
     if "chunks" in st.session_state:
         chunks = st.session_state["chunks"]
@@ -0,0 +1,132 @@
+# scripts/benchmark_client.py
+
+"""
+Measures connection reuse of the Azure OpenAI client layer.
+
+Three ways of sending the same embedding requests are compared:
+- fresh:   a new `AzureOpenAI` client per request (a new connection, and a new
+           TCP/TLS handshake, every time)
+- default: one client on the SDK's default transport (keep-alive connections
+           expire after 5 idle seconds; up to 1000 connections)
+- pooled:  the shared client of `utils.azure_openai_client` (tuned keep-alive,
+           capped pool, HTTP/2 when available)
+plus the async client of the same module for the concurrent burst.
+
+Each variant sends --requests sequential requests (with --idle seconds between
+them, as an interactive session would) and a burst of --burst requests from
+--concurrency threads. Reported: mean / p95 latency and the number of
+connections the server accepted. Connections are counted by the local stub
+endpoint (`GET /stub/stats`), so run it against `scripts/stub_embedding_server.py`,
+ideally with `--connect-delay` set to a realistic handshake time.
+
+Usage:
+    python -m scripts.stub_embedding_server --port 8089 --connect-delay 0.05
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8089 AZURE_OPENAI_API_KEY=stub \\
+        python -m scripts.benchmark_client [--requests 20] [--idle 6] [--burst 200] [--concurrency 64]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.azure_openai_client import aclose_async_client, get_async_client, get_client
+from utils.config import (
+    AZURE_OPENAI_API_KEY,
+    AZURE_OPENAI_API_VERSION,
+    AZURE_OPENAI_ENDPOINT,
+    DEPLOYMENT_EMBEDDING,
+    require_azure_config
+)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line options for the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark connection reuse of the Azure OpenAI clients.")
+    parser.add_argument("--requests", type=int, default=20, help="Sequential requests per variant")
+    parser.add_argument("--idle", type=float, default=0.0, help="Seconds between sequential requests")
+    parser.add_argument("--burst", type=int, default=200, help="Concurrent requests per variant")
+    parser.add_argument("--concurrency", type=int, default=64, help="Threads sending the burst")
+    return parser.parse_args()
+
+
+def server_connections() -> int:
+    """Connections accepted so far by the stub endpoint."""
+    with urllib.request.urlopen(f"{AZURE_OPENAI_ENDPOINT.rstrip('/')}/stub/stats") as response:
+        return json.load(response)["connections"]
+
+
+def fresh_client():
+    """A new client on the SDK's default transport."""
+    require_azure_config()
+    from openai import AzureOpenAI
+
+    return AzureOpenAI(api_key=AZURE_OPENAI_API_KEY, api_version=AZURE_OPENAI_API_VERSION,
+                       azure_endpoint=AZURE_OPENAI_ENDPOINT)
+
+
+def embed(client, i: int) -> float:
+    """Sends one embedding request; returns its latency in seconds."""
+    start = time.perf_counter()
+    client.embeddings.create(model=DEPLOYMENT_EMBEDDING, input=[f"benchmark request {i}"])
+    return time.perf_counter() - start
+
+
+def report(name: str, latencies: list[float], connections: int):
+    """Prints one result row."""
+    latencies = np.array(latencies) * 1000
+    print(f"{name:<22} requests {len(latencies):5d}  mean {latencies.mean():7.2f} ms  "
+          f"p95 {np.percentile(latencies, 95):7.2f} ms  connections {connections:5d}")
+
+
+def run_sync(name: str, make_client, args):
+    """Sequential requests and a threaded burst through clients from `make_client(i)`."""
+    before = server_connections()
+    latencies = []
+    for i in range(args.requests):
+        if i and args.idle:
+            time.sleep(args.idle)
+        latencies.append(embed(make_client(i), i))
+    report(f"{name} sequential", latencies, server_connections() - before)
+
+    before = server_connections()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        latencies = list(executor.map(lambda i: embed(make_client(i), i), range(args.burst)))
+    report(f"{name} burst", latencies, server_connections() - before)
+
+
+async def run_async_burst(args):
+    """The burst as concurrent coroutines on the async client."""
+    client = get_async_client()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await client.embeddings.create(model=DEPLOYMENT_EMBEDDING, input=[f"benchmark request {i}"])
+            return time.perf_counter() - start
+
+    before = server_connections()
+    latencies = await asyncio.gather(*[one(i) for i in range(args.burst)])
+    report("async burst", latencies, server_connections() - before)
+    await aclose_async_client()
+
+
+def main():
+    args = parse_args()
+    default = fresh_client()
+    pooled = get_client()
+    embed(pooled, -1)  # Creating the client and importing the SDK are not measured
+
+    run_sync("fresh", lambda i: fresh_client(), args)
+    run_sync("default", lambda i: default, args)
+    run_sync("pooled", lambda i: pooled, args)
+    asyncio.run(run_async_burst(args))
+
+
+if __name__ == "__main__":
+    main()
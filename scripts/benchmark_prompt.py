@@ -0,0 +1,101 @@
+# scripts/benchmark_prompt.py
+
+"""
+Measures prompt tokens and context recall of prompt packing.
+
+For a set of labeled queries (see `utils.evaluation`), the top-N chunks are
+retrieved once per N and turned into prompts twice: with the plain
+newline-joined context, and with `utils.prompt_packer` (deduplication,
+compact team/location blocks, token budget). Reported per N:
+- mean / p95 prompt tokens of both variants and the relative saving
+- context recall: share of the relevant retrieved chunks whose facts (person
+  and event) are still present in the packed context
+- retrieval recall: share of all relevant chunks that were retrieved
+
+With --variable-k, a row for variable-k retrieval (every chunk passing the
+calibrated score cutoff, see `utils.search_engine.score_cutoff`) is added,
+with its mean number of chunks per prompt.
+
+Usage:
+    python -m scripts.benchmark_prompt [--queries 100] [--top-n 5 10 20 50]
+                                       [--budget 3000] [--mode hybrid] [--variable-k]
+"""
+
+import argparse
+
+import numpy as np
+
+from utils.answer_generator import prompt_template
+from utils.config import PROMPT_TOKEN_BUDGET
+from utils.evaluation import labeled_queries
+from utils.prompt_packer import CHUNK_PATTERN, count_tokens, pack_context
+from utils.search_engine import SEARCH_MODES, hybrid_search, metadata, score_cutoff
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line options for the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark prompt packing.")
+    parser.add_argument("--queries", type=int, default=100, help="Number of labeled queries")
+    parser.add_argument("--top-n", type=int, nargs="+", default=[5, 10, 20, 50], help="Chunks per prompt")
+    parser.add_argument("--budget", type=int, default=PROMPT_TOKEN_BUDGET,
+                        help="Prompt token budget (0 disables the limit)")
+    parser.add_argument("--mode", choices=SEARCH_MODES, default="hybrid", help="Search mode")
+    parser.add_argument("--variable-k", action="store_true",
+                        help="Also measure variable-k retrieval with the calibrated score cutoff")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def facts_present(chunk: str, context: str) -> bool:
+    """True if the person and event of a chunk (or the whole chunk) appear in the context."""
+    match = CHUNK_PATTERN.match(chunk.strip())
+    if match is None:
+        return chunk in context
+    return match["People"] in context and match["Events"] in context
+
+
+def main():
+    args = parse_args()
+    labeled = labeled_queries(metadata.to_pandas(), n=args.queries, seed=args.seed)
+    queries = [item.query for item in labeled]
+    texts = metadata.column("TextChunk")
+    print(f"📋 {len(labeled)} labeled queries, mode {args.mode}, budget {args.budget or 'none'} tokens")
+
+    runs = [(f"top-{top_n}", hybrid_search(queries, k=max(top_n, 10), rerank_top_n=top_n, mode=args.mode))
+            for top_n in args.top_n]
+    if args.variable_k:
+        cutoff = score_cutoff()
+        if cutoff is None:
+            print("⚠️ The index has no calibrated score cutoff; rebuild it to measure variable-k retrieval.")
+        else:
+            runs.append(("variable-k", hybrid_search(queries, mode=args.mode, cutoff=cutoff)))
+
+    for name, hits in runs:
+        plain_tokens, packed_tokens, retrieved, kept, relevant_total, relevant_all = [], [], [], 0, 0, 0
+        for i, item in enumerate(labeled):
+            ids = hits.ids[i][hits.ids[i] >= 0]
+            retrieved.append(len(ids))
+            chunks = texts.take(ids).to_pylist()
+            plain_tokens.append(count_tokens(prompt_template.format(context="\n".join(chunks), query=item.query)))
+
+            overhead = count_tokens(prompt_template.format(context="", query=item.query))
+            budget = max(args.budget - overhead, 0) if args.budget else None
+            packed = pack_context(chunks, budget)
+            packed_tokens.append(overhead + packed.tokens)
+
+            relevant = set(item.relevant.tolist())
+            relevant_all += len(relevant)
+            for chunk_id, chunk in zip(ids.tolist(), chunks):
+                if chunk_id in relevant:
+                    relevant_total += 1
+                    kept += facts_present(chunk, packed.text)
+
+        plain, packed = np.asarray(plain_tokens), np.asarray(packed_tokens)
+        recall = kept / relevant_total if relevant_total else 1.0
+        print(f"{name:<10} chunks {np.mean(retrieved):5.1f}  plain mean {plain.mean():7.1f} "
+              f"p95 {np.percentile(plain, 95):7.1f}  packed mean {packed.mean():7.1f} "
+              f"p95 {np.percentile(packed, 95):7.1f}  saved {1 - packed.sum() / plain.sum():6.1%}  "
+              f"context recall {recall:.3f}  retrieval recall {relevant_total / max(relevant_all, 1):.3f}")
+
+if __name__ == "__main__":
+    main()
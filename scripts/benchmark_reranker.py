@@ -0,0 +1,104 @@
+# scripts/benchmark_reranker.py
+
+"""
+Compares second-stage rerankers against the current cosine ordering.
+
+For a set of labeled queries generated from the metadata columns (see
+`utils.evaluation`), the script retrieves first-stage candidates once per
+candidate budget and then reports, for each reranker:
+- recall@N and MRR@N of the final top-N
+- latency per query (mean / p50 / p95 / p99): the first-stage search for the
+  baseline row, and only the rerank stage for reranker rows
+
+Query embeddings are computed up front, so embedding calls are not part of
+any timing. Reranker caches are disabled to measure cold scoring cost.
+
+Usage:
+    python -m scripts.benchmark_reranker [--queries 100] [--top-n 5]
+                                         [--candidates 10 20 50]
+                                         [--rerankers overlap cross-encoder]
+                                         [--mode vector]
+"""
+
+import argparse
+import time
+
+from utils.evaluation import labeled_queries, latency_summary, reciprocal_rank, recall_at_k
+from utils.reranker import RERANKERS, create_reranker
+from utils.search_engine import SEARCH_MODES, SearchResults, first_stage_search, metadata, rerank_hits
+from utils.embedder import get_query_embeddings
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line options for the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark second-stage rerankers.")
+    parser.add_argument("--queries", type=int, default=100, help="Number of labeled queries")
+    parser.add_argument("--top-n", type=int, default=5, help="Results kept per query")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 20, 50],
+                        help="First-stage candidate budgets to rerank")
+    parser.add_argument("--rerankers", nargs="+", default=["overlap", "cross-encoder"],
+                        choices=[name for name in RERANKERS if name != "none"])
+    parser.add_argument("--mode", choices=SEARCH_MODES, default="vector", help="First-stage search mode")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def evaluate(hits, labeled, top_n: int) -> dict:
+    """Computes mean recall@N and MRR@N of search results against the labels."""
+    recalls, ranks = [], []
+    for i, item in enumerate(labeled):
+        retrieved = hits.ids[i][hits.ids[i] >= 0][:top_n]
+        recalls.append(recall_at_k(retrieved, item.relevant, top_n))
+        ranks.append(reciprocal_rank(retrieved, item.relevant))
+    return {"recall": sum(recalls) / len(recalls), "mrr": sum(ranks) / len(ranks)}
+
+
+def report(name: str, metrics: dict, latency: dict, top_n: int):
+    """Prints one result row."""
+    print(f"{name:<32} recall@{top_n} {metrics['recall']:.3f}  MRR@{top_n} {metrics['mrr']:.3f}  "
+          f"mean {latency['mean_ms']:7.2f} ms  p50 {latency['p50_ms']:7.2f}  "
+          f"p95 {latency['p95_ms']:7.2f}  p99 {latency['p99_ms']:7.2f}")
+
+
+def main():
+    args = parse_args()
+    labeled = labeled_queries(metadata.to_pandas(), n=args.queries, seed=args.seed)
+    queries = [item.query for item in labeled]
+    embeddings = get_query_embeddings(queries) if args.mode != "lexical" else None
+    print(f"📋 {len(labeled)} labeled queries, first stage: {args.mode}")
+
+    # Baseline: current ordering (cosine similarity, or RRF in hybrid mode), no second stage
+    timings = []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        first_stage_search([query], k=max(args.candidates), rerank_top_n=args.top_n, mode=args.mode,
+                           query_embeddings=None if embeddings is None else embeddings[i:i + 1])
+        timings.append(time.perf_counter() - start)
+    baseline = first_stage_search(queries, k=max(args.candidates), rerank_top_n=args.top_n,
+                                  mode=args.mode, query_embeddings=embeddings)
+    report("first stage only (current)", evaluate(baseline, labeled, args.top_n), latency_summary(timings), args.top_n)
+
+    rerankers = {}
+    for name in args.rerankers:
+        try:
+            rerankers[name] = create_reranker(name, cache_size=0)
+        except ImportError as e:
+            print(f"⚠️ Skipping {name}: {e}")
+
+    for budget in args.candidates:
+        candidates = first_stage_search(queries, k=budget, rerank_top_n=budget, mode=args.mode,
+                                        query_embeddings=embeddings)
+        for name, reranker in rerankers.items():
+            timings = []
+            for i, query in enumerate(queries):
+                row = SearchResults(ids=candidates.ids[i:i + 1], scores=candidates.scores[i:i + 1])
+                start = time.perf_counter()
+                rerank_hits([query], row, reranker, args.top_n)
+                timings.append(time.perf_counter() - start)
+            hits = rerank_hits(queries, candidates, reranker, args.top_n)
+            report(f"{name} over {budget} candidates", evaluate(hits, labeled, args.top_n),
+                   latency_summary(timings), args.top_n)
+
+
+if __name__ == "__main__":
+    main()
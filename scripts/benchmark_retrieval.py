@@ -0,0 +1,311 @@
+# scripts/benchmark_retrieval.py
+
+"""
+Retrieval benchmark and regression check.
+
+The script builds (or reuses) a complete set of search artifacts for a corpus -
+FAISS index, manifest, Arrow metadata and BM25 index - embedded with the
+offline hashing backend, so no embedding endpoint is needed and every run is
+reproducible. The corpus is either an existing dataset file or a synthetic one
+of `--rows` rows (see `scripts/generate_people_data.py`), which makes the same
+benchmark runnable at 10k, 100k and 1M chunks.
+
+Labeled queries are generated from the structured columns (see
+`utils.evaluation`) and sent through the real retrieval stack
+(`utils.search_engine.search_top_k`, including query embedding and metadata
+lookup) for each search mode. Reported per mode:
+- recall@k and MRR@k
+- latency per query (mean / p50 / p95 / p99) and sequential QPS
+- QPS of batched search (`search_many`)
+- peak RSS of the search process, and the size of the index file
+
+With `--reduce-dim`, the vectors are projected to a lower dimension before
+indexing (see `utils.projection`), so a reduced build can be compared with a
+full-dimension one at the same `--dimension`.
+
+The build and the labeling run in a child process, so the reported peak RSS
+is that of serving searches only. With `--baseline`, results are compared to
+a previous `--output` file and the script exits with status 1 on a recall drop
+or a p95 latency increase beyond the tolerances.
+
+Usage:
+    python -m scripts.benchmark_retrieval [--rows 100000 | --corpus data/synthetic/people_data_100000.parquet]
+                                          [--index-type auto] [--dimension 128]
+                                          [--reduce-dim 32] [--reduction pca]
+                                          [--modes vector lexical hybrid] [--queries 200] [--k 5]
+                                          [--output results.json] [--baseline results.json]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.index_factory import INDEX_TYPES
+from utils.projection import REDUCTIONS
+
+# Same as utils.search_engine.SEARCH_MODES, which can only be imported after configure_search
+SEARCH_MODES = ("hybrid", "vector", "lexical")
+LABEL_COLUMNS = ["People", "Families", "Locations", "Events"]
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line options for the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality, latency and memory.")
+    corpus = parser.add_mutually_exclusive_group(required=True)
+    corpus.add_argument("--corpus", help="Dataset file (.xlsx, .csv or .parquet) with a TextChunk column")
+    corpus.add_argument("--rows", type=int, help="Generate a synthetic corpus of this many rows")
+    parser.add_argument("--workdir", help="Artifact directory "
+                                          "(default: embeddings/benchmark/<corpus>-<index>-<dim>[-<reduction>])")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the artifacts even if they exist")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="auto", help="FAISS index type")
+    parser.add_argument("--dimension", type=int, default=128, help="Hashing embedding dimension")
+    parser.add_argument("--reduce-dim", type=int, default=0,
+                        help="Project the vectors to this dimension before indexing (0 keeps --dimension)")
+    parser.add_argument("--reduction", choices=REDUCTIONS, default="pca", help="Dimension reduction method")
+    parser.add_argument("--modes", nargs="+", choices=SEARCH_MODES, default=["vector", "lexical", "hybrid"])
+    parser.add_argument("--queries", type=int, default=200, help="Number of labeled queries")
+    parser.add_argument("--k", type=int, default=5, help="Results kept per query (recall@k, MRR@k)")
+    parser.add_argument("--candidates", type=int, default=10, help="First-stage candidates per query")
+    parser.add_argument("--batch-size", type=int, default=32, help="Queries per call when measuring batched QPS")
+    parser.add_argument("--warm-up", type=int, default=10, help="Untimed queries before each mode")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a previous --output file")
+    parser.add_argument("--max-recall-drop", type=float, default=0.01,
+                        help="Allowed absolute drop of recall@k against the baseline")
+    parser.add_argument("--max-latency-increase", type=float, default=0.5,
+                        help="Allowed relative increase of p95 latency against the baseline")
+    return parser.parse_args()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the current process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10  # bytes on macOS, KiB on Linux
+
+
+def artifact_paths(workdir: str) -> dict[str, str]:
+    """Locations of the benchmark artifacts inside a work directory."""
+    return {
+        "index": os.path.join(workdir, "faiss.index"),
+        "metadata_arrow": os.path.join(workdir, "metadata.arrow"),
+        "metadata_csv": os.path.join(workdir, "metadata.csv"),
+        "embeddings": os.path.join(workdir, "chunk_embeddings.npy"),
+    }
+
+
+def build_artifacts(workdir: str, corpus: str | None, rows: int | None, index_type: str,
+                    dimension: int, seed: int, reduce_dim: int = 0, reduction: str = "pca") -> dict:
+    """
+    Embeds a corpus with the hashing backend and writes all search artifacts.
+
+    Runs in a child process; see `main`.
+
+    Returns:
+        dict: Build statistics (rows, seconds, index type, peak RSS).
+    """
+    import faiss
+    import numpy as np
+
+    from scripts.generate_people_data import generate_people, load_vocabulary
+    from utils.artifacts import write_index, write_metadata
+    from utils.embedding_backends import HashingBackend
+    from utils.index_factory import build_index, normalize, recall_at_k
+    from utils.index_manifest import write_manifest
+    from utils.ingest import read_dataset
+    from utils.lexical_index import LexicalIndex, lexical_index_path
+    from utils.projection import fit_projection, neighbor_recall, projection_path
+    from utils.vector_store import chunk_hash
+
+    start = time.perf_counter()
+    paths = artifact_paths(workdir)
+    os.makedirs(workdir, exist_ok=True)
+
+    df = read_dataset(corpus) if corpus else generate_people(rows, load_vocabulary(), seed=seed)
+    df = df.dropna(subset=["TextChunk"]).reset_index(drop=True)
+    df["ChunkHash"] = [chunk_hash(text) for text in df["TextChunk"]]
+    df["Deleted"] = False
+
+    backend = HashingBackend(dimension)
+    vectors = normalize(backend.embed(df["TextChunk"].tolist()))
+    embedding = backend.describe(dimension)
+    projection = None
+    if reduce_dim:
+        projection = fit_projection(vectors, reduction, reduce_dim, seed=seed)
+        full, vectors = vectors, projection.apply(vectors)
+        embedding["reduction"] = {**projection.describe(), "recall_at_10": round(neighbor_recall(full, vectors), 4)}
+        del full
+    ids = np.arange(len(df), dtype="int64")
+    metric = faiss.METRIC_INNER_PRODUCT
+    index, manifest = build_index(vectors, ids, index_type=index_type, metric=metric)
+    manifest.update(metric="ip", normalized=True, dimension=int(vectors.shape[1]), embedding=embedding,
+                    embeddings_dtype="none", ntotal=int(index.ntotal))
+    if manifest["index_type"] != "flat":
+        manifest["recall_at_10"] = recall_at_k(index, vectors, ids, k=10, metric=metric)
+
+    if projection is not None:
+        projection.save(projection_path(paths["index"]))
+    write_index(index, paths["index"])
+    write_manifest(paths["index"], manifest)
+    write_metadata(df, paths["metadata_arrow"])
+    LexicalIndex.build(df["TextChunk"], ids).save(lexical_index_path(paths["index"]))
+    return {"rows": len(df), "seconds": time.perf_counter() - start, "index_type": manifest["index_type"],
+            "factory": manifest.get("factory"), "ann_recall_at_10": manifest.get("recall_at_10"),
+            "reduction": embedding.get("reduction"), "peak_rss_mb": peak_rss_mb()}
+
+
+def make_labels(workdir: str, n: int, seed: int) -> list:
+    """Generates labeled queries from the structured columns of the built metadata (child process)."""
+    from utils.artifacts import load_metadata
+    from utils.evaluation import labeled_queries
+
+    metadata = load_metadata(artifact_paths(workdir)["metadata_arrow"])
+    columns = [c for c in LABEL_COLUMNS + ["Deleted"] if c in metadata.column_names]
+    return labeled_queries(metadata.select(columns).to_pandas(), n=n, seed=seed)
+
+
+def configure_search(workdir: str, dimension: int):
+    """Points the search configuration at the benchmark artifacts; must run before importing it."""
+    paths = artifact_paths(workdir)
+    os.environ.update({
+        "OUTPUT_INDEX": paths["index"],
+        "OUTPUT_METADATA": paths["metadata_csv"],
+        "METADATA_ARROW_PATH": paths["metadata_arrow"],
+        "CHUNK_EMBEDDINGS_PATH": paths["embeddings"],
+        "EMBEDDING_BACKEND": "hashing",
+        "EMBEDDING_DIMENSION": str(dimension),
+        # Every query is embedded for real: no cache tiers
+        "QUERY_CACHE_PATH": "",
+        "QUERY_CACHE_MEMORY_SIZE": "0",
+        "ANSWER_CACHE_PATH": "",
+    })
+    # The configuration requires Azure settings even though the hashing backend never calls Azure
+    for name in ("AZURE_OPENAI_API_KEY", "AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_API_VERSION",
+                 "AZURE_OPENAI_DEPLOYMENT", "AZURE_OPENAI_COMPLETION_DEPLOYMENT"):
+        os.environ.setdefault(name, "unused")
+
+
+def benchmark_mode(mode: str, labeled: list, args) -> dict:
+    """Runs the labeled queries through one search mode and collects metrics."""
+    from utils.evaluation import latency_summary, reciprocal_rank, recall_at_k
+    from utils.search_engine import search_many, search_top_k
+
+    queries = [item.query for item in labeled]
+    for query in queries[:args.warm_up]:
+        search_top_k(query, k=args.candidates, rerank_top_n=args.k, mode=mode)
+
+    timings, recalls, ranks = [], [], []
+    for item in labeled:
+        start = time.perf_counter()
+        results = search_top_k(item.query, k=args.candidates, rerank_top_n=args.k, mode=mode)
+        timings.append(time.perf_counter() - start)
+        retrieved = results.index.to_numpy()
+        recalls.append(recall_at_k(retrieved, item.relevant, args.k))
+        ranks.append(reciprocal_rank(retrieved, item.relevant))
+
+    start = time.perf_counter()
+    for i in range(0, len(queries), args.batch_size):
+        search_many(queries[i:i + args.batch_size], k=args.candidates, rerank_top_n=args.k, mode=mode)
+    batched_seconds = time.perf_counter() - start
+
+    return {
+        "recall": sum(recalls) / len(recalls),
+        "mrr": sum(ranks) / len(ranks),
+        **latency_summary(timings),
+        "qps": len(timings) / sum(timings),
+        "batched_qps": len(queries) / batched_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def report(mode: str, result: dict, k: int):
+    """Prints one result row."""
+    print(f"{mode:<8} recall@{k} {result['recall']:.3f}  MRR@{k} {result['mrr']:.3f}  "
+          f"p50 {result['p50_ms']:7.2f} ms  p95 {result['p95_ms']:7.2f}  p99 {result['p99_ms']:7.2f}  "
+          f"QPS {result['qps']:8.1f}  batched {result['batched_qps']:8.1f}  "
+          f"peak RSS {result['peak_rss_mb']:7.1f} MiB")
+
+
+def compare(results: dict, baseline: dict, args) -> list[str]:
+    """Lists the regressions of `results` against `baseline`."""
+    regressions = []
+    for mode, result in results["modes"].items():
+        before = baseline.get("modes", {}).get(mode)
+        if before is None:
+            continue
+        if result["recall"] < before["recall"] - args.max_recall_drop:
+            regressions.append(f"{mode}: recall@{args.k} {before['recall']:.3f} -> {result['recall']:.3f}")
+        if result["p95_ms"] > before["p95_ms"] * (1 + args.max_latency_increase):
+            regressions.append(f"{mode}: p95 {before['p95_ms']:.2f} ms -> {result['p95_ms']:.2f} ms")
+    return regressions
+
+
+def main():
+    args = parse_args()
+    name = os.path.splitext(os.path.basename(args.corpus))[0] if args.corpus else f"synthetic_{args.rows}"
+    variant = f"{name}-{args.index_type}-{args.dimension}"
+    if args.reduce_dim:
+        variant += f"-{args.reduction}{args.reduce_dim}"
+    workdir = args.workdir or os.path.join("embeddings", "benchmark", variant)
+
+    # Build and label in a child process so their memory does not count towards the search RSS
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        build = None
+        if args.rebuild or not os.path.exists(artifact_paths(workdir)["index"]):
+            print(f"🏗️ Building artifacts in {workdir}...")
+            build = pool.submit(build_artifacts, workdir, args.corpus, args.rows, args.index_type,
+                                args.dimension, args.seed, args.reduce_dim, args.reduction).result()
+            print(f"✅ {build['rows']:,} chunks indexed as {build['factory']} in {build['seconds']:.1f}s "
+                  f"(peak RSS {build['peak_rss_mb']:.1f} MiB)")
+            if build["reduction"]:
+                reduction = build["reduction"]
+                print(f"📐 {reduction['method']} {reduction['input_dimension']} → {reduction['dimension']}: "
+                      f"{reduction['retained_variance']:.1%} of the variance retained, "
+                      f"recall@10 vs full-dimension exact search {reduction['recall_at_10']:.3f}")
+        labeled = pool.submit(make_labels, workdir, args.queries, args.seed).result()
+
+    configure_search(workdir, args.dimension)
+    start = time.perf_counter()
+    from utils import search_engine
+    from utils.resources import resources
+    resources.warm_up(["index", "metadata", "chunk_embeddings", "lexical_index"])
+    load_seconds = time.perf_counter() - start
+    index_mb = os.path.getsize(artifact_paths(workdir)["index"]) / 2**20
+    print(f"📂 Opened {search_engine.index.ntotal:,} chunks ({search_engine.manifest.get('factory')}, "
+          f"d={search_engine.index.d}, {index_mb:.1f} MiB) in {load_seconds * 1000:.0f} ms, "
+          f"peak RSS {peak_rss_mb():.1f} MiB")
+    print(f"📋 {len(labeled)} labeled queries, recall@{args.k} over {args.candidates} candidates")
+
+    results = {"corpus": name, "rows": int(search_engine.index.ntotal), "index_type": args.index_type,
+               "dimension": args.dimension, "index_dimension": int(search_engine.index.d),
+               "index_mb": index_mb, "k": args.k, "load_seconds": load_seconds, "build": build,
+               "modes": {}}
+    for mode in args.modes:
+        if mode != "vector" and search_engine.lexical_index is None:
+            print(f"⚠️ Skipping {mode}: no lexical index")
+            continue
+        results["modes"][mode] = benchmark_mode(mode, labeled, args)
+        report(mode, results["modes"][mode], args.k)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# scripts/benchmark_router.py
+
+"""
+Measures the structured query router against the full retrieval path.
+
+For a set of labeled lookup queries generated from the metadata columns (see
+`utils.evaluation`), the script reports
+- how many queries the router answers from the metadata, and the precision /
+  recall of their matching chunk IDs against the labels
+- latency per query (mean / p50 / p95 / p99) of the router, and of the
+  retrieval it replaces (`search_top_k`, embedding included; no LLM call)
+- recall@N of that retrieval, for comparison
+and lists the open-ended example prompts the router would have answered
+(there should be none).
+
+Usage:
+    python -m scripts.benchmark_router [--queries 200] [--top-n 5] [--mode hybrid]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from utils.evaluation import labeled_queries, latency_summary, recall_at_k
+from utils.examples import get_example_prompts
+from utils.query_router import route_query
+from utils.resources import resources
+from utils.search_engine import SEARCH_MODES, search_top_k
+
+# Example prompts that need more than a column lookup
+OPEN_ENDED = [
+    "Who attended AI-related events in Singapore?",
+    "Which people participated in cybersecurity training?",
+    "Summarize what the Marketing team has been working on.",
+    "Who would be a good mentor for a new data scientist?",
+]
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line options for the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the structured query router.")
+    parser.add_argument("--queries", type=int, default=200, help="Number of labeled queries")
+    parser.add_argument("--top-n", type=int, default=5, help="Results kept per query by search_top_k")
+    parser.add_argument("--mode", choices=SEARCH_MODES, default=None, help="Search mode (default: SEARCH_MODE)")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def report(name: str, latency: dict, extra: str = ""):
+    """Prints one latency row."""
+    print(f"{name:<24} mean {latency['mean_ms']:8.3f} ms  p50 {latency['p50_ms']:8.3f}  "
+          f"p95 {latency['p95_ms']:8.3f}  p99 {latency['p99_ms']:8.3f}  {extra}")
+
+
+def main():
+    args = parse_args()
+    labeled = labeled_queries(resources.metadata.to_pandas(), n=args.queries, seed=args.seed)
+    resources.warm_up(["filter_index", "query_router"])
+    print(f"📋 {len(labeled)} labeled queries")
+
+    timings, precisions, recalls = [], [], []
+    for item in labeled:
+        start = time.perf_counter()
+        answer = route_query(item.query)
+        timings.append(time.perf_counter() - start)
+        if answer is None:
+            continue
+        found = len(np.intersect1d(answer.ids, item.relevant))
+        precisions.append(found / len(answer.ids) if len(answer.ids) else 1.0)
+        recalls.append(found / len(item.relevant) if len(item.relevant) else 1.0)
+    routed = len(precisions)
+    quality = (f"routed {routed}/{len(labeled)}  precision {np.mean(precisions):.3f}  "
+               f"recall {np.mean(recalls):.3f}") if routed else f"routed 0/{len(labeled)}"
+    report("router", latency_summary(timings), quality)
+
+    timings, full_recalls = [], []
+    for item in labeled:
+        start = time.perf_counter()
+        results = search_top_k(item.query, k=max(10, args.top_n), rerank_top_n=args.top_n, mode=args.mode)
+        timings.append(time.perf_counter() - start)
+        full_recalls.append(recall_at_k(results.index.to_numpy(), item.relevant, args.top_n))
+    report("search_top_k", latency_summary(timings), f"recall@{args.top_n} {np.mean(full_recalls):.3f}")
+
+    prompts = dict.fromkeys(OPEN_ENDED + get_example_prompts())
+    misrouted = [prompt for prompt in prompts if prompt in OPEN_ENDED and route_query(prompt) is not None]
+    routed_examples = [prompt for prompt in prompts if prompt not in OPEN_ENDED and route_query(prompt) is not None]
+    print(f"🧭 Example prompts answered from the metadata: {routed_examples or '-'}")
+    if misrouted:
+        print(f"⚠️ Open-ended prompts routed to the metadata: {misrouted}")
+    else:
+        print(f"✅ None of the {len(OPEN_ENDED)} open-ended prompts was routed")
+
+
+if __name__ == "__main__":
+    main()
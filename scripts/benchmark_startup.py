@@ -0,0 +1,120 @@
+# scripts/benchmark_startup.py
+
+"""
+Measures the startup time of the app and CLI entry points.
+
+Each entry point is started in fresh Python processes (so nothing is cached
+in-process) and timed in three phases:
+- import:      running the entry point's module code up to the point where it
+               waits for input (the CLI loops are not entered)
+- warm-up:     `utils.resources.warm_up()` - opening the index, metadata,
+               caches and clients that a query needs (with --warm-up)
+- first query: one retrieval through the entry point's own search function
+               (no LLM call); without --warm-up it includes the lazy loading
+
+Reported per entry point: the median of --runs processes, plus the total
+process wall time. `app.py` is imported in Streamlit's bare mode and skipped
+when Streamlit is not installed.
+
+Usage:
+    python -m scripts.benchmark_startup [--runs 5] [--warm-up]
+                                        [--entry-points app.py scripts/search.py]
+                                        [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Entry point -> code running one query in the entry point's namespace `ns`
+ENTRY_POINTS = {
+    "app.py": "from utils.pipeline import retrieve; retrieve(QUERY, warm_up=False)",
+    "scripts/search.py": "ns['search'](QUERY, k=5)",
+    "scripts/search_with_llm.py": "ns['rag_search'](QUERY, k=5)",
+}
+
+# Open-ended, so it goes through retrieval rather than the structured query router
+QUERY = "Who attended AI-related events in Singapore?"
+
+# Runs in the child process; prints one JSON line with the phase timings
+CHILD = """
+import json, runpy, sys, time
+start = time.perf_counter()
+ns = runpy.run_path({path!r}, run_name="startup_benchmark")
+imported = time.perf_counter()
+if {warm_up!r}:
+    from utils.resources import warm_up
+    warm_up()
+warmed = time.perf_counter()
+QUERY = {query!r}
+{first_query}
+done = time.perf_counter()
+print("STARTUP " + json.dumps({{"import": imported - start, "warm_up": warmed - imported,
+                               "first_query": done - warmed,
+                               "modules": sorted(m for m in ("openai", "faiss", "pandas")
+                                                 if m in sys.modules)}}))
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line options for the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark startup time of the entry points.")
+    parser.add_argument("--runs", type=int, default=5, help="Processes per entry point")
+    parser.add_argument("--entry-points", nargs="+", default=list(ENTRY_POINTS), choices=list(ENTRY_POINTS))
+    parser.add_argument("--warm-up", action="store_true", help="Call utils.resources.warm_up() after import")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    return parser.parse_args()
+
+
+def run_once(path: str, warm_up: bool) -> dict | None:
+    """Starts one process for an entry point; returns its timings, or None if it cannot run here."""
+    code = CHILD.format(path=path, warm_up=warm_up, query=QUERY, first_query=ENTRY_POINTS[path])
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.getcwd(), env={**os.environ, "PYTHONPATH": os.getcwd()})
+    wall = time.perf_counter() - start
+    lines = [line for line in result.stdout.splitlines() if line.startswith("STARTUP ")]
+    if result.returncode != 0 or not lines:
+        error = (result.stderr.strip().splitlines() or ["no output"])[-1]
+        print(f"⚠️ {path}: {error}")
+        return None
+    timings = json.loads(lines[-1][len("STARTUP "):])
+    timings["process"] = wall
+    return timings
+
+
+def main():
+    args = parse_args()
+    results = {}
+    for path in args.entry_points:
+        runs = []
+        for _ in range(args.runs):
+            timings = run_once(path, args.warm_up)
+            if timings is None:
+                break
+            runs.append(timings)
+        if not runs:
+            continue
+
+        summary = {phase: statistics.median(run[phase] for run in runs)
+                   for phase in ("import", "warm_up", "first_query", "process")}
+        summary["modules"] = runs[-1]["modules"]
+        results[path] = summary
+        print(f"🚀 {path:<28} import {summary['import'] * 1000:7.0f} ms  "
+              f"warm-up {summary['warm_up'] * 1000:7.0f} ms  "
+              f"first query {summary['first_query'] * 1000:7.0f} ms  "
+              f"process {summary['process'] * 1000:7.0f} ms  "
+              f"(loaded: {', '.join(summary['modules']) or '-'})")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"runs": args.runs, "warm_up": args.warm_up, "results": results}, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,91 +3,506 @@
 """
 This script performs the following preprocessing tasks for RAG-based systems:
 
-1. Loads preprocessed text chunks from an Excel file.
-2. Generates vector embeddings using Azure OpenAI's embedding API.
-3. Builds and saves a FAISS index for similarity search.
-4. Saves metadata and raw embedding vectors for future use.
+1. Loads the text chunks written by `scripts/preprocess.py` (Parquet, CSV or
+   Excel; see `utils/ingest.py`).
+2. Generates vector embeddings with the selected backend (`--backend`): Azure
+   OpenAI's embedding API by default, packing many chunks into each request and
+   sending a bounded number of requests at once, or an offline backend
+   (deterministic hashing, or a local sentence-transformers model). The backend,
+   model and dimension are recorded in the index manifest.
+3. L2-normalizes the vectors once and builds an inner-product FAISS index, so
+   search scores are cosine similarities. The index type
+   (flat, IVF-Flat, IVF-PQ, HNSW, OPQ+IVF-PQ, or auto) is chosen with
+   `--index-type`; ANN indexes are tuned from the corpus size and their
+   recall@k against exact search is reported and saved in the index manifest.
+4. Saves metadata and, optionally, a float32/float16/int8 copy of the normalized
+   vectors (`--embeddings-dtype`) for exact rescoring of ANN candidates.
+5. Builds a BM25 lexical index over the TextChunks (`<index>.bm25.npz`) for
+   hybrid and lexical-only search.
+6. Optionally splits the vectors into shard indexes (`--shards N`, by content
+   hash or by a column with `--shard-by`) that search fans out to in parallel
+   worker processes (see `utils/sharding.py`). Once an index is sharded, every
+   run keeps its shards up to date, rebuilding only shards whose chunks
+   changed; `--shards-only --rebuild-shard 2` rebuilds a single shard without
+   touching the main build.
+7. Calibrates the score cutoff of variable-k retrieval on labeled queries
+   generated from the metadata columns (`--calibrate-queries`): the minimum
+   similarity and the margin below each query's best chunk whose result sets
+   best match the labels (mean F1) are saved in the index manifest as
+   `score_threshold` and `score_margin`. Incremental runs keep the previous
+   cutoff; it is recalibrated on full builds or with `--recalibrate`.
+8. Optionally reduces the vector dimension (`--reduce-dim N`): a PCA projection
+   fitted on the chunk vectors (or Matryoshka truncation, `--reduction
+   truncate`) is saved next to the index (`<index>.projection.npz`), recorded
+   in the manifest with its recall@10 against full-dimension exact search, and
+   applied to every query (see `utils/projection.py`). Text-embedding-3 models
+   can instead return shorter vectors directly (`--api-dimensions N`).
+
+Re-runs are incremental: every chunk is identified by a hash of its text and its
+vector is kept in a persistent hash -> vector store. Only new or changed chunks
+are embedded; rows that disappeared from the input are tombstoned in the
+metadata and removed from the ID-mapped FAISS index in place. Use `--full` to
+rebuild (and compact away tombstones) from the vector store.
 
 Requirements:
 - Environment variables must be defined in a `.env` file.
 - Input Excel file must include a 'TextChunk' column.
 
 Usage:
-    python scripts/embed_and_index.py
+    python -m scripts.embed_and_index [--full] [--backend azure] [--model NAME]
+                                      [--index-type auto] [--batch-size 256]
+                                      [--embeddings-dtype none] [--max-batch-tokens 100000]
+                                      [--concurrency 4] [--shards 4] [--shard-by hash]
+                                      [--shards-only] [--rebuild-shard 0 2]
+                                      [--calibrate-queries 200] [--recalibrate]
+                                      [--reduce-dim 256] [--reduction pca] [--api-dimensions 512]
 """
 
+import argparse
 import os
+from collections import defaultdict
+
 import faiss
 import numpy as np
 import pandas as pd
 from tqdm import tqdm
-from openai import AzureOpenAI
 from dotenv import load_dotenv
 
+from utils.artifacts import (
+    EMBEDDING_DTYPES,
+    load_metadata,
+    quantize_embeddings,
+    write_embeddings,
+    write_index,
+    write_metadata
+)
+from utils.config import (
+    EMBEDDING_API_DIMENSIONS,
+    EMBEDDING_BACKEND,
+    EMBEDDING_DIMENSION,
+    EMBEDDING_MODEL,
+    EMBEDDING_QUANTIZE,
+    EMBEDDING_REDUCED_DIMENSION,
+    EMBEDDING_REDUCTION,
+    SEARCH_MAX_RESULTS
+)
+from utils.embedder import get_query_embeddings
+from utils.embedding_backends import BACKENDS, EmbeddingBackend, EmbeddingMismatchError, create_backend
+from utils.evaluation import QUERY_TEMPLATES, calibrate_threshold, labeled_queries
+from utils.index_factory import INDEX_TYPES, build_index, normalize, recall_at_k, supports_removal
+from utils.index_manifest import read_manifest, write_manifest
+from utils.ingest import read_dataset
+from utils.lexical_index import LexicalIndex, lexical_index_path
+from utils.projection import (
+    REDUCTIONS,
+    Projection,
+    fit_projection,
+    load_projection,
+    neighbor_recall,
+    projection_path
+)
+from utils.sharding import SHARD_KEYS, build_fingerprint, build_shards, read_shard_layout
+from utils.vector_store import VectorStore, chunk_hash
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Azure OpenAI Configuration
-DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT")
-client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-)
-
 # File paths from .env
 input_file = os.getenv("INPUT_FILE")
 output_index = os.getenv("OUTPUT_INDEX")
 output_metadata = os.getenv("OUTPUT_METADATA")
+output_metadata_arrow = os.getenv("METADATA_ARROW_PATH", "embeddings/metadata.arrow")
 output_embeddings = os.getenv("CHUNK_EMBEDDINGS_PATH")
+vector_store_path = os.getenv("VECTOR_STORE_PATH", "embeddings/vector_store.npz")
+
+# Embedding request tuning (overridable from the command line)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+EMBED_MAX_BATCH_TOKENS = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "100000"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
 
-# Load preprocessed input data
-df = pd.read_excel(input_file)
-text_chunks = df["TextChunk"].tolist()
+# FAISS index type (see utils/index_factory.py)
+INDEX_TYPE = os.getenv("INDEX_TYPE", "auto")
 
+# Optional rescoring copy of the normalized vectors: none | float32 | float16 | int8
+CHUNK_EMBEDDINGS_DTYPE = os.getenv("CHUNK_EMBEDDINGS_DTYPE", "none")
 
-def get_embedding(text: str) -> list:
+# Shard layout (0 = keep the current layout; an unsharded index stays unsharded)
+INDEX_SHARDS = int(os.getenv("INDEX_SHARDS", "0"))
+INDEX_SHARD_BY = os.getenv("INDEX_SHARD_BY")
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line options for the embedding stage."""
+    parser = argparse.ArgumentParser(description="Embed text chunks and build the FAISS index.")
+    parser.add_argument("--backend", choices=BACKENDS, default=EMBEDDING_BACKEND,
+                        help="Embedding backend; the index can only be searched with the same one")
+    parser.add_argument("--model", default=EMBEDDING_MODEL,
+                        help="Embedding model (sentence-transformers) or deployment (azure)")
+    parser.add_argument("--api-dimensions", type=int, default=EMBEDDING_API_DIMENSIONS,
+                        help="Ask the azure backend for vectors of this dimension (text-embedding-3 models)")
+    parser.add_argument("--reduce-dim", type=int, default=EMBEDDING_REDUCED_DIMENSION,
+                        help="Project vectors to this dimension before indexing (0 keeps the full dimension)")
+    parser.add_argument("--reduction", choices=REDUCTIONS, default=EMBEDDING_REDUCTION,
+                        help="Dimension reduction: PCA fitted on the chunks, or truncation (Matryoshka models)")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help="Maximum number of chunks per embedding request")
+    parser.add_argument("--max-batch-tokens", type=int, default=EMBED_MAX_BATCH_TOKENS,
+                        help="Maximum estimated tokens per embedding request")
+    parser.add_argument("--concurrency", type=int, default=EMBED_MAX_CONCURRENCY,
+                        help="Maximum number of embedding requests in flight")
+    parser.add_argument("--max-retries", type=int, default=EMBED_MAX_RETRIES,
+                        help="Retries per request on rate-limit or transient errors")
+    parser.add_argument("--full", action="store_true",
+                        help="Rebuild the index from scratch instead of updating it in place")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=INDEX_TYPE,
+                        help="FAISS index type; 'auto' picks one from the corpus size")
+    parser.add_argument("--embeddings-dtype", choices=EMBEDDING_DTYPES, default=CHUNK_EMBEDDINGS_DTYPE,
+                        help="Also save normalized vectors in this precision for exact rescoring")
+    parser.add_argument("--recall-queries", type=int, default=200,
+                        help="Sampled queries used to measure recall@10 against exact search")
+    parser.add_argument("--shards", type=int, default=INDEX_SHARDS,
+                        help="Split the index into this many shards (0 keeps the current layout)")
+    parser.add_argument("--shard-by", choices=SHARD_KEYS, default=INDEX_SHARD_BY,
+                        help="Assign chunks to shards by content hash or by a column's value")
+    parser.add_argument("--shards-only", action="store_true",
+                        help="Only update the shards of the existing build")
+    parser.add_argument("--rebuild-shard", type=int, nargs="+", default=[],
+                        help="Rebuild these shards even if their chunks did not change")
+    parser.add_argument("--calibrate-queries", type=int, default=200,
+                        help="Labeled queries used to calibrate the variable-k score cutoff (0 skips it)")
+    parser.add_argument("--recalibrate", action="store_true",
+                        help="Recalibrate the score cutoff on an incremental run instead of keeping the previous one")
+    return parser.parse_args()
+
+
+def make_backend(args) -> EmbeddingBackend:
+    """Creates the embedding backend selected on the command line."""
+    return create_backend(
+        args.backend,
+        model=args.model,
+        dimension=EMBEDDING_DIMENSION,
+        quantize=EMBEDDING_QUANTIZE,
+        **({
+            "batch_size": args.batch_size,
+            "max_batch_tokens": args.max_batch_tokens,
+            "max_concurrency": args.concurrency,
+            "max_retries": args.max_retries,
+            "dimensions": args.api_dimensions,
+        } if args.backend == "azure" else {})
+    )
+
+
+def embed_rows(hashes: list[str], texts: list[str], store: VectorStore, backend: EmbeddingBackend) -> np.ndarray:
     """
-    Generate an embedding for a given text chunk using Azure OpenAI.
+    Returns vectors for the given chunks, embedding only hashes missing from the store.
 
     Args:
-        text (str): Input string to be embedded.
+        hashes (list[str]): Content hash of each chunk.
+        texts (list[str]): Text of each chunk.
+        store (VectorStore): Persistent hash -> vector store (updated in place).
+        backend (EmbeddingBackend): Backend used for missing chunks.
 
     Returns:
-        list: Embedding vector (float list).
+        np.ndarray: float32 matrix with one row per chunk.
     """
-    response = client.embeddings.create(
-        input=[text],
-        model=DEPLOYMENT_NAME
-    )
-    return response.data[0].embedding
+    missing = {}
+    for h, text in zip(hashes, texts):
+        if h not in store and h not in missing:
+            missing[h] = text
+
+    if missing:
+        # Generate embeddings in batches with progress tracking. A chunk that still
+        # fails after all retries aborts the run rather than being indexed as a
+        # meaningless zero vector.
+        with tqdm(total=len(missing), desc="🔄 Generating embeddings") as progress:
+            vectors = backend.embed(list(missing.values()), progress=progress.update)
+        store.add(list(missing), vectors)
+
+    print(f"🧮 Embedded {len(missing)} new chunk(s), reused {len(set(hashes)) - len(missing)} from the vector store.")
+    return normalize(store.get_many(hashes))
+
+
+def to_index_space(vectors: np.ndarray, projection: Projection | None) -> np.ndarray:
+    """Projects normalized backend vectors to the index dimension (unchanged without a projection)."""
+    return vectors if projection is None else projection.apply(vectors)
+
+
+def seed_store_from_legacy(store: VectorStore):
+    """Imports vectors from a previous non-incremental build so they need not be re-embedded."""
+    if not (os.path.exists(output_metadata) and os.path.exists(output_embeddings)):
+        return
+    metadata = pd.read_csv(output_metadata)
+    embeddings = np.load(output_embeddings)
+    if len(metadata) == len(embeddings):
+        store.add([chunk_hash(text) for text in metadata["TextChunk"]], embeddings)
+
+
+def load_incremental_state(args, backend: EmbeddingBackend):
+    """
+    Loads the artifacts of a previous incremental build.
+
+    Returns:
+        tuple | None: (metadata, index, manifest, projection), or None when no
+        compatible ID-mapped, inner-product build with the same embedding backend
+        and dimension reduction exists and a full rebuild is required.
+    """
+    if not all(os.path.exists(p) for p in (output_index, output_metadata)):
+        return None
+    manifest = read_manifest(output_index)
+    if args.index_type not in ("auto", manifest.get("index_type")) or manifest.get("metric") != "ip":
+        return None
+    embedding = manifest.get("embedding", {"backend": "azure", "model": backend.model})
+    if (embedding["backend"], embedding.get("model")) != (backend.name, backend.model):
+        return None
+    if backend.dimension and embedding.get("dimension") != backend.dimension:
+        return None
+    reduction = embedding.get("reduction")
+    if reduction is None:
+        projection = None
+        if args.reduce_dim:
+            return None
+    else:
+        if (reduction["method"], reduction["dimension"]) != (args.reduction, args.reduce_dim):
+            return None
+        try:
+            projection = load_projection(output_index, reduction)
+        except EmbeddingMismatchError:
+            return None
+    metadata = load_metadata(output_metadata_arrow, output_metadata).to_pandas()
+    if not {"ChunkHash", "Deleted"}.issubset(metadata.columns):
+        return None
+    index = faiss.read_index(output_index)
+    if not supports_removal(index):
+        return None
+    return metadata, index, manifest, projection
+
+
+def full_build(df: pd.DataFrame, store: VectorStore, backend: EmbeddingBackend, args):
+    """
+    Embeds (or reuses) every chunk and builds a fresh ID-mapped FAISS index.
+
+    With `--reduce-dim`, the projection is fitted on the chunk vectors first and the
+    index holds the projected vectors.
+    """
+    df = df.reset_index(drop=True)
+    df["ChunkHash"] = [chunk_hash(text) for text in df["TextChunk"]]
+    df["Deleted"] = False
+    full_matrix = embed_rows(df["ChunkHash"].tolist(), df["TextChunk"].tolist(), store, backend)
+    embedding = backend.describe(full_matrix.shape[1])
+
+    projection = None
+    embedding_matrix = full_matrix
+    if args.reduce_dim:
+        projection = fit_projection(full_matrix, args.reduction, args.reduce_dim)
+        embedding_matrix = projection.apply(full_matrix)
+        embedding["reduction"] = projection.describe()
+        message = (f"📐 {args.reduction} {projection.input_dimension} → {projection.dimension}: "
+                   f"{projection.retained_variance:.1%} of the variance retained")
+        if args.recall_queries:
+            recall = neighbor_recall(full_matrix, embedding_matrix, k=10, n_queries=args.recall_queries)
+            embedding["reduction"]["recall_at_10"] = round(recall, 4)
+            message += f", recall@10 vs full-dimension exact search = {recall:.3f}"
+        print(message)
+
+    # Row positions double as FAISS IDs so search results map straight back to metadata
+    ids = np.arange(len(df), dtype="int64")
+    metric = faiss.METRIC_INNER_PRODUCT
+    index, manifest = build_index(embedding_matrix, ids, index_type=args.index_type, metric=metric)
+    manifest.update(metric="ip", normalized=True, dimension=int(embedding_matrix.shape[1]), embedding=embedding)
+    if manifest["index_type"] != "flat" and args.recall_queries:
+        manifest["recall_at_10"] = recall_at_k(index, embedding_matrix, ids, k=10,
+                                               n_queries=args.recall_queries, metric=metric)
+        print(f"🎯 {manifest['factory']}: recall@10 vs exact search = {manifest['recall_at_10']:.3f}")
+    return df, index, manifest, projection
+
+
+def incremental_build(df: pd.DataFrame, state, store: VectorStore, backend: EmbeddingBackend):
+    """Applies additions and deletions from `df` to an existing build in place."""
+    metadata, index, manifest, projection = state
+
+    # Match each input row to a live row with the same content hash
+    live_by_hash = defaultdict(list)
+    for row_id, h in metadata.loc[~metadata["Deleted"], "ChunkHash"].items():
+        live_by_hash[h].append(row_id)
+
+    new_hashes = [chunk_hash(text) for text in df["TextChunk"]]
+    new_positions = []
+    for pos, h in enumerate(new_hashes):
+        if live_by_hash.get(h):
+            live_by_hash[h].pop()
+        else:
+            new_positions.append(pos)
+    removed_ids = np.array([row_id for ids in live_by_hash.values() for row_id in ids], dtype="int64")
+
+    # Tombstone rows that are no longer in the input
+    if len(removed_ids):
+        metadata.loc[removed_ids, "Deleted"] = True
+        index.remove_ids(faiss.IDSelectorBatch(removed_ids))
+
+    # Append new or changed rows under fresh IDs
+    if new_positions:
+        added = df.iloc[new_positions].copy()
+        added["ChunkHash"] = [new_hashes[pos] for pos in new_positions]
+        added["Deleted"] = False
+        added.index = np.arange(len(metadata), len(metadata) + len(added))
+
+        vectors = embed_rows(added["ChunkHash"].tolist(), added["TextChunk"].tolist(), store, backend)
+        vectors = to_index_space(vectors, projection)
+        index.add_with_ids(vectors, added.index.to_numpy(dtype="int64"))
+        metadata = pd.concat([metadata, added])
+
+    print(f"➕ {len(new_positions)} added  ➖ {len(removed_ids)} tombstoned  "
+          f"✔️ {len(df) - len(new_positions)} unchanged")
+    return metadata, index, manifest, projection
+
+
+def save_rescoring_store(metadata: pd.DataFrame, store: VectorStore, manifest: dict, dtype: str,
+                        projection: Projection | None = None):
+    """
+    Writes normalized vectors for every chunk ID in the requested precision.
+
+    Search can rescore ANN candidates exactly from this file; with dtype "none"
+    nothing is written and search reuses the FAISS scores directly.
+    """
+    manifest["embeddings_dtype"] = dtype
+    manifest.pop("embeddings_scale", None)
+    if dtype == "none":
+        return
+    vectors = to_index_space(normalize(store.get_many(metadata["ChunkHash"].tolist())), projection)
+    stored, scale = quantize_embeddings(vectors, dtype)
+    if scale is not None:
+        manifest["embeddings_scale"] = scale
+    write_embeddings(stored, output_embeddings)
+
+
+def calibrate_score_cutoff(metadata: pd.DataFrame, store: VectorStore, backend: EmbeddingBackend,
+                           manifest: dict, n_queries: int, projection: Projection | None = None):
+    """
+    Calibrates the variable-k score cutoff on labeled queries and records it in the manifest.
+
+    The queries are embedded with the build's backend (through the query embedding cache, so
+    repeated calibrations make no new embedding calls) and scored exactly against every live
+    chunk, so the threshold does not depend on the ANN index type.
+    """
+    if not any(set(columns).issubset(metadata.columns) for _, columns in QUERY_TEMPLATES):
+        return
+    labeled = labeled_queries(metadata, n=n_queries)
+    live = metadata.index[~metadata["Deleted"]].to_numpy("int64")
+    vectors = to_index_space(normalize(store.get_many(metadata.loc[live, "ChunkHash"].tolist())), projection)
+    queries = get_query_embeddings([item.query for item in labeled], backend)
+    queries = to_index_space(normalize(queries), projection)
+
+    k = min(SEARCH_MAX_RESULTS, len(live))
+    scores, positions = faiss.knn(queries, vectors, k, metric=faiss.METRIC_INNER_PRODUCT)
+    ids = np.where(positions >= 0, live[np.maximum(positions, 0)], -1)
+    result = calibrate_threshold(np.where(positions >= 0, scores, -np.inf), ids, labeled)
+
+    baseline = result.pop("baseline")
+    min_score, margin = result.pop("min_score"), result.pop("margin")
+    manifest["score_threshold"] = round(min_score, 4)
+    manifest["score_margin"] = None if margin is None else round(margin, 4)
+    manifest["score_calibration"] = {"queries": len(labeled), "max_results": k,
+                                     **{key: round(value, 4) for key, value in result.items()},
+                                     f"top_{baseline['top_n']}_f1": round(baseline["f1"], 4)}
+    print(f"📏 Score cutoff >= {min_score:.3f}" + ("" if margin is None else f", within {margin:.3f} of the best")
+          + f": F1 {result['f1']:.3f} with {result['mean_results']:.1f} results per query "
+          f"(top-{baseline['top_n']}: F1 {baseline['f1']:.3f})")
+
+
+def update_shards(metadata: pd.DataFrame, store: VectorStore, manifest: dict, args,
+                  projection: Projection | None = None):
+    """Builds or refreshes the shard indexes when sharding is requested or already in use."""
+    layout = read_shard_layout(output_index) or {}
+    count = args.shards or layout.get("count", 0)
+    if not count:
+        return
+    by = args.shard_by or layout.get("by", "hash")
+    hashes = metadata["ChunkHash"].to_numpy()
+
+    def get_vectors(ids: np.ndarray) -> np.ndarray:
+        return to_index_space(normalize(store.get_many(hashes[ids].tolist())), projection)
+
+    print(f"🧩 Updating {count} shard(s) by {by}...")
+    build_shards(metadata.reset_index(drop=True), get_vectors, output_index, count, by,
+                 index_type=args.index_type, embedding=manifest.get("embedding"),
+                 rebuild=tuple(args.rebuild_shard), build=manifest["build_fingerprint"])
+
+
+def main():
+    args = parse_args()
+
+    if args.shards_only:
+        backend = make_backend(args)
+        metadata = load_metadata(output_metadata_arrow, output_metadata).to_pandas()
+        store = VectorStore.load(vector_store_path, backend.identity, accept_legacy=backend.name == "azure")
+        manifest = read_manifest(output_index)
+        reduction = manifest.get("embedding", {}).get("reduction")
+        projection = load_projection(output_index, reduction) if reduction else None
+        if "build_fingerprint" not in manifest:  # Built before the fingerprint was recorded
+            manifest["build_fingerprint"] = build_fingerprint(metadata, manifest.get("embedding"))
+            write_manifest(output_index, manifest)
+        update_shards(metadata, store, manifest, args, projection)
+        return
+
+    # Load preprocessed input data
+    df = read_dataset(input_file)
+
+    backend = make_backend(args)
+    print(f"🧬 Embedding backend: {backend.identity}")
+
+    # Vectors from another backend live in another space and are never reused
+    store = VectorStore.load(vector_store_path, backend.identity, accept_legacy=backend.name == "azure")
+    state = None if args.full else load_incremental_state(args, backend)
+    if state is None:
+        if not len(store) and backend.name == "azure":
+            seed_store_from_legacy(store)
+        print("🏗️ Building FAISS index from scratch...")
+        metadata, index, manifest, projection = full_build(df, store, backend, args)
+    else:
+        print("♻️ Updating existing FAISS index incrementally...")
+        metadata, index, manifest, projection = incremental_build(df, state, store, backend)
+
+    # Save normalized vectors for exact rescoring (optional)
+    save_rescoring_store(metadata, store, manifest, args.embeddings_dtype, projection)
+
+    # Calibrate the variable-k score cutoff on labeled queries (optional). It costs an
+    # embedding batch and an exact search over the corpus, so incremental runs keep the
+    # previous cutoff unless asked to recalibrate
+    if args.calibrate_queries:
+        if state is None or args.recalibrate or "score_threshold" not in manifest:
+            calibrate_score_cutoff(metadata, store, backend, manifest, args.calibrate_queries, projection)
+        else:
+            print(f"📏 Keeping the calibrated score cutoff >= {manifest['score_threshold']:.3f} "
+                  f"(pass --recalibrate to refresh it)")
+
+    # Save the dimension reduction first: the manifest written next refers to it by checksum
+    if projection is not None:
+        projection.save(projection_path(output_index))
+    elif os.path.exists(projection_path(output_index)):
+        os.remove(projection_path(output_index))
 
+    # Save FAISS index and its build manifest
+    write_index(index, output_index)
+    manifest.update(ntotal=int(index.ntotal),
+                    build_fingerprint=build_fingerprint(metadata, manifest.get("embedding")))
+    write_manifest(output_index, manifest)
 
-# Generate embeddings with progress tracking and fallback for failures
-embeddings = []
-for chunk in tqdm(text_chunks, desc="🔄 Generating embeddings"):
-    try:
-        embedding = get_embedding(chunk)
-    except Exception as e:
-        print(f"⚠️ Error embedding: {chunk[:60]}... | Reason: {e}")
-        embedding = [0.0] * 1536  # Fallback: zero vector
-    embeddings.append(embedding)
+    # Save metadata (memory-mappable Arrow file for search, CSV for humans)
+    write_metadata(metadata, output_metadata_arrow, output_metadata)
 
-# Convert to NumPy array
-embedding_matrix = np.array(embeddings).astype("float32")
+    # Save the BM25 lexical index over the live chunks next to the FAISS index
+    live = metadata[~metadata["Deleted"]]
+    LexicalIndex.build(live["TextChunk"], live.index).save(lexical_index_path(output_index))
 
-# Build FAISS index from embeddings
-dimension = embedding_matrix.shape[1]
-index = faiss.IndexFlatL2(dimension)
-index.add(embedding_matrix)
+    # Split the vectors into independently rebuildable shards (optional)
+    update_shards(metadata, store, manifest, args, projection)
 
-# Save FAISS index
-faiss.write_index(index, output_index)
+    # Persist the hash -> vector store for the next incremental run
+    store.save(vector_store_path)
 
-# Save metadata
-df.to_csv(output_metadata, index=False)
+    print("✅ Embeddings generated and saved. FAISS index and metadata exported.")
 
-# Save raw embeddings to .npy
-np.save(output_embeddings, embedding_matrix)
 
-print("✅ Embeddings generated and saved. FAISS index and metadata exported.")
+if __name__ == "__main__":
+    main()
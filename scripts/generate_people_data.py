@@ -0,0 +1,137 @@
+# scripts/generate_people_data.py
+
+"""
+Generates synthetic people datasets in the layout of `data/raw/people_data_*.xlsx`.
+
+The value pools (first names, last names, teams, locations, events) are taken
+from the raw sample files, so generated rows look like the real ones and the
+labeled benchmark queries of `utils.evaluation` apply to them unchanged. Each
+row also gets its `TextChunk` in the sentence format of `utils.ingest` (the
+streaming ingest behind `scripts/preprocess.py`), built with vectorized string
+operations so a million rows take seconds.
+
+The output format follows the file extension: `.parquet` and `.csv` for large
+corpora, `.xlsx` for small samples; `utils.ingest.read_dataset` loads all three.
+
+Usage:
+    python -m scripts.generate_people_data --rows 10000 100000 1000000
+                                           [--output-dir data/synthetic] [--format parquet]
+                                           [--seed 0]
+"""
+
+import argparse
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from utils import ingest
+from utils.ingest import COLUMNS
+
+RAW_PATTERN = "data/raw/people_data_*.xlsx"
+FORMATS = ("parquet", "csv", "xlsx")
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line options for the generator."""
+    parser = argparse.ArgumentParser(description="Generate synthetic people datasets.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="Dataset sizes to generate")
+    parser.add_argument("--output-dir", default="data/synthetic", help="Directory for the generated files")
+    parser.add_argument("--format", choices=FORMATS, default="parquet", help="Output file format")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def load_vocabulary(pattern: str = RAW_PATTERN) -> dict[str, np.ndarray]:
+    """
+    Collects the distinct values of the raw sample files.
+
+    Args:
+        pattern (str): Glob of the raw Excel files.
+
+    Returns:
+        dict[str, np.ndarray]: Sorted values for "FirstNames", "LastNames",
+        "Families", "Locations" and "Events".
+    """
+    paths = sorted(glob.glob(pattern))
+    if not paths:
+        raise FileNotFoundError(f"No raw people data matches {pattern}")
+    raw = pd.concat([pd.read_excel(path) for path in paths]).dropna()
+    names = raw["People"].astype(str).str.split(" ", n=1)
+    vocabulary = {
+        "FirstNames": names.str[0],
+        "LastNames": names.str[1].dropna(),
+        **{column: raw[column].astype(str) for column in COLUMNS[1:]},
+    }
+    return {key: np.array(sorted(values.unique()), dtype=object) for key, values in vocabulary.items()}
+
+
+def text_chunks(df: pd.DataFrame) -> pd.Series:
+    """
+    Builds the TextChunk of every row (same sentence as `utils.ingest.text_chunks`).
+
+    Args:
+        df (pd.DataFrame): Rows with People, Families, Locations and Events.
+
+    Returns:
+        pd.Series: One sentence per row.
+    """
+    table = pa.Table.from_pandas(df[list(COLUMNS)], preserve_index=False)
+    return pd.Series(ingest.text_chunks(table).to_pandas(), index=df.index)
+
+
+def generate_people(rows: int, vocabulary: dict[str, np.ndarray], seed: int = 0) -> pd.DataFrame:
+    """
+    Samples a synthetic dataset.
+
+    Args:
+        rows (int): Number of rows.
+        vocabulary (dict[str, np.ndarray]): Value pools from `load_vocabulary`.
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: People, Families, Locations, Events and TextChunk columns.
+    """
+    rng = np.random.default_rng(seed)
+
+    def sample(key):
+        pool = vocabulary[key]
+        return pd.Series(pool[rng.integers(len(pool), size=rows)], dtype=str)
+
+    df = pd.DataFrame({
+        "People": sample("FirstNames") + " " + sample("LastNames"),
+        "Families": sample("Families"),
+        "Locations": sample("Locations"),
+        "Events": sample("Events"),
+    })
+    df["TextChunk"] = text_chunks(df)
+    return df
+
+
+def write_dataset(df: pd.DataFrame, path: str):
+    """Saves a dataset in the format given by the file extension."""
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    elif path.endswith(".csv"):
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+
+
+def main():
+    args = parse_args()
+    vocabulary = load_vocabulary()
+    print("📚 Value pools: " + ", ".join(f"{len(values)} {key}" for key, values in vocabulary.items()))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for rows in args.rows:
+        path = os.path.join(args.output_dir, f"people_data_{rows}.{args.format}")
+        write_dataset(generate_people(rows, vocabulary, seed=args.seed), path)
+        print(f"✅ {rows:,} rows saved to: {path}")
+
+
+if __name__ == "__main__":
+    main()
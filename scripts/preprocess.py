@@ -1,52 +1,48 @@
-"""
-preprocess.py
+# scripts/preprocess.py
 
-This script reads a raw Excel file containing structured people/event/location data,
-cleans the data, and generates a human-readable "TextChunk" for each row.
+"""
+Turns a raw people/event/location file into the input of the embedding stage.
 
-The output is saved to a new Excel file and used later for semantic search and embedding.
+The raw file (CSV, Parquet or XLSX) is streamed in batches of `--batch-size`
+rows through `utils.ingest`: every batch is cleaned, gets its human-readable
+`TextChunk` from vectorized string kernels and is appended to the output, so
+memory stays constant and a million CSV/Parquet rows take seconds. Write
+Parquet (the default) and point `INPUT_FILE` at it; `scripts/embed_and_index.py`
+reads it directly.
 
 Usage:
-    python scripts/preprocess.py
+    python -m scripts.preprocess [--input data/raw/people_data_1000.xlsx]
+                                 [--output data/processed/people_data_1000.parquet]
+                                 [--batch-size 100000]
 """
 
-import pandas as pd
-
-# Define input and output file paths
-input_excel_path = "D:\\LifeLongLearning\\temp\\raw\\people_data_1000.xlsx"
-output_excel_path = "D:\\LifeLongLearning\\temp\\processed\\people_data_1000_with_textchunk.xlsx"
-
-# Load the raw Excel data
-df = pd.read_excel(input_excel_path)
-
-# Standardize column names (capitalize and strip whitespace)
-df.columns = [col.strip().capitalize() for col in df.columns]
-
-# Drop any rows that contain missing values
-df.dropna(inplace=True)
-
+import argparse
+import time
 
-def row_to_text(row):
-    """
-    Convert a structured row to a natural-language text chunk.
+from utils.ingest import ingest
 
-    Args:
-        row (pd.Series): A row containing 'People', 'Families', 'Locations', 'Events'
 
-    Returns:
-        str: A formatted sentence describing the row
-    """
-    return (
-        f"{row['People']} is part of the {row['Families']} team, "
-        f"based in {row['Locations']}, and recently "
-        f"{row['Events'].lower()}."
-    )
+def parse_args() -> argparse.Namespace:
+    """Parse command-line options for the ingest."""
+    parser = argparse.ArgumentParser(description="Stream raw people data into text chunks.")
+    parser.add_argument("--input", default="data/raw/people_data_1000.xlsx",
+                        help="Raw CSV, Parquet or XLSX file")
+    parser.add_argument("--output", default="data/processed/people_data_1000.parquet",
+                        help="Parquet or CSV file to write")
+    parser.add_argument("--batch-size", type=int, default=100_000, help="Rows processed at a time")
+    return parser.parse_args()
 
 
-# Generate 'TextChunk' column for every row
-df["Textchunk"] = df.apply(row_to_text, axis=1)
+def main():
+    args = parse_args()
+    start = time.perf_counter()
+    stats = ingest(args.input, args.output, args.batch_size)
+    elapsed = time.perf_counter() - start
+    dropped = stats["rows_read"] - stats["rows_written"]
+    print(f"📥 {stats['rows_read']:,} rows read in {stats['batches']} batch(es), "
+          f"{dropped:,} incomplete row(s) dropped ({elapsed:.2f} s)")
+    print(f"✅ Processed file saved to: {args.output}")
 
-# Save the processed DataFrame to Excel
-df.to_excel(output_excel_path, index=False)
 
-print(f"✅ Processed file saved to: {output_excel_path}")
+if __name__ == "__main__":
+    main()
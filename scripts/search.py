@@ -12,46 +12,18 @@ This script:
 - Displays matched results in the terminal
 
 This is useful for testing retrieval performance in isolation from the full RAG pipeline.
+Query embeddings go through the shared cache in `utils.embedder`. The index and
+metadata are opened when the first query is searched (see `utils.resources`).
 
 Usage:
-    python scripts/search.py
+    python -m scripts.search
 """
 
-import os
-import faiss
 import pandas as pd
-import numpy as np
-from dotenv import load_dotenv
-from openai import AzureOpenAI
 
-# Load environment variables from .env file
-load_dotenv()
-
-# Initialize Azure OpenAI client
-client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-)
-
-DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT")
-
-# File paths
-INDEX_PATH = os.getenv("OUTPUT_INDEX")       # e.g., "embeddings/faiss_index_people_data.index"
-METADATA_PATH = os.getenv("OUTPUT_METADATA") # e.g., "embeddings/metadata.csv"
-
-# Load FAISS index and metadata
-index = faiss.read_index(INDEX_PATH)
-df = pd.read_csv(METADATA_PATH)
-
-
-def get_query_embedding(query: str) -> list:
-    """Generate an embedding for the user query using Azure OpenAI."""
-    response = client.embeddings.create(
-        input=[query],
-        model=DEPLOYMENT_NAME
-    )
-    return response.data[0].embedding
+from utils import search_engine
+from utils.artifacts import lookup_rows
+from utils.embedder import get_query_embedding
 
 
 def search(query: str, k: int = 5) -> pd.DataFrame:
@@ -65,9 +37,11 @@ def search(query: str, k: int = 5) -> pd.DataFrame:
     Returns:
         pd.DataFrame: Retrieved rows with top-matching TextChunks
     """
-    query_vec = np.array([get_query_embedding(query)], dtype="float32")
-    _, I = index.search(query_vec, k)
-    return df.iloc[I[0]]
+    # Reduced-dimension builds search with projected query vectors
+    query_vec = search_engine.project_queries(get_query_embedding(query))
+    # Index and metadata (OUTPUT_INDEX / METADATA_ARROW_PATH) are memory-mapped on first use
+    _, I = search_engine.index.search(query_vec, k)
+    return lookup_rows(search_engine.metadata, I[0][I[0] >= 0])
 
 
 if __name__ == "__main__":
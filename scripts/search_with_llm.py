@@ -7,12 +7,21 @@ Steps:
 1. Embeds a user query using Azure OpenAI Embedding API.
 2. Retrieves top-k matching chunks from a FAISS vector index.
 3. Constructs a prompt combining the query and retrieved context.
-4. Sends the prompt to Azure OpenAI's Chat Completion API (e.g., GPT-4 or GPT-3.5).
-5. Returns a generated answer and displays the supporting context.
+4. Streams the answer from Azure OpenAI's Chat Completion API (e.g., GPT-4 or GPT-3.5).
+5. Prints the answer as it arrives, its timings (per traced stage, see
+   `utils.tracing`), and the supporting context.
+
+Pure lookups ("List members of the Data Science team based in Tokyo.") are
+answered from the metadata columns instead, without steps 1-4 (see
+`utils.query_router`).
 
 Usage:
-    Run the script and type natural language queries in the console.
-    Type 'exit' or 'quit' to terminate.
+    python -m scripts.search_with_llm
+    Type natural language queries in the console; 'exit' or 'quit' terminates.
+    Query embeddings go through the shared cache in `utils.embedder`; answers are
+    streamed by `utils.answer_generator.stream_answer`, the same generator the app uses.
+    The index and metadata are opened when the first query is searched (see
+    `utils.resources`).
 
 Dependencies:
     - FAISS
@@ -22,83 +31,32 @@ Dependencies:
     - NumPy
 """
 
-import os
-import faiss
-import numpy as np
 import pandas as pd
-from dotenv import load_dotenv
-from openai import AzureOpenAI
-
-# ---------------------- Environment Setup ---------------------- #
-load_dotenv()
-
-# Azure OpenAI Client Initialization
-client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-)
-
-# Azure Model Deployment Configs
-DEPLOYMENT_EMBEDDING = os.getenv("AZURE_OPENAI_DEPLOYMENT")
-DEPLOYMENT_COMPLETION = os.getenv("AZURE_OPENAI_COMPLETION_DEPLOYMENT")
 
-# File Paths
-INDEX_PATH = os.getenv("OUTPUT_INDEX")
-METADATA_PATH = os.getenv("OUTPUT_METADATA")
-PROMPT_TEMPLATE_PATH = "prompts/prompt_v1.txt"
-
-# ---------------------- Load Data ---------------------- #
-index = faiss.read_index(INDEX_PATH)
-df_metadata = pd.read_csv(METADATA_PATH)
+from utils import search_engine
+from utils.answer_generator import AnswerStream, build_prompt, stream_answer
+from utils.artifacts import lookup_rows
+from utils.embedder import get_query_embedding
+from utils.query_router import route_query
+from utils.tracing import span, trace
 
 
 # ---------------------- Helper Functions ---------------------- #
-def get_query_embedding(query: str) -> list:
-    """Get the embedding vector for a query string."""
-    response = client.embeddings.create(input=[query], model=DEPLOYMENT_EMBEDDING)
-    return response.data[0].embedding
-
-
 def search_faiss(query: str, k: int = 5) -> pd.DataFrame:
     """Search top-k results from FAISS index using query embedding."""
-    query_vec = np.array([get_query_embedding(query)], dtype=np.float32)
-    _, indices = index.search(query_vec, k)
-    return df_metadata.iloc[indices[0]]
+    query_vec = search_engine.project_queries(get_query_embedding(query))
+    with span("ann_search", queries=1, k=k, path="index"):
+        _, indices = search_engine.index.search(query_vec, k)
+    with span("metadata_lookup"):
+        return lookup_rows(search_engine.metadata, indices[0][indices[0] >= 0])
 
 
-def load_prompt_template(file_path: str = PROMPT_TEMPLATE_PATH) -> str:
-    """Load the LLM prompt template from file."""
-    with open(file_path, "r", encoding="utf-8") as f:
-        return f.read()
-
-
-def build_prompt(chunks: list[str], query: str) -> str:
-    """Format the LLM prompt by injecting retrieved chunks and query."""
-    context = "\n".join(chunks)
-    return load_prompt_template().format(context=context, query=query)
-
-
-def generate_answer(prompt: str) -> str:
-    """Generate a response from the LLM based on the constructed prompt."""
-    response = client.chat.completions.create(
-        model=DEPLOYMENT_COMPLETION,
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.2
-    )
-    return response.choices[0].message.content.strip()
-
-
-def rag_search(query: str, k: int = 5) -> tuple[str, list[str]]:
-    """RAG pipeline: Retrieve → Prompt → Answer."""
+def rag_search(query: str, k: int = 5) -> tuple[AnswerStream, list[str]]:
+    """RAG pipeline: Retrieve → Prompt → Answer (streamed when iterated)."""
     results = search_faiss(query, k)
     chunks = results["TextChunk"].tolist()
     prompt = build_prompt(chunks, query)
-    answer = generate_answer(prompt)
-    return answer, chunks
+    return stream_answer(prompt, query, results.index), chunks
 
 
 # ---------------------- CLI Interface ---------------------- #
@@ -109,10 +67,27 @@ if __name__ == "__main__":
             print("👋 Exiting Smart Search...")
             break
 
-        answer, top_chunks = rag_search(query, k=5)
-
-        print("\n🤖 LLM Answer:\n" + "-" * 60)
-        print(answer)
+        with trace("query", query=query) as query_trace:
+            routed = route_query(query)
+            if routed is None:
+                answer, top_chunks = rag_search(query, k=5)
+
+                print("\n🤖 LLM Answer:\n" + "-" * 60)
+                for delta in answer:
+                    print(delta, end="", flush=True)
+                print()
+        if routed is not None:
+            print("\n🧭 Structured Answer (from the metadata):\n" + "-" * 60)
+            print(routed.text)
+            print(f"\n⏱️ Answered in {query_trace.seconds * 1000:.2f} ms without an LLM call")
+            continue
+
+        if answer.cached:
+            print(f"\n⏱️ Cached answer in {answer.total:.2f}s")
+        else:
+            print(f"\n⏱️ First token {answer.ttft or 0:.2f}s · total {answer.total:.2f}s")
+        print("🧭 " + " · ".join(f"{name} {seconds * 1000:.1f} ms"
+                                 for name, seconds in query_trace.stage_seconds().items()))
 
         print("\n📚 Top Context Chunks:\n" + "-" * 60)
         for i, chunk in enumerate(top_chunks, start=1):
@@ -0,0 +1,172 @@
+# scripts/stub_embedding_server.py
+
+"""
+A tiny local stand-in for the Azure OpenAI embeddings endpoint.
+
+It answers `POST /openai/deployments/<name>/embeddings` with deterministic
+pseudo-random unit vectors derived from each input text, so the embedding
+pipeline can be exercised without credentials or network access. Like the
+text-embedding-3 models, it honours the `dimensions` parameter by returning the
+first N coordinates renormalized. It can also simulate throttling by answering every N-th request with HTTP 429.
+
+`POST /openai/deployments/<name>/chat/completions` is answered with a canned
+answer, streamed word by word as server-sent events when `stream` is set,
+so answer streaming and time-to-first-token can be checked locally too.
+
+Connections are kept alive (HTTP/1.1) like the real endpoint's, and
+`--connect-delay` adds a per-connection delay standing in for the TCP/TLS
+handshake. `GET /stub/stats` reports the connections and requests served, so
+connection reuse can be measured (see `scripts/benchmark_client.py`).
+
+Usage:
+    python -m scripts.stub_embedding_server --port 8089 --rate-limit-every 5
+
+    # then, in another shell
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8089 AZURE_OPENAI_API_KEY=stub \\
+        python -m scripts.embed_and_index
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+def stub_vector(text: str, dim: int, dimensions: int | None = None) -> list[float]:
+    """Returns a deterministic unit vector for a text, shortened to `dimensions` if given."""
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype("float32")[:dimensions or dim]
+    return (vec / np.linalg.norm(vec)).tolist()
+
+
+def stub_answer(messages: list[dict]) -> str:
+    """Returns a canned answer that echoes the start of the last user message."""
+    prompt = " ".join(messages[-1]["content"].split()[:12]) if messages else ""
+    return f"This is a stub answer generated for a prompt starting with: {prompt}"
+
+
+def make_handler(dim: int, rate_limit_every: int, token_delay: float = 0.0, connect_delay: float = 0.0):
+    """Builds a request handler class bound to the given server options."""
+    counter = itertools.count(1)
+    stats = {"connections": 0, "requests": 0}
+    lock = threading.Lock()
+
+    def count(name: str):
+        with lock:
+            stats[name] += 1
+
+    class StubEmbeddingHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real endpoint
+
+        def setup(self):
+            super().setup()
+            count("connections")
+            time.sleep(connect_delay)
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/stub/stats":
+                return self._reply(200, stats)
+            count("requests")
+            if path.endswith("/models"):
+                return self._reply(200, {"object": "list", "data": []})
+            self._reply(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            count("requests")
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            path = self.path.split("?")[0]
+            if path.endswith("/chat/completions"):
+                return self._chat(body)
+            if not path.endswith("/embeddings"):
+                return self._reply(404, {"error": {"message": "not found"}})
+
+            if rate_limit_every and next(counter) % rate_limit_every == 0:
+                return self._reply(429, {"error": {"code": "429", "message": "Rate limit (stub)"}},
+                                   {"Retry-After": "0"})
+
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            dimensions = body.get("dimensions")
+            if dimensions is not None and not 0 < dimensions <= dim:
+                return self._reply(400, {"error": {"message": f"dimensions must be between 1 and {dim}"}})
+            data = [
+                {"object": "embedding", "index": i, "embedding": stub_vector(text, dim, dimensions)}
+                for i, text in enumerate(inputs)
+            ]
+            tokens = sum(len(text) // 4 + 1 for text in inputs)
+            self._reply(200, {
+                "object": "list",
+                "data": data,
+                "model": body.get("model", "stub"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+
+        def _chat(self, body: dict):
+            answer = stub_answer(body.get("messages", []))
+            base = {"id": "stub", "created": int(time.time()), "model": body.get("model", "stub")}
+            if not body.get("stream"):
+                return self._reply(200, {
+                    **base,
+                    "object": "chat.completion",
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": answer}}],
+                })
+
+            # No Content-Length: the stream ends when the connection closes
+            self.close_connection = True
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            words = answer.split(" ")
+            for i, word in enumerate(words):
+                time.sleep(token_delay)
+                delta = {"content": word if i == 0 else f" {word}"}
+                self._event({**base, "object": "chat.completion.chunk",
+                             "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+            self._event({**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def _event(self, payload: dict):
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        def _reply(self, status: int, payload: dict, headers: dict | None = None):
+            raw = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def log_message(self, format, *args):
+            pass  # Keep the console quiet; request volume can be high
+
+    return StubEmbeddingHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub for the embeddings endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension to return")
+    parser.add_argument("--rate-limit-every", type=int, default=0,
+                        help="Answer every N-th request with HTTP 429 (0 disables)")
+    parser.add_argument("--token-delay", type=float, default=0.05,
+                        help="Seconds between streamed chat completion tokens")
+    parser.add_argument("--connect-delay", type=float, default=0.0,
+                        help="Seconds added to every new connection (simulated TCP/TLS handshake)")
+    args = parser.parse_args()
+
+    handler = make_handler(args.dim, args.rate_limit_every, args.token_delay, args.connect_delay)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"🧪 Stub embedding server listening on http://{args.host}:{args.port}")
+    server.serve_forever()
@@ -6,14 +6,34 @@ utils package
 Contains utility modules for the Smart Search with GenAI app.
 
 Modules:
+- answer_cache: Semantic cache of LLM answers keyed on query similarity and context.
 - answer_generator: Constructs prompts and retrieves LLM answers.
-- azure_openai_client: Handles Azure OpenAI client setup.
+- artifacts: Memory-mapped reading and atomic writing of search artifacts.
+- azure_openai_client: Shared, pooled sync and async Azure OpenAI clients.
+- batch_embedder: Batched, concurrent embedding of text chunks with retries.
 - config: Loads environment variables and config paths.
 - embedder: Generates embeddings for user queries.
+- embedding_backends: Pluggable embedding backends (Azure OpenAI, hashing, sentence-transformers).
+- embedding_cache: Two-tier (LRU + SQLite) cache of query embeddings.
+- evaluation: Labeled query generation, ranking metrics and score cutoff calibration.
 - examples: Provides example prompts.
+- filters: Inverted indexes over structured columns for filtered search.
+- index_factory: Builds and tunes flat/IVF/PQ/HNSW FAISS indexes.
+- index_manifest: Reads and writes the index build manifest.
+- ingest: Streaming, batched conversion of raw people data into text chunks.
+- lexical_index: Array-backed BM25 inverted index over TextChunk.
+- micro_batcher: Groups concurrent asyncio requests into batched calls.
 - onboarding: Displays the onboarding interface.
+- pipeline: Async, instrumented retrieval pipeline (route → embed → search → prompt).
+- projection: PCA / truncation of embeddings to a reduced index dimension, checked at load time.
 - prompt_loader: Loads prompt templates from file.
-- reranker: Re-ranks retrieved chunks by semantic similarity.
+- prompt_packer: Token-budgeted prompt context with deduplication and compact tables.
+- query_router: Answers pure lookup queries from the metadata columns, without the LLM.
+- reranker: Re-ranks retrieved chunks (cosine similarity, or a second-stage cross-encoder).
+- resources: Lazily loaded shared resources (index, caches, clients) with a warm-up hook.
 - search_engine: Performs FAISS search and LLM chunk selection.
+- sharding: Sharded index builds and parallel fan-out search.
 - theme: Dynamically applies theme styles.
+- tracing: Per-stage spans with JSONL and Prometheus exporters.
+- vector_store: Content-addressed store of chunk embeddings for incremental builds.
 """
@@ -0,0 +1,165 @@
+# utils/answer_cache.py
+
+"""
+Module: answer_cache
+--------------------
+Semantic cache for LLM answers, stored in SQLite.
+
+An answer is reused when a new query
+- retrieved exactly the same set of chunk IDs,
+- was built from the same prompt template (and chat deployment) and the same
+  index build, and
+- has a query embedding within a cosine-similarity threshold of a cached query.
+
+The prompt template hash and index fingerprint are part of every lookup key,
+so rebuilding the index or editing the prompt file stops old answers from
+matching. Entries of other versions are not deleted eagerly: processes on
+different builds (the app and the API during a rollout) may share one file.
+Old entries age out instead, through `max_items` (oldest first) and
+`ttl_seconds`.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+def text_fingerprint(text: str) -> str:
+    """Returns a short hash of a text, e.g. the prompt template."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def file_fingerprint(*paths: str) -> str:
+    """
+    Returns a short hash identifying the current version of one or more files.
+
+    Args:
+        *paths (str): Files to fingerprint (missing files are skipped).
+
+    Returns:
+        str: Hash of each file's path, size and modification time.
+    """
+    parts = []
+    for path in paths:
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            parts.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+    return text_fingerprint("|".join(parts))
+
+
+def context_key(chunk_ids, prompt_hash: str, index_version: str) -> str:
+    """Builds the lookup key shared by all queries that retrieved the same context."""
+    ids = ",".join(str(i) for i in sorted(int(i) for i in chunk_ids))
+    return hashlib.sha256(f"{prompt_hash}|{index_version}|{ids}".encode("utf-8")).hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    SQLite-backed answer cache keyed on retrieved context plus query similarity.
+
+    Args:
+        path (str | None): SQLite file; falsy disables the cache.
+        prompt_hash (str): Fingerprint of the prompt template (and anything else shaping the
+            answer, such as the chat deployment) in use.
+        index_version (str): Fingerprint of the index build in use.
+        threshold (float): Minimum cosine similarity between query embeddings.
+        max_items (int): Maximum number of cached answers, across all versions.
+        ttl_seconds (float): Age after which an answer expires (0 = never).
+    """
+
+    def __init__(self, path: str | None, prompt_hash: str, index_version: str,
+                 threshold: float = 0.95, max_items: int = 10_000, ttl_seconds: float = 0):
+        self.prompt_hash = prompt_hash
+        self.index_version = index_version
+        self.threshold = threshold
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " id INTEGER PRIMARY KEY, context_key TEXT, prompt_hash TEXT,"
+                " index_version TEXT, query TEXT, vector BLOB, answer TEXT, created REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS answers_context ON answers (context_key)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS answers_created ON answers (created)")
+            self._db.commit()
+
+    def _oldest_valid(self) -> float:
+        """Creation time before which entries have expired."""
+        return time.time() - self.ttl_seconds if self.ttl_seconds else float("-inf")
+
+    def lookup(self, query_embedding: np.ndarray, chunk_ids, count: bool = True) -> str | None:
+        """
+        Returns a cached answer for a similar query over the same context, if any.
+
+        Args:
+            query_embedding (np.ndarray): Embedding of the current query.
+            chunk_ids (Iterable[int]): IDs of the chunks retrieved for the query.
+            count (bool): Record the hit or miss in `stats` (False for look-ahead checks).
+
+        Returns:
+            str | None: The cached answer, or None on a miss.
+        """
+        if self._db is None:
+            return None
+        key = context_key(chunk_ids, self.prompt_hash, self.index_version)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT vector, answer FROM answers WHERE context_key = ? AND created >= ?",
+                (key, self._oldest_valid()),
+            ).fetchall()
+        best_answer = None
+        if rows:
+            query = _unit(query_embedding)
+            vectors = np.stack([np.frombuffer(vector, dtype="float32") for vector, _ in rows])
+            scores = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)) @ query
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                best_answer = rows[best][1]
+        if count:
+            self.stats["hits" if best_answer is not None else "misses"] += 1
+        return best_answer
+
+    def store(self, query: str, query_embedding: np.ndarray, chunk_ids, answer: str):
+        """
+        Caches an answer for a query and its retrieved context.
+
+        Args:
+            query (str): The query text (kept for inspection only).
+            query_embedding (np.ndarray): Embedding of the query.
+            chunk_ids (Iterable[int]): IDs of the chunks the answer was generated from.
+            answer (str): The generated answer.
+        """
+        if self._db is None:
+            return
+        key = context_key(chunk_ids, self.prompt_hash, self.index_version)
+        vector = np.asarray(query_embedding, dtype="float32").ravel()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO answers (context_key, prompt_hash, index_version, query, vector, answer, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, self.prompt_hash, self.index_version, query, vector.tobytes(), answer, time.time()),
+            )
+            # Expired entries, then the oldest beyond the size limit, whatever their version
+            self._db.execute("DELETE FROM answers WHERE created < ?", (self._oldest_valid(),))
+            self._db.execute(
+                "DELETE FROM answers WHERE id IN ("
+                " SELECT id FROM answers ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_items,),
+            )
+            self._db.commit()
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    """Returns the L2-normalized 1D version of a vector."""
+    vector = np.asarray(vector, dtype="float32").ravel()
+    return vector / np.linalg.norm(vector)
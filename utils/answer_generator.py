@@ -5,29 +5,100 @@ Module: answer_generator
 ------------------------
 Responsible for constructing prompts and generating LLM-based answers
 based on the provided context and user query.
+
+Answers are cached semantically: a query close enough to an earlier one that
+retrieved the same chunks reuses the earlier answer instead of calling the LLM.
+
+`stream_answer` streams the completion as token deltas, so callers can render
+the answer from the first token instead of waiting for the whole response.
+The returned stream can be iterated synchronously or with `async for`, and
+`agenerate_answer` / `agenerate_cached_answer` mirror the blocking calls for
+asyncio callers (the HTTP API); both share the pooled clients of
+`utils.azure_openai_client`.
+Time-to-first-token and total generation time are recorded for every answer,
+and prompt building, answer cache lookups and LLM calls are traced as spans
+(with prompt/completion tokens; see `utils.tracing`).
+
+The answer cache and the LLM client are created on first use (see
+`utils.resources`), so importing this module needs no credentials.
 """
 
-from utils.azure_openai_client import client
-from utils.config import DEPLOYMENT_COMPLETION
+import asyncio
+import time
+from collections import deque
+
+from utils.answer_cache import SemanticAnswerCache, file_fingerprint, text_fingerprint
+from utils.azure_openai_client import connection_is_warm, get_async_client, get_client
+from utils.config import (
+    ANSWER_CACHE_PATH,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+    DEPLOYMENT_COMPLETION,
+    OUTPUT_INDEX_PATH,
+    OUTPUT_METADATA_PATH,
+    PROMPT_TOKEN_BUDGET
+)
+from utils.embedder import get_query_embedding
+from utils.prompt_packer import count_tokens, pack_context, packing_settings
 from utils.prompt_loader import load_prompt_template
+from utils.resources import resources
+from utils.tracing import span
 
 # Load prompt template from file (once at import)
 prompt_template = load_prompt_template()
 
+# Answer cache scoped to this prompt template, context packing and chat deployment, and to
+# the index build loaded by this process
+resources.register("answer_cache", lambda: SemanticAnswerCache(
+    ANSWER_CACHE_PATH,
+    prompt_hash=text_fingerprint(f"{prompt_template}\n{packing_settings()}\n{DEPLOYMENT_COMPLETION}"),
+    index_version=file_fingerprint(OUTPUT_INDEX_PATH, OUTPUT_METADATA_PATH),
+    threshold=ANSWER_CACHE_THRESHOLD,
+    max_items=ANSWER_CACHE_SIZE,
+    ttl_seconds=ANSWER_CACHE_TTL_SECONDS
+))
+
+# Timings of the most recent answers, newest last
+answer_timings = deque(maxlen=1000)
+
 
 def build_prompt(chunks: list[str], query: str) -> str:
     """
     Build a prompt using the retrieved context chunks and the user query.
 
+    The chunks are packed into the context with `utils.prompt_packer`:
+    near-duplicates are skipped, rows of the same team and location are
+    merged, and chunks stop being added at PROMPT_TOKEN_BUDGET prompt tokens.
+
     Args:
-        chunks (list[str]): Top-k relevant text chunks.
+        chunks (list[str]): Top-k relevant text chunks, best first.
         query (str): User's input query.
 
     Returns:
         str: Formatted prompt to be passed to the LLM.
     """
-    context = "\n".join(chunks)
-    return prompt_template.format(context=context, query=query)
+    with span("prompt_build", chunks=len(chunks)) as s:
+        overhead = count_tokens(prompt_template.format(context="", query=query))
+        budget = max(PROMPT_TOKEN_BUDGET - overhead, 0) if PROMPT_TOKEN_BUDGET else None
+        packed = pack_context(chunks, budget)
+        prompt = prompt_template.format(context=packed.text, query=query)
+        s.set(prompt_tokens=overhead + packed.tokens, used=packed.used,
+              duplicates=packed.duplicates, dropped=packed.dropped)
+    return prompt
+
+
+def _messages(prompt: str) -> list[dict]:
+    """Builds the chat messages sent for a prompt."""
+    return [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": prompt.strip()}
+    ]
+
+
+def _completion_request(prompt: str) -> dict:
+    """Keyword arguments of the chat completion request for a prompt."""
+    return {"model": DEPLOYMENT_COMPLETION, "messages": _messages(prompt), "temperature": 0.2}
 
 
 def generate_answer(prompt: str) -> str:
@@ -40,12 +111,258 @@ def generate_answer(prompt: str) -> str:
     Returns:
         str: Model-generated answer.
     """
-    response = client.chat.completions.create(
-        model=DEPLOYMENT_COMPLETION,
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt.strip()}
-        ],
-        temperature=0.2
-    )
-    return response.choices[0].message.content.strip()
+    with span("llm_call", model=DEPLOYMENT_COMPLETION, stream=False) as s:
+        response = get_client().chat.completions.create(**_completion_request(prompt))
+        answer = response.choices[0].message.content.strip()
+        _record_tokens(s, response.usage, prompt, answer)
+    return answer
+
+
+async def agenerate_answer(prompt: str) -> str:
+    """
+    Async variant of `generate_answer`, sent through the event loop's async client.
+
+    Args:
+        prompt (str): Fully formatted prompt string.
+
+    Returns:
+        str: Model-generated answer.
+    """
+    with span("llm_call", model=DEPLOYMENT_COMPLETION, stream=False) as s:
+        response = await get_async_client().chat.completions.create(**_completion_request(prompt))
+        answer = response.choices[0].message.content.strip()
+        _record_tokens(s, response.usage, prompt, answer)
+    return answer
+
+
+def _record_tokens(llm_span, usage, prompt: str, answer: str):
+    """Sets tokens_in/tokens_out on an llm_call span, counted locally when the response has no usage."""
+    if usage is not None:
+        llm_span.set(tokens_in=usage.prompt_tokens, tokens_out=usage.completion_tokens)
+    else:
+        llm_span.set(tokens_in=count_tokens(prompt), tokens_out=count_tokens(answer), tokens_estimated=True)
+
+
+def _lookup_answer(query_embedding, chunk_ids: list) -> str | None:
+    """Looks up the answer cache inside an answer_cache span."""
+    with span("answer_cache") as s:
+        cached = resources.answer_cache.lookup(query_embedding, chunk_ids)
+        s.set(cache_hits=int(cached is not None), cache_misses=int(cached is None))
+    return cached
+
+
+def warm_up_connection():
+    """
+    Opens a pooled connection to the Azure OpenAI endpoint ahead of a completion request.
+
+    Sends a cheap model-listing request so the TCP/TLS handshake is already done when
+    the chat completion starts; any failure is ignored (the real request will surface it).
+    Nothing is sent while the pool still holds a recently used connection.
+    """
+    from openai import OpenAIError
+
+    if connection_is_warm():
+        return
+    try:
+        get_client().with_options(max_retries=0, timeout=5.0).models.list()
+    except (OpenAIError, EnvironmentError):
+        pass
+
+
+def prepare_completion(query: str, chunk_ids, query_embedding=None):
+    """
+    Warms up the chat connection if answering a query will need the LLM.
+
+    Meant to run in the background once the chunks are known: a query whose answer
+    is cached never opens a connection.
+
+    Args:
+        query (str): User's input query.
+        chunk_ids (Iterable[int]): IDs of the chunks the prompt is built from.
+        query_embedding (np.ndarray | None): The query's embedding from retrieval; None
+            (lexical-only retrieval) skips the answer cache check, since the semantic
+            cache cannot be looked up without an embedding call.
+    """
+    if query_embedding is None or resources.answer_cache.lookup(
+            query_embedding, list(chunk_ids), count=False) is None:
+        warm_up_connection()
+
+
+def generate_cached_answer(prompt: str, query: str, chunk_ids) -> str:
+    """
+    Returns a cached answer when a similar query retrieved the same chunks,
+    otherwise generates a new answer and caches it.
+
+    Args:
+        prompt (str): Fully formatted prompt string.
+        query (str): User's input query (its embedding is served from the query cache).
+        chunk_ids (Iterable[int]): IDs of the chunks used to build the prompt.
+
+    Returns:
+        str: Model-generated (or cached) answer.
+    """
+    chunk_ids = list(chunk_ids)
+    query_embedding = get_query_embedding(query)[0]
+    cached = _lookup_answer(query_embedding, chunk_ids)
+    if cached is not None:
+        return cached
+
+    answer = generate_answer(prompt)
+    resources.answer_cache.store(query, query_embedding, chunk_ids, answer)
+    return answer
+
+
+async def agenerate_cached_answer(prompt: str, query: str, chunk_ids) -> str:
+    """
+    Async variant of `generate_cached_answer`: the LLM call awaits the async client,
+    while the embedding and answer cache lookups run in worker threads.
+
+    Args:
+        prompt (str): Fully formatted prompt string.
+        query (str): User's input query.
+        chunk_ids (Iterable[int]): IDs of the chunks used to build the prompt.
+
+    Returns:
+        str: Model-generated (or cached) answer.
+    """
+    chunk_ids = list(chunk_ids)
+    query_embedding = (await asyncio.to_thread(get_query_embedding, query))[0]
+    cached = await asyncio.to_thread(_lookup_answer, query_embedding, chunk_ids)
+    if cached is not None:
+        return cached
+
+    answer = await agenerate_answer(prompt)
+    await asyncio.to_thread(resources.answer_cache.store, query, query_embedding, chunk_ids, answer)
+    return answer
+
+
+class AnswerStream:
+    """
+    Iterable (and async iterable) of answer text deltas with per-answer timings.
+
+    Iterating yields the text as it arrives; a cached answer is yielded in one
+    piece. `async for` streams through the async client instead of blocking.
+    Once iteration finishes, the complete answer is cached and the timings are
+    appended to `answer_timings`.
+
+    Attributes:
+        query (str): User's input query.
+        text (str): Answer text received so far (the full answer once exhausted).
+        cached (bool): True if the answer was served from the answer cache.
+        ttft (float | None): Seconds from the start of generation to the first text.
+        total (float | None): Seconds from the start of generation to the last text.
+    """
+
+    def __init__(self, prompt: str, query: str, chunk_ids=None):
+        self.prompt = prompt
+        self.query = query
+        self.chunk_ids = list(chunk_ids) if chunk_ids is not None else None
+        self.text = ""
+        self.cached = False
+        self.ttft = None
+        self.total = None
+
+    def __iter__(self):
+        start = time.perf_counter()
+        query_embedding, cached = self._lookup()
+        if cached is not None:
+            yield self._serve_cached(cached, start)
+            return
+
+        with span("llm_call", model=DEPLOYMENT_COMPLETION, stream=True) as s:
+            response = get_client().chat.completions.create(**_completion_request(self.prompt), stream=True)
+            parts, usage = [], None
+            for chunk in response:
+                usage = getattr(chunk, "usage", None) or usage
+                delta = self._delta(chunk, start, s)
+                if delta:
+                    parts.append(delta)
+                    yield delta
+            self._finish(s, parts, usage, start)
+        self._store(query_embedding)
+
+    async def __aiter__(self):
+        """Async variant of iteration, streaming through the event loop's async client."""
+        start = time.perf_counter()
+        query_embedding, cached = await asyncio.to_thread(self._lookup)
+        if cached is not None:
+            yield self._serve_cached(cached, start)
+            return
+
+        with span("llm_call", model=DEPLOYMENT_COMPLETION, stream=True) as s:
+            response = await get_async_client().chat.completions.create(
+                **_completion_request(self.prompt), stream=True
+            )
+            parts, usage = [], None
+            async for chunk in response:
+                usage = getattr(chunk, "usage", None) or usage
+                delta = self._delta(chunk, start, s)
+                if delta:
+                    parts.append(delta)
+                    yield delta
+            self._finish(s, parts, usage, start)
+        await asyncio.to_thread(self._store, query_embedding)
+
+    def _lookup(self):
+        """Returns the query embedding and the cached answer (both None when the cache is bypassed)."""
+        if self.chunk_ids is None:
+            return None, None
+        query_embedding = get_query_embedding(self.query)[0]
+        return query_embedding, _lookup_answer(query_embedding, self.chunk_ids)
+
+    def _serve_cached(self, cached: str, start: float) -> str:
+        """Records a cached answer as this stream's complete answer."""
+        self.cached = True
+        self.text = cached
+        self.ttft = self.total = time.perf_counter() - start
+        self._record()
+        return cached
+
+    def _delta(self, chunk, start: float, llm_span) -> str | None:
+        """Returns the text of a streamed chunk, recording the time to the first text."""
+        # Azure sends content-filter results in chunks without choices
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            return None
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - start
+            llm_span.set(ttft=self.ttft)
+        return chunk.choices[0].delta.content
+
+    def _finish(self, llm_span, parts: list[str], usage, start: float):
+        """Completes the answer text, token counts and timings once the stream ends."""
+        self.total = time.perf_counter() - start
+        self.text = "".join(parts).strip()
+        _record_tokens(llm_span, usage, self.prompt, self.text)
+        self._record()
+
+    def _store(self, query_embedding):
+        """Caches the complete answer."""
+        if query_embedding is not None and self.text:
+            resources.answer_cache.store(self.query, query_embedding, self.chunk_ids, self.text)
+
+    def _record(self):
+        """Appends this answer's timings to `answer_timings`."""
+        answer_timings.append({
+            "query": self.query,
+            "cached": self.cached,
+            "ttft": self.ttft,
+            "total": self.total,
+        })
+
+
+def stream_answer(prompt: str, query: str, chunk_ids=None) -> AnswerStream:
+    """
+    Streams an answer as text deltas, reusing a cached answer when possible.
+
+    Nothing is sent to the LLM until the returned stream is iterated.
+
+    Args:
+        prompt (str): Fully formatted prompt string.
+        query (str): User's input query.
+        chunk_ids (Iterable[int], optional): IDs of the chunks used to build the prompt;
+            None bypasses the answer cache.
+
+    Returns:
+        AnswerStream: Iterable of text deltas exposing `text`, `ttft` and `total`.
+    """
+    return AnswerStream(prompt, query, chunk_ids)
@@ -0,0 +1,160 @@
+# utils/artifacts.py
+
+"""
+Module: artifacts
+-----------------
+Reads and writes the on-disk search artifacts (FAISS index, chunk embedding
+matrix, chunk metadata) in a layout that can be memory-mapped.
+
+- The FAISS index is opened with FAISS's mmap flags, so flat vector storage
+  and IVF inverted lists are paged in from the file instead of being copied.
+- The embedding matrix is opened with `np.load(mmap_mode="r")`.
+- Metadata is stored as an uncompressed Arrow IPC (Feather v2) file and
+  opened through a memory map; rows are only materialized for the chunk IDs
+  a search actually returns.
+
+Processes that open the same files share their pages through the OS page
+cache, and opening them costs milliseconds regardless of corpus size.
+Writers therefore never modify a file in place: each artifact is written to
+a temporary file and atomically renamed over the old one, so running readers
+keep a consistent view of the previous build.
+"""
+
+import os
+
+import faiss
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Read-only mmap of flat code storage (MMAP_IFC) and IVF inverted lists (MMAP).
+# IVF readers reject the combined flags, so they get the IVF-only variant.
+MMAP_FLAGS = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+MMAP_IVF_FLAGS = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+
+# Precisions supported for the optional rescoring copy of the chunk vectors
+EMBEDDING_DTYPES = ("none", "float32", "float16", "int8")
+
+
+def _replace(tmp_path: str, path: str):
+    """Atomically moves a freshly written temporary file into place."""
+    os.replace(tmp_path, path)
+
+
+def write_index(index: faiss.Index, path: str):
+    """Saves a FAISS index without disturbing processes that have the old file mapped."""
+    faiss.write_index(index, f"{path}.tmp")
+    _replace(f"{path}.tmp", path)
+
+
+def write_embeddings(matrix: np.ndarray, path: str):
+    """Saves the chunk embedding matrix as `.npy` without disturbing mapped readers."""
+    with open(f"{path}.tmp", "wb") as f:
+        np.save(f, matrix)
+    _replace(f"{path}.tmp", path)
+
+
+def quantize_embeddings(vectors: np.ndarray, dtype: str) -> tuple[np.ndarray, float | None]:
+    """
+    Converts normalized vectors to the storage precision used for rescoring.
+
+    int8 uses one symmetric scale for the whole matrix; dot products computed on
+    the int8 values keep the same ranking, and dividing by the scale recovers
+    approximate cosine similarities.
+
+    Args:
+        vectors (np.ndarray): Normalized float32 matrix.
+        dtype (str): "float32", "float16" or "int8".
+
+    Returns:
+        tuple[np.ndarray, float | None]: Stored matrix and the int8 scale (None otherwise).
+    """
+    if dtype == "int8":
+        scale = 127.0 / max(float(np.abs(vectors).max()), 1e-12)
+        return np.round(vectors * scale).astype("int8"), scale
+    return vectors.astype(dtype), None
+
+
+def load_index(path: str, mmap: bool = True) -> faiss.Index:
+    """
+    Opens a FAISS index, memory-mapped and read-only by default.
+
+    Args:
+        path (str): Index file.
+        mmap (bool): Map the file instead of reading it into private memory.
+
+    Returns:
+        faiss.Index: The index.
+    """
+    if not mmap:
+        return faiss.read_index(path)
+    try:
+        return faiss.read_index(path, MMAP_FLAGS)
+    except RuntimeError:
+        return faiss.read_index(path, MMAP_IVF_FLAGS)
+
+
+def load_embeddings(path: str, mmap: bool = True) -> np.ndarray:
+    """
+    Opens the chunk embedding matrix, memory-mapped read-only by default.
+
+    Args:
+        path (str): `.npy` file.
+        mmap (bool): Map the file instead of reading it into private memory.
+
+    Returns:
+        np.ndarray: float32 matrix (a read-only np.memmap when mmap=True).
+    """
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+
+def write_metadata(df: pd.DataFrame, arrow_path: str, csv_path: str | None = None):
+    """
+    Saves chunk metadata as an Arrow IPC file (and optionally as CSV for humans).
+
+    Args:
+        df (pd.DataFrame): Metadata with one row per chunk ID, in ID order.
+        arrow_path (str): Destination Arrow IPC file.
+        csv_path (str, optional): Destination CSV file.
+    """
+    table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+    with pa.OSFile(f"{arrow_path}.tmp", "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    _replace(f"{arrow_path}.tmp", arrow_path)
+    if csv_path:
+        df.to_csv(csv_path, index=False)
+
+
+def load_metadata(arrow_path: str, csv_path: str | None = None) -> pa.Table:
+    """
+    Opens chunk metadata as a memory-mapped Arrow table.
+
+    Falls back to reading the CSV file for builds that predate the Arrow layout.
+
+    Args:
+        arrow_path (str): Arrow IPC metadata file.
+        csv_path (str, optional): Legacy CSV metadata file.
+
+    Returns:
+        pa.Table: Metadata table; row position == chunk ID.
+    """
+    if arrow_path and os.path.exists(arrow_path):
+        return pa.ipc.open_file(pa.memory_map(arrow_path, "r")).read_all()
+    return pa.Table.from_pandas(pd.read_csv(csv_path, dtype={"ChunkHash": str}), preserve_index=False)
+
+
+def lookup_rows(metadata: pa.Table, ids) -> pd.DataFrame:
+    """
+    Materializes the metadata rows of the given chunk IDs.
+
+    Args:
+        metadata (pa.Table): Metadata table from `load_metadata`.
+        ids (array-like): Chunk IDs, in the desired order.
+
+    Returns:
+        pd.DataFrame: The selected rows, indexed by chunk ID.
+    """
+    ids = np.asarray(ids, dtype="int64")
+    rows = metadata.take(pa.array(ids)).to_pandas()
+    rows.index = ids
+    return rows
@@ -3,19 +3,159 @@
 """
 Module: azure_openai_client
 ---------------------------
-Initializes and exposes a configured Azure OpenAI client instance.
+Creates the Azure OpenAI clients shared by the whole process.
+
+Every caller - query embedding, batch indexing, answer generation, the app,
+the CLIs and the HTTP API - goes through `get_client()` (synchronous
+`AzureOpenAI`) or `get_async_client()` (`AsyncAzureOpenAI`). Both sit on one
+tuned, pooled httpx transport per process (per event loop for the async
+client):
+- keep-alive connections are reused across requests and threads, so only the
+  first request pays the TCP/TLS handshake (`AZURE_KEEPALIVE_EXPIRY` keeps
+  idle connections open between interactive queries; httpx closes them after
+  5 seconds by default)
+- the pool is capped (`AZURE_MAX_CONNECTIONS`); extra concurrent requests
+  wait up to `AZURE_TIMEOUT` for a free connection instead of opening sockets
+  without limit
+- HTTP/2 is negotiated when the `h2` package is installed (`AZURE_HTTP2`),
+  multiplexing concurrent requests over a single connection
+- connect and read timeouts are configurable (`AZURE_CONNECT_TIMEOUT`,
+  `AZURE_TIMEOUT`)
+- the time of the last response on the sync transport is tracked, so
+  `connection_is_warm()` tells whether a pooled connection is still open
+
+The sync client (and the `openai` SDK) is created on first use through
+`utils.resources`; `client` stays importable from this module.
 """
 
-from openai import AzureOpenAI
+import asyncio
+import threading
+import time
+import weakref
+from importlib.util import find_spec
+
 from utils.config import (
+    AZURE_CONNECT_TIMEOUT,
+    AZURE_HTTP2,
+    AZURE_KEEPALIVE_EXPIRY,
+    AZURE_MAX_CONNECTIONS,
+    AZURE_MAX_KEEPALIVE_CONNECTIONS,
+    AZURE_MAX_RETRIES,
     AZURE_OPENAI_API_KEY,
     AZURE_OPENAI_ENDPOINT,
-    AZURE_OPENAI_API_VERSION
+    AZURE_OPENAI_API_VERSION,
+    AZURE_TIMEOUT,
+    require_azure_config
 )
+from utils.resources import resources
 
-# Azure OpenAI client instance used throughout the application
-client = AzureOpenAI(
-    api_key=AZURE_OPENAI_API_KEY,
-    api_version=AZURE_OPENAI_API_VERSION,
-    azure_endpoint=AZURE_OPENAI_ENDPOINT
-)
+# httpx async connections belong to the event loop that opened them
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncAzureOpenAI
+_async_lock = threading.Lock()
+_last_response = float("-inf")  # time.monotonic() of the last response on the sync transport
+
+
+def http2_enabled() -> bool:
+    """True if HTTP/2 is requested and the `h2` package is available."""
+    return AZURE_HTTP2 and find_spec("h2") is not None
+
+
+def transport_options() -> dict:
+    """
+    Returns the connection pool settings shared by the sync and async transports.
+
+    Returns:
+        dict: `limits`, `timeout` and `http2` keyword arguments for the SDK's httpx client.
+    """
+    # Built from the SDK's own exports, so they match the httpx flavour it ships with
+    from openai import DEFAULT_CONNECTION_LIMITS, Timeout
+
+    return {
+        "limits": type(DEFAULT_CONNECTION_LIMITS)(
+            max_connections=AZURE_MAX_CONNECTIONS,
+            max_keepalive_connections=AZURE_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=AZURE_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": Timeout(AZURE_TIMEOUT, connect=AZURE_CONNECT_TIMEOUT),
+        "http2": http2_enabled(),
+    }
+
+
+def _client_options() -> dict:
+    """Keyword arguments common to the sync and async Azure OpenAI clients."""
+    require_azure_config()
+    return {
+        "api_key": AZURE_OPENAI_API_KEY,
+        "api_version": AZURE_OPENAI_API_VERSION,
+        "azure_endpoint": AZURE_OPENAI_ENDPOINT,
+        "max_retries": AZURE_MAX_RETRIES,
+    }
+
+
+def _create_client():
+    """Azure OpenAI client instance used throughout the application."""
+    options = _client_options()
+    from openai import AzureOpenAI, DefaultHttpxClient
+
+    return AzureOpenAI(**options, http_client=DefaultHttpxClient(
+        **transport_options(), event_hooks={"response": [_mark_response]}
+    ))
+
+
+def _create_async_client():
+    """Async Azure OpenAI client for the running event loop."""
+    options = _client_options()
+    from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
+
+    return AsyncAzureOpenAI(**options, http_client=DefaultAsyncHttpxClient(**transport_options()))
+
+
+def _mark_response(response):
+    """httpx response hook recording when the sync transport last used a connection."""
+    global _last_response
+    _last_response = time.monotonic()
+
+
+def connection_is_warm() -> bool:
+    """True if the sync client got a response recently enough for its connection to still be pooled."""
+    return time.monotonic() - _last_response < AZURE_KEEPALIVE_EXPIRY
+
+
+resources.register("client", _create_client)
+
+
+def get_client():
+    """Returns the shared Azure OpenAI client (created on first use)."""
+    return resources.client
+
+
+def get_async_client():
+    """
+    Returns the async Azure OpenAI client of the running event loop (created on first use).
+
+    Requests from all coroutines of one loop share its connection pool; a
+    long-running loop (the HTTP API) therefore keeps one pool for its lifetime.
+
+    Raises:
+        RuntimeError: If called outside a running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _async_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = _create_async_client()
+    return client
+
+
+async def aclose_async_client():
+    """Closes the async client of the running event loop, if one was created."""
+    with _async_lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def __getattr__(name: str):
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,156 @@
+# utils/batch_embedder.py
+
+"""
+Module: batch_embedder
+----------------------
+Embeds large lists of text chunks by packing many chunks into each request
+and running a bounded number of requests concurrently. Throttled or failed
+requests are retried with exponential backoff instead of being replaced by
+placeholder vectors.
+"""
+
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=1)
+def retryable_errors() -> tuple:
+    """Errors that are worth retrying; anything else (bad request, auth) fails fast."""
+    import openai  # Imported on first request, so importing this module stays cheap
+
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheaply estimates the number of tokens in a text (~4 characters per token).
+
+    Args:
+        text (str): Input text.
+
+    Returns:
+        int: Approximate token count.
+    """
+    return len(text) // 4 + 1
+
+
+def make_batches(texts: list[str], batch_size: int, max_batch_tokens: int) -> list[list[int]]:
+    """
+    Groups text positions into batches bounded by item count and token budget.
+
+    Args:
+        texts (list[str]): Texts to be embedded.
+        batch_size (int): Maximum number of texts per request.
+        max_batch_tokens (int): Maximum estimated tokens per request.
+
+    Returns:
+        list[list[int]]: Batches of positions into `texts`, in input order.
+    """
+    batches, current, current_tokens = [], [], 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= batch_size or current_tokens + tokens > max_batch_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _retry_delay(error: Exception, attempt: int, backoff_base: float, backoff_cap: float) -> float:
+    """Returns the server-requested Retry-After delay, or a jittered exponential backoff."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return min(float(response.headers.get("retry-after")), backoff_cap)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(backoff_cap, backoff_base * 2 ** attempt))
+
+
+def embed_batch(client, model: str, texts: list[str], max_retries: int = 6,
+                backoff_base: float = 1.0, backoff_cap: float = 60.0,
+                dimensions: int | None = None) -> np.ndarray:
+    """
+    Embeds one batch of texts in a single API request, retrying transient errors.
+
+    Args:
+        client: OpenAI/AzureOpenAI client instance.
+        model (str): Embedding model or deployment name.
+        texts (list[str]): Texts to embed in one request.
+        max_retries (int): Retries before the last error is re-raised.
+        backoff_base (float): Base delay in seconds for exponential backoff.
+        backoff_cap (float): Upper bound in seconds for a single delay.
+        dimensions (int, optional): Output dimension requested from the API
+            (text-embedding-3 models only; default: the model's native dimension).
+
+    Returns:
+        np.ndarray: float32 array of shape (len(texts), embedding_dim).
+    """
+    # Older models and deployments reject the parameter, so it is only sent when set
+    extra = {"dimensions": dimensions} if dimensions else {}
+    for attempt in range(max_retries + 1):
+        try:
+            response = client.embeddings.create(input=texts, model=model, **extra)
+            break
+        except retryable_errors() as e:
+            if attempt == max_retries:
+                raise
+            time.sleep(_retry_delay(e, attempt, backoff_base, backoff_cap))
+
+    data = sorted(response.data, key=lambda item: item.index)
+    return np.array([item.embedding for item in data], dtype="float32")
+
+
+def embed_texts(client, model: str, texts: list[str], batch_size: int = 256,
+                max_batch_tokens: int = 100_000, max_concurrency: int = 4,
+                max_retries: int = 6, progress=None, dimensions: int | None = None) -> np.ndarray:
+    """
+    Embeds a list of texts using batched requests sent through a bounded thread pool.
+
+    Args:
+        client: OpenAI/AzureOpenAI client instance.
+        model (str): Embedding model or deployment name.
+        texts (list[str]): Texts to embed.
+        batch_size (int): Maximum number of texts per request.
+        max_batch_tokens (int): Maximum estimated tokens per request.
+        max_concurrency (int): Maximum number of requests in flight.
+        max_retries (int): Retries per request on rate-limit/transient errors.
+        progress (callable, optional): Called with the number of texts finished per batch.
+        dimensions (int, optional): Output dimension requested from the API.
+
+    Returns:
+        np.ndarray: float32 array of shape (len(texts), embedding_dim), in input order.
+    """
+    if not texts:
+        return np.empty((0, 0), dtype="float32")
+
+    # The SDK's own retries would multiply with ours, so they are disabled here
+    client = client.with_options(max_retries=0)
+    batches = make_batches(texts, batch_size, max_batch_tokens)
+
+    def run(positions: list[int]) -> tuple[list[int], np.ndarray]:
+        vectors = embed_batch(client, model, [texts[i] for i in positions], max_retries=max_retries,
+                              dimensions=dimensions)
+        if progress is not None:
+            progress(len(positions))
+        return positions, vectors
+
+    result = None
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for positions, vectors in executor.map(run, batches):
+            if result is None:
+                result = np.empty((len(texts), vectors.shape[1]), dtype="float32")
+            result[positions] = vectors
+    return result
@@ -21,27 +21,165 @@ AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
 DEPLOYMENT_EMBEDDING = os.getenv("AZURE_OPENAI_DEPLOYMENT")
 DEPLOYMENT_COMPLETION = os.getenv("AZURE_OPENAI_COMPLETION_DEPLOYMENT")
 
+# -------------------------------
+# 🔌 Azure OpenAI Connections
+# -------------------------------
+# One pooled HTTP transport is shared by every client of a process (see utils/azure_openai_client.py)
+AZURE_HTTP2 = os.getenv("AZURE_HTTP2", "true").lower() == "true"  # Used when the `h2` package is installed
+AZURE_MAX_CONNECTIONS = int(os.getenv("AZURE_MAX_CONNECTIONS", "32"))
+AZURE_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AZURE_MAX_KEEPALIVE_CONNECTIONS", "16"))
+AZURE_KEEPALIVE_EXPIRY = float(os.getenv("AZURE_KEEPALIVE_EXPIRY", "120"))  # Seconds an idle connection is kept
+AZURE_CONNECT_TIMEOUT = float(os.getenv("AZURE_CONNECT_TIMEOUT", "5"))
+AZURE_TIMEOUT = float(os.getenv("AZURE_TIMEOUT", "60"))  # Read/write timeout, and wait for a free connection
+AZURE_MAX_RETRIES = int(os.getenv("AZURE_MAX_RETRIES", "2"))
+
+# -------------------------------
+# 🧬 Embedding Backend
+# -------------------------------
+# azure | hashing (offline, deterministic) | sentence-transformers (local CPU model)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "azure")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")            # Local model name (default: all-MiniLM-L6-v2)
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "384"))  # Hashing backend only
+EMBEDDING_QUANTIZE = os.getenv("EMBEDDING_QUANTIZE", "true").lower() == "true"
+
+# -------------------------------
+# 📐 Embedding Dimension
+# -------------------------------
+# Shortened vectors from the API (text-embedding-3 models; empty = native dimension, e.g. 1536)
+EMBEDDING_API_DIMENSIONS = int(os.getenv("EMBEDDING_API_DIMENSIONS") or 0) or None
+# Project vectors to this dimension at build time (0 = keep the backend's dimension; see utils/projection.py)
+EMBEDDING_REDUCED_DIMENSION = int(os.getenv("EMBEDDING_REDUCED_DIMENSION", "0"))
+EMBEDDING_REDUCTION = os.getenv("EMBEDDING_REDUCTION", "pca")  # pca | truncate (Matryoshka models only)
+
 # -------------------------------
 # 📁 File Paths
 # -------------------------------
 INPUT_FILE_PATH = os.getenv("INPUT_FILE")
 OUTPUT_INDEX_PATH = os.getenv("OUTPUT_INDEX")
 OUTPUT_METADATA_PATH = os.getenv("OUTPUT_METADATA")
+METADATA_ARROW_PATH = os.getenv("METADATA_ARROW_PATH", "embeddings/metadata.arrow")
 CHUNK_EMBEDDINGS_PATH = os.getenv("CHUNK_EMBEDDINGS_PATH")
 PROMPT_FILE_PATH = "prompts/prompt_v1.txt"  # Static relative path
 
+# Memory-map the index, embeddings and metadata instead of loading private copies
+MMAP_ARTIFACTS = os.getenv("MMAP_ARTIFACTS", "true").lower() == "true"
+
+# -------------------------------
+# 🧭 ANN Search Tuning
+# -------------------------------
+# Override the nprobe / efSearch values recorded in the index manifest (empty = use manifest)
+FAISS_NPROBE = os.getenv("FAISS_NPROBE")
+FAISS_EF_SEARCH = os.getenv("FAISS_EF_SEARCH")
+# Filtered searches matching at most this many chunks are scored exactly over the subset
+FILTER_BRUTE_FORCE_MAX = int(os.getenv("FILTER_BRUTE_FORCE_MAX", "50000"))
+# Worker processes searching the shards of a sharded build in parallel (0 = single index in-process)
+SEARCH_SHARD_WORKERS = int(os.getenv("SEARCH_SHARD_WORKERS", "0"))
+
+# -------------------------------
+# 🔀 Hybrid Retrieval
+# -------------------------------
+# "hybrid" (BM25 + vectors, fused with reciprocal rank fusion), "vector" or "lexical"
+SEARCH_MODE = os.getenv("SEARCH_MODE", "hybrid")
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# -------------------------------
+# 📏 Variable-k Retrieval
+# -------------------------------
+# Return every chunk that passes a score cutoff instead of a fixed top-N
+VARIABLE_K = os.getenv("VARIABLE_K", "true").lower() == "true"
+# Minimum cosine similarity, and largest gap below the query's best chunk
+# (empty = values calibrated at build time, recorded in the index manifest)
+SEARCH_SCORE_THRESHOLD = os.getenv("SEARCH_SCORE_THRESHOLD")
+SEARCH_SCORE_MARGIN = os.getenv("SEARCH_SCORE_MARGIN")
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "50"))  # Hard cap per query
+
+# -------------------------------
+# 🎚️ Second-Stage Reranker
+# -------------------------------
+# none | overlap | cross-encoder (local CPU model, needs sentence-transformers)
+RERANKER = os.getenv("RERANKER", "none")
+RERANKER_MODEL = os.getenv("RERANKER_MODEL")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))  # First-stage hits scored per query
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+
+# -------------------------------
+# 🧭 Structured Query Routing
+# -------------------------------
+# Answer pure lookups ("List members of the Sales team in Tokyo") from the metadata, without the LLM
+QUERY_ROUTER = os.getenv("QUERY_ROUTER", "true").lower() == "true"
+ROUTER_MAX_ROWS = int(os.getenv("ROUTER_MAX_ROWS", "50"))  # Rows listed in a structured answer
+
+# -------------------------------
+# 🧾 Prompt Packing
+# -------------------------------
+# Maximum prompt tokens (template + context + query); 0 disables the limit
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+PROMPT_DEDUP_THRESHOLD = float(os.getenv("PROMPT_DEDUP_THRESHOLD", "0.95"))  # Word-set Jaccard of duplicates
+PROMPT_COMPACT_TABLES = os.getenv("PROMPT_COMPACT_TABLES", "true").lower() == "true"
+PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", "o200k_base")  # tiktoken encoding, if installed
+
+# -------------------------------
+# 🗄️ Query Embedding Cache
+# -------------------------------
+# Shared SQLite file for cached query embeddings (empty string disables the disk tier)
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", "embeddings/query_cache.sqlite")
+QUERY_CACHE_MEMORY_SIZE = int(os.getenv("QUERY_CACHE_MEMORY_SIZE", "1024"))
+QUERY_CACHE_DISK_SIZE = int(os.getenv("QUERY_CACHE_DISK_SIZE", "100000"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# -------------------------------
+# 💬 Semantic Answer Cache
+# -------------------------------
+# Reuse an LLM answer when a similar query retrieved the same chunks (empty path disables)
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "embeddings/answer_cache.sqlite")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "10000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))  # 0 = no expiry
+
+# -------------------------------
+# 📈 Tracing and Metrics
+# -------------------------------
+# Per-stage spans (durations, tokens, cache hits); see utils/tracing.py
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_FILE = os.getenv("TRACE_FILE", "")            # Append finished traces as JSONL (empty disables)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Serve Prometheus metrics at :PORT/metrics (0 disables)
+# Show the per-stage trace of the last query in the app by default
+TRACE_DEBUG_PANEL = os.getenv("TRACE_DEBUG_PANEL", "false").lower() == "true"
+
+# -------------------------------
+# 🌐 HTTP API
+# -------------------------------
+# Concurrent /search and /ask requests are searched together (see api.py and utils/micro_batcher.py)
+API_MAX_BATCH_SIZE = int(os.getenv("API_MAX_BATCH_SIZE", "64"))
+API_MAX_WAIT_MS = float(os.getenv("API_MAX_WAIT_MS", "5"))  # How long a request waits for others to join
+API_BATCH_CONCURRENCY = int(os.getenv("API_BATCH_CONCURRENCY", "2"))  # Batches searched at the same time
+
 # -------------------------------
 # 🚀 Feature Flags
 # -------------------------------
 # Toggle onboarding modal visibility (true/false in .env)
 SHOW_ONBOARDING = os.getenv("SHOW_ONBOARDING", "false").lower() == "true"
+# Load the index, caches and clients when the app / API starts instead of on the first query
+WARM_UP_ON_START = os.getenv("WARM_UP_ON_START", "true").lower() == "true"
+
+required_vars = {
+    "AZURE_OPENAI_API_KEY": AZURE_OPENAI_API_KEY,
+    "AZURE_OPENAI_ENDPOINT": AZURE_OPENAI_ENDPOINT,
+    "AZURE_OPENAI_API_VERSION": AZURE_OPENAI_API_VERSION,
+    "AZURE_OPENAI_DEPLOYMENT": DEPLOYMENT_EMBEDDING,
+    "AZURE_OPENAI_COMPLETION_DEPLOYMENT": DEPLOYMENT_COMPLETION
+}
+
+
+def require_azure_config():
+    """
+    Checks the Azure OpenAI settings; called when the Azure client is first created,
+    so importing the config (or using offline backends) needs no credentials.
 
-required_vars = [
-    AZURE_OPENAI_API_KEY,
-    AZURE_OPENAI_ENDPOINT,
-    AZURE_OPENAI_API_VERSION,
-    DEPLOYMENT_EMBEDDING,
-    DEPLOYMENT_COMPLETION
-]
-if not all(required_vars):
-    raise EnvironmentError("One or more required environment variables are missing.")
+    Raises:
+        EnvironmentError: If any required variable is missing.
+    """
+    missing = [name for name, value in required_vars.items() if not value]
+    if missing:
+        raise EnvironmentError(f"One or more required environment variables are missing: {', '.join(missing)}")
@@ -4,17 +4,56 @@
 Module: embedder
 ----------------
 Provides a utility function to generate embeddings for a query
-using the Azure OpenAI embedding model.
+using the configured embedding backend (Azure OpenAI by default, or an
+offline backend; see `utils.embedding_backends`).
+
+Query embeddings are cached (in-process LRU + shared SQLite file), so
+repeated queries do not hit the embedding API again. Many queries can be
+embedded at once; cache misses are sent in batched requests.
 """
 
 import numpy as np
-from utils.azure_openai_client import client
-from utils.config import DEPLOYMENT_EMBEDDING
+from utils.config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_DIMENSION,
+    EMBEDDING_MODEL,
+    EMBEDDING_QUANTIZE,
+    QUERY_CACHE_PATH,
+    QUERY_CACHE_MEMORY_SIZE,
+    QUERY_CACHE_DISK_SIZE,
+    QUERY_CACHE_TTL_SECONDS
+)
+from utils.embedding_backends import EmbeddingBackend, create_backend
+from utils.embedding_cache import QueryEmbeddingCache
+from utils.resources import resources
+from utils.tracing import span
+
+# Query embedding cache shared by the app and CLI scripts
+resources.register("query_cache", lambda: QueryEmbeddingCache(
+    QUERY_CACHE_PATH,
+    max_memory_items=QUERY_CACHE_MEMORY_SIZE,
+    max_disk_items=QUERY_CACHE_DISK_SIZE,
+    ttl_seconds=QUERY_CACHE_TTL_SECONDS
+))
+resources.register("embedding_backend", lambda: create_backend(
+    EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_DIMENSION, EMBEDDING_QUANTIZE
+))
+
+
+def __getattr__(name: str):
+    if name == "query_cache":
+        return resources.query_cache
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_backend() -> EmbeddingBackend:
+    """Returns the configured embedding backend (created on first use)."""
+    return resources.embedding_backend
 
 
 def get_query_embedding(query: str) -> np.ndarray:
     """
-    Generates an embedding vector for a given query string using Azure OpenAI.
+    Generates an embedding vector for a given query string with the configured backend.
 
     Args:
         query (str): The natural language query string.
@@ -22,8 +61,43 @@ def get_query_embedding(query: str) -> np.ndarray:
     Returns:
         np.ndarray: A float32 numpy array containing the embedding vector (shape: 1 x embedding_dim).
     """
-    response = client.embeddings.create(
-        input=[query],
-        model=DEPLOYMENT_EMBEDDING
-    )
-    return np.array([response.data[0].embedding], dtype="float32")
+    backend = get_backend()
+    with span("embed", queries=1) as s:
+        cached = resources.query_cache.get(query, backend.identity)
+        if cached is not None:
+            s.set(cache_hits=1)
+            return cached.reshape(1, -1)
+
+        s.set(cache_misses=1)
+        embedding = np.asarray(backend.embed([query]), dtype="float32")
+        resources.query_cache.put(query, backend.identity, embedding[0])
+        return embedding
+
+
+def get_query_embeddings(queries: list[str], backend: EmbeddingBackend | None = None) -> np.ndarray:
+    """
+    Generates embeddings for many queries, embedding only cache misses in batched calls.
+
+    Args:
+        queries (list[str]): Natural language query strings.
+        backend (EmbeddingBackend, optional): Backend to embed with (default: the configured one).
+
+    Returns:
+        np.ndarray: A float32 numpy array of shape (len(queries), embedding_dim).
+    """
+    backend = backend or get_backend()
+    with span("embed", queries=len(queries)) as s:
+        cached = [resources.query_cache.get(query, backend.identity) for query in queries]
+        hits = sum(vec is not None for vec in cached)
+        s.set(cache_hits=hits, cache_misses=len(queries) - hits)
+
+        # Embed each distinct missing query once
+        missing = list(dict.fromkeys(q for q, vec in zip(queries, cached) if vec is None))
+        if missing:
+            vectors = backend.embed(missing)
+            fresh = dict(zip(missing, vectors))
+            for query, vector in fresh.items():
+                resources.query_cache.put(query, backend.identity, vector)
+            cached = [fresh[q] if vec is None else vec for q, vec in zip(queries, cached)]
+
+    return np.vstack(cached).astype("float32") if cached else np.empty((0, 0), dtype="float32")
@@ -0,0 +1,248 @@
+# utils/embedding_backends.py
+
+"""
+Module: embedding_backends
+--------------------------
+Pluggable embedding backends used for both queries and the index build.
+
+Backends:
+- azure:                 Azure OpenAI embeddings deployment (batched, concurrent, retried)
+- hashing:               deterministic feature hashing of words and word pairs; offline,
+                         dependency-free and stable across runs (for CI and air-gapped use)
+- sentence-transformers: local CPU model, batched, with optional int8 dynamic quantization
+                         (needs `pip install sentence-transformers`)
+
+Every backend has an `identity` ("backend:model[:dimension]"). The index
+manifest records the backend, model and dimension that built the index (and
+the projection to a reduced dimension, if any; see `utils.projection`), and
+`check_manifest` refuses to search an index with a different backend or
+dimension.
+"""
+
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+
+from utils.lexical_index import tokenize
+
+BACKENDS = ("azure", "hashing", "sentence-transformers")
+DEFAULT_LOCAL_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class EmbeddingMismatchError(RuntimeError):
+    """Raised when an index was built with a different embedding backend than the active one."""
+
+
+class EmbeddingBackend:
+    """
+    Base class of embedding backends.
+
+    Attributes:
+        name (str): Backend name (one of BACKENDS).
+        model (str): Model or deployment name.
+        dimension (int | None): Output dimension, if known before the first call.
+    """
+    name = ""
+
+    def __init__(self, model: str, dimension: int | None = None):
+        self.model = model
+        self.dimension = dimension
+
+    @property
+    def identity(self) -> str:
+        """Identifies the vector space of this backend (used for caches and stores)."""
+        suffix = f":{self.dimension}" if self.dimension else ""
+        return f"{self.name}:{self.model}{suffix}"
+
+    def describe(self, dimension: int) -> dict:
+        """Returns the manifest entry for an index built with this backend."""
+        return {"backend": self.name, "model": self.model, "dimension": int(dimension)}
+
+    def embed(self, texts: list[str], progress=None) -> np.ndarray:
+        """
+        Embeds texts.
+
+        Args:
+            texts (list[str]): Texts to embed.
+            progress (Callable[[int], None], optional): Called with the number of texts done.
+
+        Returns:
+            np.ndarray: float32 matrix with one row per text.
+        """
+        raise NotImplementedError
+
+
+class AzureOpenAIBackend(EmbeddingBackend):
+    """
+    Azure OpenAI embeddings, sent in token-aware batches with bounded concurrency.
+
+    Args:
+        client: AzureOpenAI client.
+        deployment (str): Embedding deployment name.
+        dimensions (int, optional): Shortened output dimension requested from the API
+            (text-embedding-3 models; default: the model's native dimension).
+        **options: Request tuning passed to `utils.batch_embedder.embed_texts`
+            (batch_size, max_batch_tokens, max_concurrency, max_retries).
+    """
+    name = "azure"
+
+    def __init__(self, client, deployment: str, dimensions: int | None = None, **options):
+        super().__init__(deployment, dimensions or None)
+        self.client = client
+        self.options = options
+
+    def embed(self, texts: list[str], progress=None) -> np.ndarray:
+        from utils.batch_embedder import embed_texts
+        return embed_texts(self.client, self.model, texts, progress=progress,
+                           dimensions=self.dimension, **self.options)
+
+
+@lru_cache(maxsize=1_000_000)
+def _feature_slot(feature: str, dimension: int) -> tuple[int, float]:
+    """Maps a feature to its hashed column and sign."""
+    h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return h % dimension, 1.0 if h >> 63 else -1.0
+
+
+class HashingBackend(EmbeddingBackend):
+    """
+    Deterministic signed feature hashing of words and adjacent word pairs.
+
+    Vectors only capture lexical overlap, but they need no model, network or
+    extra dependency and are identical on every machine.
+
+    Args:
+        dimension (int): Output dimension.
+    """
+    name = "hashing"
+
+    def __init__(self, dimension: int = 384):
+        super().__init__("blake2b-words-bigrams", dimension)
+
+    def embed(self, texts: list[str], progress=None) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype="float32")
+        for i, text in enumerate(texts):
+            tokens = tokenize(text)
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                column, sign = _feature_slot(feature, self.dimension)
+                vectors[i, column] += sign
+        if progress:
+            progress(len(texts))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """
+    Local sentence-transformers model on CPU, encoded in batches.
+
+    With `quantize=True` the model's Linear layers are converted to int8 with
+    PyTorch dynamic quantization, which speeds up CPU inference; the model name
+    recorded in the manifest is suffixed with "@int8" because the vectors differ
+    slightly from the float model.
+
+    Args:
+        model (str): Model name or path.
+        batch_size (int): Texts per forward pass.
+        quantize (bool): Apply int8 dynamic quantization.
+    """
+    name = "sentence-transformers"
+
+    def __init__(self, model: str = DEFAULT_LOCAL_MODEL, batch_size: int = 64, quantize: bool = True):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The sentence-transformers backend needs `pip install sentence-transformers`."
+            ) from e
+
+        encoder = SentenceTransformer(model, device="cpu")
+        if quantize:
+            import torch
+            encoder = torch.quantization.quantize_dynamic(encoder, {torch.nn.Linear}, dtype=torch.qint8)
+        super().__init__(f"{model}@int8" if quantize else model, encoder.get_sentence_embedding_dimension())
+        self.encoder = encoder
+        self.batch_size = batch_size
+
+    def embed(self, texts: list[str], progress=None) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            vectors.append(self.encoder.encode(batch, batch_size=self.batch_size, convert_to_numpy=True,
+                                               normalize_embeddings=True, show_progress_bar=False))
+            if progress:
+                progress(len(batch))
+        if not vectors:
+            return np.empty((0, self.dimension), dtype="float32")
+        return np.vstack(vectors).astype("float32")
+
+
+def create_backend(name: str, model: str | None = None, dimension: int | None = None,
+                   quantize: bool = True, **azure_options) -> EmbeddingBackend:
+    """
+    Creates an embedding backend by name.
+
+    Args:
+        name (str): One of BACKENDS.
+        model (str, optional): Model name (sentence-transformers) or deployment (azure).
+        dimension (int, optional): Output dimension (hashing).
+        quantize (bool): int8 dynamic quantization (sentence-transformers).
+        **azure_options: Request tuning and `dimensions` for the azure backend
+            (`dimensions` defaults to EMBEDDING_API_DIMENSIONS).
+
+    Returns:
+        EmbeddingBackend: The backend.
+
+    Raises:
+        ValueError: For unknown backend names.
+    """
+    if name == "azure":
+        from utils.azure_openai_client import get_client
+        from utils.config import DEPLOYMENT_EMBEDDING, EMBEDDING_API_DIMENSIONS
+        azure_options.setdefault("dimensions", EMBEDDING_API_DIMENSIONS)
+        return AzureOpenAIBackend(get_client(), model or DEPLOYMENT_EMBEDDING, **azure_options)
+    if name == "hashing":
+        return HashingBackend(dimension or 384)
+    if name == "sentence-transformers":
+        return SentenceTransformerBackend(model or DEFAULT_LOCAL_MODEL, quantize=quantize)
+    raise ValueError(f"Unknown embedding backend '{name}'; use one of {BACKENDS}")
+
+
+def check_manifest(manifest: dict, backend: EmbeddingBackend, index_dimension: int):
+    """
+    Verifies that an index was built with the given backend.
+
+    Builds that predate backend tracking are assumed to come from Azure OpenAI.
+    For an index with a reduced dimension the backend must produce the
+    projection's input dimension, and the projection's output must match the index.
+
+    Args:
+        manifest (dict): Index manifest.
+        backend (EmbeddingBackend): Active query backend.
+        index_dimension (int): Dimension of the loaded FAISS index.
+
+    Raises:
+        EmbeddingMismatchError: If backend, model or dimension disagree.
+    """
+    recorded = manifest.get("embedding", {"backend": "azure"})
+    if recorded["backend"] != backend.name or recorded.get("model", backend.model) != backend.model:
+        raise EmbeddingMismatchError(
+            f"The index was built with {recorded['backend']}:{recorded.get('model', '?')} but queries "
+            f"would use {backend.name}:{backend.model}; rebuild the index or change EMBEDDING_BACKEND."
+        )
+    reduction = recorded.get("reduction")
+    if reduction:
+        if reduction["dimension"] != index_dimension:
+            raise EmbeddingMismatchError(
+                f"The index has dimension {index_dimension} but its manifest records a "
+                f"{reduction['dimension']}-dimensional {reduction['method']} projection; rebuild the index."
+            )
+        expected = reduction["input_dimension"]
+    else:
+        expected = index_dimension
+    if backend.dimension and backend.dimension != expected:
+        raise EmbeddingMismatchError(
+            f"The index expects {expected}-dimensional embeddings but {backend.identity} "
+            f"produces {backend.dimension}; rebuild the index or change the embedding settings."
+        )
@@ -0,0 +1,139 @@
+# utils/embedding_cache.py
+
+"""
+Module: embedding_cache
+-----------------------
+Two-tier cache for query embeddings: an in-process LRU in front of a
+SQLite store on disk. The disk tier is shared by every process that points
+at the same file (Streamlit workers, CLI scripts), so a repeated query skips
+the embedding API round-trip entirely.
+
+Entries are keyed by the normalized query text plus the embedding
+deployment name, expire after a TTL, and are evicted least-recently-used
+once either tier is full.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases a query and collapses whitespace so trivial variants share a cache entry."""
+    return " ".join(query.lower().split())
+
+
+def cache_key(query: str, deployment: str) -> str:
+    """Builds the cache key for a (query, deployment) pair."""
+    raw = f"{deployment}\x00{normalize_query(query)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class QueryEmbeddingCache:
+    """
+    In-memory LRU backed by an optional on-disk SQLite store.
+
+    Args:
+        path (str | None): SQLite file for the disk tier; falsy disables it.
+        max_memory_items (int): Capacity of the in-process LRU.
+        max_disk_items (int): Capacity of the disk tier.
+        ttl_seconds (float): Age after which an entry is treated as a miss.
+    """
+
+    def __init__(self, path: str | None, max_memory_items: int = 1024,
+                 max_disk_items: int = 100_000, ttl_seconds: float = 7 * 24 * 3600):
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.ttl_seconds = ttl_seconds
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                " key TEXT PRIMARY KEY, deployment TEXT, query TEXT,"
+                " vector BLOB, created REAL, accessed REAL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS query_embeddings_accessed ON query_embeddings (accessed)"
+            )
+            self._db.commit()
+
+    def get(self, query: str, deployment: str) -> np.ndarray | None:
+        """
+        Looks up the embedding of a query.
+
+        Args:
+            query (str): Raw query text.
+            deployment (str): Embedding deployment the vector was produced with.
+
+        Returns:
+            np.ndarray | None: A copy of the cached 1D float32 vector, or None on a miss.
+        """
+        key = cache_key(query, deployment)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0].copy()
+            self._memory.pop(key, None)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector, created FROM query_embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl_seconds:
+                    self._db.execute("UPDATE query_embeddings SET accessed = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    vector = np.frombuffer(row[0], dtype="float32")
+                    self._remember(key, vector, row[1])
+                    self.stats["disk_hits"] += 1
+                    return vector.copy()
+                if row is not None:
+                    self._db.execute("DELETE FROM query_embeddings WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, query: str, deployment: str, vector: np.ndarray):
+        """
+        Stores the embedding of a query in both tiers.
+
+        Args:
+            query (str): Raw query text.
+            deployment (str): Embedding deployment the vector was produced with.
+            vector (np.ndarray): 1D embedding vector.
+        """
+        key = cache_key(query, deployment)
+        vector = np.array(vector, dtype="float32").ravel()
+        now = time.time()
+        with self._lock:
+            self._remember(key, vector, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, deployment, normalize_query(query), vector.tobytes(), now, now),
+                )
+                self._db.execute(
+                    "DELETE FROM query_embeddings WHERE key IN ("
+                    " SELECT key FROM query_embeddings ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_items,),
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, vector: np.ndarray, created: float):
+        """Inserts into the memory tier, evicting the least recently used entries."""
+        self._memory[key] = (vector, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
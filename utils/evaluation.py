@@ -0,0 +1,161 @@
+# utils/evaluation.py
+
+"""
+Module: evaluation
+------------------
+Labeled query sets and ranking metrics for benchmarking retrieval.
+
+Queries are generated from the structured metadata columns with templates
+such as "Show the {Families} team members from {Locations}."; the relevant
+chunks of a query are all live rows whose columns hold exactly those values.
+The same queries calibrate the score cutoff of variable-k retrieval
+(`calibrate_threshold`).
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+QUERY_TEMPLATES = (
+    ("Show the {Families} team members from {Locations}.", ("Families", "Locations")),
+    ("What events did {People} take part in?", ("People",)),
+    ("Which people {Events}?", ("Events",)),
+    ("List members of the {Families} team based in {Locations}.", ("Families", "Locations")),
+    ("Who in {Locations} {Events}?", ("Locations", "Events")),
+)
+
+
+@dataclass
+class LabeledQuery:
+    """
+    A generated query with its relevant chunk IDs.
+
+    Attributes:
+        query (str): Query text.
+        relevant (np.ndarray): Sorted int64 IDs of the relevant chunks.
+        template (str): Template the query was generated from.
+    """
+    query: str
+    relevant: np.ndarray
+    template: str
+
+
+def labeled_queries(metadata: pd.DataFrame, n: int = 200, seed: int = 0) -> list[LabeledQuery]:
+    """
+    Generates labeled queries from the structured columns of the chunk metadata.
+
+    Args:
+        metadata (pd.DataFrame): Metadata with one row per chunk ID (row position == ID).
+        n (int): Number of queries.
+        seed (int): Random seed for picking the rows that queries are built from.
+
+    Returns:
+        list[LabeledQuery]: Queries cycling through QUERY_TEMPLATES.
+    """
+    metadata = metadata.reset_index(drop=True)
+    live = metadata[~metadata["Deleted"]] if "Deleted" in metadata.columns else metadata
+    templates = [(t, cols) for t, cols in QUERY_TEMPLATES if set(cols).issubset(live.columns)]
+    rng = np.random.default_rng(seed)
+
+    queries = []
+    for i in range(n):
+        template, columns = templates[i % len(templates)]
+        row = live.iloc[int(rng.integers(len(live)))]
+        values = {column: str(row[column]) for column in columns}
+        mask = np.ones(len(live), dtype=bool)
+        for column, value in values.items():
+            mask &= (live[column].astype(str) == value).to_numpy()
+        if "Events" in values:
+            values["Events"] = values["Events"][:1].lower() + values["Events"][1:]
+        queries.append(LabeledQuery(template.format(**values), live.index[mask].to_numpy("int64"), template))
+    return queries
+
+
+def recall_at_k(retrieved, relevant, k: int) -> float:
+    """Fraction of the relevant chunks (at most k of them) found in the top k."""
+    if not len(relevant):
+        return 0.0
+    found = len(set(np.asarray(retrieved)[:k].tolist()) & set(np.asarray(relevant).tolist()))
+    return found / min(len(relevant), k)
+
+
+def reciprocal_rank(retrieved, relevant) -> float:
+    """1 / rank of the first relevant chunk, or 0 if none was retrieved."""
+    relevant = set(np.asarray(relevant).tolist())
+    for rank, chunk_id in enumerate(np.asarray(retrieved).tolist(), start=1):
+        if chunk_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def latency_summary(seconds) -> dict:
+    """
+    Summarizes per-query latencies.
+
+    Args:
+        seconds (Iterable[float]): Latency of each query in seconds.
+
+    Returns:
+        dict: mean, p50, p95 and p99 in milliseconds.
+    """
+    ms = np.asarray(list(seconds), dtype="float64") * 1000
+    if not len(ms):
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"mean_ms": float(ms.mean()), "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+
+
+def _set_metrics(selected: np.ndarray, relevant_mask: np.ndarray, n_relevant: np.ndarray) -> dict:
+    """Mean precision, recall and F1 of per-query result sets given as boolean masks."""
+    tp = (selected & relevant_mask).sum(axis=1)
+    retrieved = selected.sum(axis=1)
+    precision = np.where(retrieved > 0, tp / np.maximum(retrieved, 1), n_relevant == 0)
+    recall = np.where(n_relevant > 0, tp / np.maximum(n_relevant, 1), 1.0)
+    f1 = np.where(retrieved + n_relevant > 0, 2 * tp / np.maximum(retrieved + n_relevant, 1), 1.0)
+    return {"precision": float(precision.mean()), "recall": float(recall.mean()), "f1": float(f1.mean()),
+            "mean_results": float(retrieved.mean())}
+
+
+def calibrate_threshold(scores: np.ndarray, ids: np.ndarray, labeled: list[LabeledQuery],
+                        baseline_top_n: int = 5, steps: int = 50) -> dict:
+    """
+    Picks the variable-k cutoff whose result sets best match the labels (highest mean F1).
+
+    A cutoff keeps the chunks scoring at least `min_score` and at most `margin` below the
+    query's best chunk; both are searched on a grid of score quantiles.
+
+    Args:
+        scores (np.ndarray): Exact cosine similarities of each query's top results, shape
+            (n_queries, max_results), best first; -inf for padding.
+        ids (np.ndarray): Chunk IDs aligned with `scores`; -1 for padding.
+        labeled (list[LabeledQuery]): The queries, with their relevant chunk IDs.
+        baseline_top_n (int): Fixed result count reported for comparison.
+        steps (int): Grid points per parameter.
+
+    Returns:
+        dict: "min_score" and "margin" (None if no margin helps), the precision, recall, F1 and
+        mean result count of that cutoff, and the same metrics of the fixed top
+        `baseline_top_n` under "baseline".
+    """
+    relevant_mask = np.array([np.isin(row, item.relevant) for row, item in zip(ids, labeled)])
+    n_relevant = np.minimum([len(item.relevant) for item in labeled], ids.shape[1])
+    finite = np.isfinite(scores)
+    gaps = np.where(finite, scores[:, :1] - scores, np.inf)
+
+    grid = np.linspace(0, 1, steps + 1)
+    min_scores = np.unique(np.quantile(scores[finite], grid))
+    margins = [None, *np.unique(np.quantile(gaps[finite], grid))]
+
+    best = None
+    for margin in margins:
+        within_margin = finite if margin is None else gaps <= margin
+        for min_score in min_scores:
+            metrics = _set_metrics(within_margin & (scores >= min_score), relevant_mask, n_relevant)
+            if best is None or metrics["f1"] > best["f1"]:
+                best = {"min_score": float(min_score), "margin": None if margin is None else float(margin),
+                        **metrics}
+
+    top_n = (np.arange(ids.shape[1]) < baseline_top_n) & (ids >= 0)
+    best["baseline"] = {"top_n": baseline_top_n, **_set_metrics(top_n, relevant_mask, n_relevant)}
+    return best
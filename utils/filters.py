@@ -0,0 +1,133 @@
+# utils/filters.py
+
+"""
+Module: filters
+---------------
+Inverted indexes over the structured metadata columns (People, Families,
+Locations, Events), used to restrict a search to the rows that match.
+
+Every distinct cell value maps to a sorted NumPy array of chunk IDs (its
+postings). Comma-separated values are also indexed by each part, so
+"Vietnam" matches "Ho Chi Minh City, Vietnam". Matching is case-insensitive.
+
+Filters are given as {column: value or [values]}: values of one column are
+OR-ed, different columns are AND-ed. Resolving a filter costs time
+proportional to the postings involved, not to the corpus size.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+FILTER_COLUMNS = ("People", "Families", "Locations", "Events")
+
+
+def _keys(value: str) -> set[str]:
+    """Returns the lookup keys of a cell value: the value itself and its comma-separated parts."""
+    keys = {value.strip().lower()}
+    if "," in value:
+        keys.update(part.strip().lower() for part in value.split(",") if part.strip())
+    return keys
+
+
+def _labels(value: str) -> set[str]:
+    """Returns the display labels of a cell value (same split as `_keys`, original case)."""
+    labels = {value.strip()}
+    if "," in value:
+        labels.update(part.strip() for part in value.split(",") if part.strip())
+    return labels
+
+
+class FilterIndex:
+    """
+    Per-column postings of chunk IDs for structured filtering.
+
+    Args:
+        postings (dict[str, dict[str, np.ndarray]]): column -> lowercase key -> sorted int64 IDs.
+        labels (dict[str, list[str]]): column -> sorted display values offered to users.
+        n_live (int): Number of searchable (non-deleted) chunks.
+    """
+
+    def __init__(self, postings: dict, labels: dict, n_live: int):
+        self.postings = postings
+        self.labels = labels
+        self.n_live = n_live
+
+    @classmethod
+    def from_table(cls, table: pa.Table, columns=FILTER_COLUMNS) -> "FilterIndex":
+        """
+        Builds the postings from the chunk metadata table.
+
+        Tombstoned rows (`Deleted` column) are left out, as they are not in the FAISS index.
+
+        Args:
+            table (pa.Table): Metadata table; row position == chunk ID.
+            columns (Iterable[str]): Columns to index (missing ones are skipped).
+
+        Returns:
+            FilterIndex: The filter index.
+        """
+        live = np.ones(table.num_rows, dtype=bool)
+        if "Deleted" in table.column_names:
+            live = ~table.column("Deleted").to_numpy(zero_copy_only=False).astype(bool)
+        live_ids = np.flatnonzero(live)
+
+        postings, labels = {}, {}
+        for column in columns:
+            if column not in table.column_names:
+                continue
+            values = table.column(column).to_pandas().fillna("").astype(str).to_numpy()[live_ids]
+            codes, uniques = pd.factorize(values)
+
+            # Group IDs by value code in one sort; each slice is already in ID order
+            order = np.argsort(codes, kind="stable")
+            sorted_ids = live_ids[order]
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+
+            parts, column_labels = {}, set()
+            for code, value in enumerate(uniques):
+                if not value.strip():
+                    continue
+                ids = sorted_ids[bounds[code]:bounds[code + 1]]
+                for key in _keys(value):
+                    parts.setdefault(key, []).append(ids)
+                column_labels.update(_labels(value))
+            postings[column] = {
+                key: ids[0] if len(ids) == 1 else np.unique(np.concatenate(ids))
+                for key, ids in parts.items()
+            }
+            labels[column] = sorted(column_labels)
+        return cls(postings, labels, len(live_ids))
+
+    def values(self, column: str) -> list[str]:
+        """Returns the filter values available for a column."""
+        return self.labels.get(column, [])
+
+    def select(self, filters: dict | None) -> np.ndarray | None:
+        """
+        Resolves a filter to the matching chunk IDs.
+
+        Args:
+            filters (dict[str, str | list[str]] | None): Values per column; empty
+                columns are ignored.
+
+        Returns:
+            np.ndarray | None: Sorted int64 chunk IDs, or None when nothing is filtered.
+
+        Raises:
+            ValueError: If a column is not indexed.
+        """
+        selected = None
+        for column, values in (filters or {}).items():
+            if isinstance(values, str):
+                values = [values]
+            if not values:
+                continue
+            if column not in self.postings:
+                raise ValueError(f"Column '{column}' is not filterable; use one of {list(self.postings)}")
+            column_postings = self.postings[column]
+            matches = [column_postings.get(value.strip().lower()) for value in values]
+            matches = [ids for ids in matches if ids is not None]
+            ids = np.unique(np.concatenate(matches)) if matches else np.empty(0, dtype="int64")
+            selected = ids if selected is None else np.intersect1d(selected, ids, assume_unique=True)
+        return selected
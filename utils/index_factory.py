@@ -0,0 +1,285 @@
+# utils/index_factory.py
+
+"""
+Module: index_factory
+---------------------
+Builds FAISS indexes of a configurable type and tunes them for the corpus size.
+
+Supported index types:
+- flat:        exact brute-force search (baseline)
+- ivf_flat:    inverted lists over full vectors
+- ivf_pq:      inverted lists over product-quantized vectors (much smaller)
+- hnsw:        graph-based search (fast, but no in-place removal)
+- opq_ivf_pq:  IVF-PQ with an OPQ rotation for better PQ accuracy
+- auto:        picks one of the above from the corpus size
+
+Every index is ID-mapped, so chunk IDs survive additions and removals.
+"""
+
+import math
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("auto", "flat", "ivf_flat", "ivf_pq", "hnsw", "opq_ivf_pq")
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Returns an L2-normalized float32 copy of a matrix of vectors.
+
+    With normalized vectors an inner-product index returns cosine similarities.
+
+    Args:
+        vectors (np.ndarray): Matrix of shape (n, d).
+
+    Returns:
+        np.ndarray: Normalized contiguous float32 matrix.
+    """
+    vectors = np.array(vectors, dtype="float32", order="C")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def resolve_index_type(index_type: str, n: int) -> str:
+    """
+    Maps "auto" to a concrete index type for a corpus of `n` vectors.
+
+    Args:
+        index_type (str): Requested type (one of INDEX_TYPES).
+        n (int): Number of vectors.
+
+    Returns:
+        str: Concrete index type.
+    """
+    if index_type != "auto":
+        return index_type
+    if n < 50_000:
+        return "flat"
+    if n < 1_000_000:
+        return "ivf_flat"
+    return "opq_ivf_pq"
+
+
+def choose_params(index_type: str, n: int, d: int) -> dict:
+    """
+    Picks build and search parameters from the corpus size.
+
+    Args:
+        index_type (str): Concrete index type.
+        n (int): Number of vectors.
+        d (int): Vector dimension.
+
+    Returns:
+        dict: Parameters (nlist, pq_m, hnsw_m, train_size, nprobe, ef_search) as applicable.
+    """
+    params = {}
+    if index_type in ("ivf_flat", "ivf_pq", "opq_ivf_pq"):
+        # ~4*sqrt(n) lists, with at least 39 training points per centroid
+        nlist = max(1, min(int(4 * math.sqrt(n)), n // 39))
+        params["nlist"] = nlist
+        params["nprobe"] = min(nlist, max(8, round(math.sqrt(nlist))))
+        params["train_size"] = min(n, 64 * nlist)
+    if index_type in ("ivf_pq", "opq_ivf_pq"):
+        # 8-bit codes for ~16 dimensions per sub-quantizer; PQ training needs 256*39 points
+        pq_m = max(1, d // 16)
+        while d % pq_m:
+            pq_m -= 1
+        params["pq_m"] = pq_m
+        params["train_size"] = min(n, max(params["train_size"], 256 * 39))
+    if index_type == "hnsw":
+        params["hnsw_m"] = 32
+        params["ef_construction"] = 200
+        params["ef_search"] = 128
+    return params
+
+
+def factory_string(index_type: str, params: dict) -> str:
+    """Returns the faiss.index_factory description for an index type."""
+    if index_type == "flat":
+        return "IDMap2,Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{params['nlist']},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{params['nlist']},PQ{params['pq_m']}"
+    if index_type == "opq_ivf_pq":
+        return f"OPQ{params['pq_m']},IVF{params['nlist']},PQ{params['pq_m']}"
+    if index_type == "hnsw":
+        return f"IDMap2,HNSW{params['hnsw_m']},Flat"
+    raise ValueError(f"Unknown index type: {index_type}")
+
+
+def build_index(vectors: np.ndarray, ids: np.ndarray, index_type: str = "flat",
+                metric: int = faiss.METRIC_L2) -> tuple[faiss.Index, dict]:
+    """
+    Builds, trains and fills an ID-mapped FAISS index.
+
+    Args:
+        vectors (np.ndarray): float32 matrix of shape (n, d).
+        ids (np.ndarray): int64 chunk IDs, one per vector.
+        index_type (str): One of INDEX_TYPES.
+        metric (int): faiss.METRIC_L2 or faiss.METRIC_INNER_PRODUCT.
+
+    Returns:
+        tuple[faiss.Index, dict]: The index and a description of how it was built.
+    """
+    n, d = vectors.shape
+    index_type = resolve_index_type(index_type, n)
+    params = choose_params(index_type, n, d)
+    description = factory_string(index_type, params)
+
+    index = faiss.index_factory(d, description, metric)
+    if index_type == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efConstruction = params["ef_construction"]
+    if not index.is_trained:
+        sample = np.random.default_rng(0).choice(n, size=params["train_size"], replace=False)
+        index.train(vectors[np.sort(sample)])
+    index.add_with_ids(vectors, ids)
+
+    apply_search_params(index, params)
+    return index, {"index_type": index_type, "factory": description, "params": params}
+
+
+def apply_search_params(index: faiss.Index, params: dict):
+    """
+    Applies runtime search knobs (nprobe for IVF, efSearch for HNSW) to an index.
+
+    Args:
+        index (faiss.Index): Index to tune.
+        params (dict): May contain "nprobe" and/or "ef_search".
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and params.get("nprobe"):
+        ivf.nprobe = int(params["nprobe"])
+
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexHNSW) and params.get("ef_search"):
+        inner.hnsw.efSearch = int(params["ef_search"])
+
+
+def _search_params(index: faiss.Index, allowed_ids: np.ndarray | None):
+    """
+    Search parameters restricting a search to the given chunk IDs (None when unrestricted).
+
+    IVF indexes probe proportionally more lists when only a fraction of each list is eligible.
+    """
+    if allowed_ids is None:
+        return None
+    selector = faiss.IDSelectorBatch(allowed_ids)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        return faiss.SearchParameters(sel=selector)
+
+    fraction = min(len(allowed_ids) / max(index.ntotal, 1), 1.0)
+    nprobe = min(ivf.nlist, int(np.ceil(ivf.nprobe / max(fraction, 1e-6))))
+    return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+
+
+def search_index(index: faiss.Index, queries: np.ndarray, k: int,
+                 allowed_ids: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Searches an index, optionally restricted to the given chunk IDs.
+
+    Restricted searches pass an IDSelector; IVF indexes probe proportionally
+    more lists when only a fraction of each list is eligible.
+
+    Args:
+        index (faiss.Index): Index to search.
+        queries (np.ndarray): float32 query matrix.
+        k (int): Number of results per query.
+        allowed_ids (np.ndarray, optional): Sorted chunk IDs the search is restricted to.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: FAISS distances and IDs, shape (n_queries, k).
+    """
+    params = _search_params(index, allowed_ids)
+    if params is None:
+        return index.search(queries, k)
+    return index.search(queries, k, params=params)
+
+
+def range_search_index(index: faiss.Index, queries: np.ndarray, min_score: float, k: int,
+                       allowed_ids: np.ndarray | None = None,
+                       margin: float | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Finds the chunks scoring at least `min_score` (inner-product indexes), best k first.
+
+    Index types without range search support fall back to a top-k search cut at
+    `min_score`; their totals are then only counted within the top k.
+
+    Args:
+        index (faiss.Index): Inner-product index to search.
+        queries (np.ndarray): float32 query matrix.
+        min_score (float): Lowest inner product (cosine similarity) returned.
+        k (int): Maximum number of results per query.
+        allowed_ids (np.ndarray, optional): Sorted chunk IDs the search is restricted to.
+        margin (float, optional): Only count chunks within this margin of a query's best score.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Scores and IDs of shape (n_queries, k), best
+        first, padded with -inf / -1, and the number of chunks in range per query.
+    """
+    params = _search_params(index, allowed_ids)
+    try:
+        lims, D, I = index.range_search(queries, float(min_score), params=params)
+    except RuntimeError:
+        D, I = search_index(index, queries, k, allowed_ids)
+        in_range = (I >= 0) & (D >= min_score)
+        if margin is not None:
+            in_range &= D >= D[:, :1] - margin
+        return np.where(in_range, D, -np.inf).astype("float32"), np.where(in_range, I, -1), in_range.sum(axis=1)
+
+    scores = np.full((len(queries), k), -np.inf, dtype="float32")
+    ids = np.full((len(queries), k), -1, dtype="int64")
+    totals = np.zeros(len(queries), dtype="int64")
+    for i in range(len(queries)):
+        row_scores, row_ids = D[lims[i]:lims[i + 1]], I[lims[i]:lims[i + 1]]
+        if margin is not None and len(row_scores):
+            in_margin = row_scores >= row_scores.max() - margin
+            row_scores, row_ids = row_scores[in_margin], row_ids[in_margin]
+        top = np.argsort(-row_scores, kind="stable")[:k]
+        scores[i, :len(top)] = row_scores[top]
+        ids[i, :len(top)] = row_ids[top]
+        totals[i] = len(row_scores)
+    return scores, ids, totals
+
+
+def supports_removal(index: faiss.Index) -> bool:
+    """Returns True if vectors can be removed from the index in place (HNSW cannot)."""
+    try:
+        index.remove_ids(faiss.IDSelectorBatch(np.empty(0, dtype="int64")))
+        return True
+    except RuntimeError:
+        return False
+
+
+def recall_at_k(index: faiss.Index, vectors: np.ndarray, ids: np.ndarray, k: int = 10,
+                n_queries: int = 200, metric: int = faiss.METRIC_L2) -> float:
+    """
+    Measures recall@k of an index against exact search over the same vectors.
+
+    A sample of the corpus vectors is used as queries.
+
+    Args:
+        index (faiss.Index): Index under test.
+        vectors (np.ndarray): The vectors the index was built from.
+        ids (np.ndarray): Chunk IDs of `vectors`.
+        k (int): Number of neighbours compared.
+        n_queries (int): Number of sampled query vectors.
+        metric (int): Metric of the index.
+
+    Returns:
+        float: Mean fraction of the exact top-k found by the index.
+    """
+    k = min(k, len(vectors))
+    sample = np.random.default_rng(1).choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = vectors[sample]
+
+    exact = faiss.IndexFlat(vectors.shape[1], metric)
+    exact.add(vectors)
+    _, exact_positions = exact.search(queries, k)
+    _, found = index.search(queries, k)
+
+    expected = ids[exact_positions]
+    hits = [len(set(e) & set(f)) for e, f in zip(expected, found)]
+    return float(np.sum(hits) / expected.size)
@@ -0,0 +1,49 @@
+# utils/index_manifest.py
+
+"""
+Module: index_manifest
+----------------------
+Reads and writes the JSON manifest stored next to the FAISS index file.
+The manifest records how the index was built (index type, parameters,
+dimension, recall measured at build time) so the search side can apply the
+matching runtime settings.
+"""
+
+import json
+import os
+
+
+def manifest_path(index_path: str) -> str:
+    """Returns the manifest location for a FAISS index file."""
+    return f"{index_path}.json"
+
+
+def read_manifest(index_path: str) -> dict:
+    """
+    Loads the manifest of an index.
+
+    Args:
+        index_path (str): Path of the FAISS index file.
+
+    Returns:
+        dict: Manifest contents, or an empty dict for indexes built without one.
+    """
+    path = manifest_path(index_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(index_path: str, manifest: dict):
+    """
+    Saves the manifest of an index atomically (a crash leaves the previous manifest intact).
+
+    Args:
+        index_path (str): Path of the FAISS index file.
+        manifest (dict): JSON-serializable build information.
+    """
+    path = manifest_path(index_path)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
@@ -0,0 +1,255 @@
+# utils/ingest.py
+
+"""
+Module: ingest
+--------------
+Streams raw people data into the columnar input of the embedding stage.
+
+The raw file is read in batches of at most `batch_size` rows, so memory stays
+constant however many rows the file holds:
+- CSV:     `pyarrow.csv.open_csv` (streaming block parser, every column
+           read as a string)
+- Parquet: `ParquetFile.iter_batches`, reading only the needed columns
+- XLSX:    openpyxl in read-only mode, one sheet row at a time
+
+Each batch is cleaned and turned into text chunks with Arrow compute kernels
+(no per-row Python): column names are matched case-insensitively, values are
+stripped, rows missing any of People / Families / Locations / Events are
+dropped, and the TextChunk sentence is
+
+    "<People> is part of the <Families> team, based in <Locations>, and recently <events>."
+
+Batches are appended to a Parquet (or CSV) file as they are produced; the
+file is written under a temporary name and renamed into place when complete.
+`read_dataset` loads the result (or any older Excel/CSV input) for
+`scripts/embed_and_index.py`.
+"""
+
+import csv
+import os
+from collections.abc import Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+# Columns every input row needs, and the column of the generated sentences
+COLUMNS = ("People", "Families", "Locations", "Events")
+TEXT_COLUMN = "TextChunk"
+SCHEMA = pa.schema([(name, pa.string()) for name in COLUMNS + (TEXT_COLUMN,)])
+
+INPUT_FORMATS = (".csv", ".parquet", ".xlsx")
+OUTPUT_FORMATS = (".parquet", ".csv")
+# Bytes per CSV block; the reader parses a few dozen blocks ahead of the consumer,
+# so this (not the batch size) bounds its memory
+CSV_BLOCK_SIZE = 1 << 20
+
+
+def _file_format(path: str, formats: tuple[str, ...]) -> str:
+    """Returns the extension of a path, checked against the supported formats."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in formats:
+        raise ValueError(f"Unsupported file type '{extension}' for {path} (expected {', '.join(formats)})")
+    return extension
+
+
+def _resolve_columns(names) -> dict[str, str]:
+    """
+    Maps the required columns to the file's own column names.
+
+    Args:
+        names (Iterable[str]): Column names of the input file.
+
+    Returns:
+        dict[str, str]: Required column -> column name in the file.
+
+    Raises:
+        ValueError: If a required column is missing.
+    """
+    found = {}
+    for name in names:
+        key = str(name).strip().lower()
+        for column in COLUMNS:
+            if key == column.lower():
+                found.setdefault(column, name)
+    missing = [column for column in COLUMNS if column not in found]
+    if missing:
+        raise ValueError(f"Input is missing the column(s): {', '.join(missing)}")
+    return found
+
+
+def _csv_batches(path: str, batch_size: int) -> Iterator[pa.RecordBatch]:
+    """Yields the rows of a CSV file in batches, every column parsed as a string."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader(f), [])
+    columns = _resolve_columns(header)
+    reader = pa_csv.open_csv(
+        path,
+        read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=list(columns.values()),
+            column_types={name: pa.string() for name in columns.values()},
+            strings_can_be_null=True,
+        ),
+    )
+    # Blocks are sized in bytes, not rows; regroup them into batches of exactly batch_size
+    # rows, carrying the remainder of each block over to the next batch
+    buffer, rows = [], 0
+    for block in reader:
+        buffer.append(block.select(list(columns.values())).rename_columns(list(columns)))
+        rows += block.num_rows
+        if rows >= batch_size:
+            batches = pa.Table.from_batches(buffer).combine_chunks().to_batches(max_chunksize=batch_size)
+            buffer = [batches.pop()] if batches[-1].num_rows < batch_size else []
+            rows = sum(batch.num_rows for batch in buffer)
+            yield from batches
+    if buffer:
+        yield from pa.Table.from_batches(buffer).combine_chunks().to_batches(max_chunksize=batch_size)
+
+
+def _parquet_batches(path: str, batch_size: int) -> Iterator[pa.RecordBatch]:
+    """Yields the required columns of a Parquet file in row batches."""
+    parquet = pq.ParquetFile(path)
+    columns = _resolve_columns(parquet.schema_arrow.names)
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=list(columns.values())):
+        yield batch.select(list(columns.values())).rename_columns(list(columns))
+
+
+def _xlsx_batches(path: str, batch_size: int) -> Iterator[pa.RecordBatch]:
+    """Yields the rows of the first sheet of an Excel workbook in batches."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        columns = _resolve_columns(name for name in header if name is not None)
+        positions = [list(header).index(columns[column]) for column in COLUMNS]
+
+        def to_batch(values):
+            return pa.RecordBatch.from_arrays(
+                [pa.array([None if row[i] is None else str(row[i]) for row in values], pa.string())
+                 for i in positions],
+                names=list(COLUMNS),
+            )
+
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) == batch_size:
+                yield to_batch(buffer)
+                buffer = []
+        if buffer:
+            yield to_batch(buffer)
+    finally:
+        workbook.close()
+
+
+def iter_batches(path: str, batch_size: int = 100_000) -> Iterator[pa.RecordBatch]:
+    """
+    Streams the People, Families, Locations and Events columns of a raw file.
+
+    Args:
+        path (str): CSV, Parquet or XLSX file.
+        batch_size (int): Rows per batch.
+
+    Yields:
+        pa.RecordBatch: String columns named as in `COLUMNS`.
+    """
+    readers = {".csv": _csv_batches, ".parquet": _parquet_batches, ".xlsx": _xlsx_batches}
+    yield from readers[_file_format(path, INPUT_FORMATS)](path, batch_size)
+
+
+def text_chunks(table: pa.Table | pa.RecordBatch) -> pa.Array:
+    """
+    Builds the TextChunk sentence of every row.
+
+    Args:
+        table (pa.Table | pa.RecordBatch): Rows with People, Families, Locations and Events.
+
+    Returns:
+        pa.Array: One sentence per row.
+    """
+    parts = [pc.cast(table.column(column), pa.string()) for column in COLUMNS]
+    people, families, locations, events = parts
+    return pc.binary_join_element_wise(
+        people, " is part of the ", families, " team, based in ", locations,
+        ", and recently ", pc.utf8_lower(events), ".", "",
+    )
+
+
+def clean_batch(batch: pa.RecordBatch) -> pa.RecordBatch:
+    """
+    Strips the values of a raw batch, drops incomplete rows and adds the TextChunk.
+
+    Args:
+        batch (pa.RecordBatch): Batch from `iter_batches`.
+
+    Returns:
+        pa.RecordBatch: Batch with the `SCHEMA` columns.
+    """
+    columns = [pc.utf8_trim_whitespace(pc.cast(batch.column(column), pa.string())) for column in COLUMNS]
+    complete = None
+    for values in columns:
+        valid = pc.fill_null(pc.not_equal(values, ""), False)
+        complete = valid if complete is None else pc.and_(complete, valid)
+    cleaned = pa.RecordBatch.from_arrays(columns, names=list(COLUMNS)).filter(complete)
+    return pa.RecordBatch.from_arrays(
+        cleaned.columns + [text_chunks(cleaned)], schema=SCHEMA
+    )
+
+
+def ingest(input_path: str, output_path: str, batch_size: int = 100_000) -> dict:
+    """
+    Converts a raw file into the Parquet/CSV input of the embedding stage, batch by batch.
+
+    Args:
+        input_path (str): Raw CSV, Parquet or XLSX file.
+        output_path (str): `.parquet` (recommended) or `.csv` file to write.
+        batch_size (int): Rows read, cleaned and written at a time.
+
+    Returns:
+        dict: Rows read, rows written and batches processed.
+    """
+    output_format = _file_format(output_path, OUTPUT_FORMATS)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    if output_format == ".parquet":
+        writer = pq.ParquetWriter(tmp_path, SCHEMA)
+    else:
+        writer = pa_csv.CSVWriter(tmp_path, SCHEMA)
+
+    stats = {"rows_read": 0, "rows_written": 0, "batches": 0}
+    try:
+        for batch in iter_batches(input_path, batch_size):
+            cleaned = clean_batch(batch)
+            writer.write_batch(cleaned)
+            stats["rows_read"] += batch.num_rows
+            stats["rows_written"] += cleaned.num_rows
+            stats["batches"] += 1
+    except BaseException:
+        writer.close()
+        os.remove(tmp_path)
+        raise
+    writer.close()
+    os.replace(tmp_path, output_path)
+    return stats
+
+
+def read_dataset(path: str) -> pd.DataFrame:
+    """
+    Loads a processed (or generated) dataset in the format given by the file extension.
+
+    Args:
+        path (str): Parquet, CSV or Excel file.
+
+    Returns:
+        pd.DataFrame: The dataset.
+    """
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    if path.endswith(".csv"):
+        return pd.read_csv(path, dtype=str, keep_default_na=False)
+    return pd.read_excel(path)
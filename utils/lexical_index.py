@@ -0,0 +1,149 @@
+# utils/lexical_index.py
+
+"""
+Module: lexical_index
+---------------------
+A compact BM25 inverted index over the TextChunk column.
+
+The index is array-backed (CSR layout) and saved as an `.npz` file next to
+the FAISS index:
+- terms:    sorted vocabulary (looked up with a binary search)
+- offsets:  start of each term's postings, length len(terms) + 1
+- doc_ids:  chunk IDs of all postings, grouped by term
+- weights:  precomputed BM25 contribution of each posting
+
+Because the BM25 weight of every (term, chunk) pair is computed at build
+time, scoring a query only touches the postings of its terms: a handful of
+array slices and one `np.bincount`. Exact-name lookups therefore run in
+microseconds and never need an embedding call.
+"""
+
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def lexical_index_path(index_path: str) -> str:
+    """Returns the lexical index location for a FAISS index file."""
+    return f"{index_path}.bm25.npz"
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercases a text and splits it into alphanumeric tokens."""
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index with postings stored as NumPy arrays.
+
+    Args:
+        terms (np.ndarray): Sorted vocabulary.
+        offsets (np.ndarray): int64 postings offsets per term (len(terms) + 1).
+        doc_ids (np.ndarray): int64 chunk IDs, grouped by term and sorted within a term.
+        weights (np.ndarray): float32 BM25 weight per posting.
+    """
+
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, doc_ids: np.ndarray, weights: np.ndarray):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+
+    @classmethod
+    def build(cls, texts, ids, k1: float = 1.2, b: float = 0.75) -> "LexicalIndex":
+        """
+        Builds the index from chunk texts.
+
+        Args:
+            texts (Iterable[str]): Text of each chunk.
+            ids (Iterable[int]): Chunk ID of each text.
+            k1 (float): BM25 term-frequency saturation.
+            b (float): BM25 length normalization.
+
+        Returns:
+            LexicalIndex: The index.
+        """
+        vocabulary = {}
+        term_ids, doc_ids, tfs, doc_lengths = [], [], [], []
+        for doc_id, text in zip(ids, texts):
+            tokens = tokenize(text)
+            counts = Counter(tokens)
+            term_ids.extend(vocabulary.setdefault(term, len(vocabulary)) for term in counts)
+            doc_ids.extend([int(doc_id)] * len(counts))
+            tfs.extend(counts.values())
+            doc_lengths.extend([len(tokens)] * len(counts))
+
+        # Renumber terms in sorted order and group the postings by term
+        terms = np.array(sorted(vocabulary), dtype=str)
+        rank = np.empty(len(vocabulary), dtype="int64")
+        rank[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+        term_ids = rank[np.asarray(term_ids, dtype="int64")]
+        doc_ids = np.asarray(doc_ids, dtype="int64")
+        order = np.lexsort((doc_ids, term_ids))
+        term_ids, doc_ids = term_ids[order], doc_ids[order]
+        tfs = np.asarray(tfs, dtype="float32")[order]
+        doc_lengths = np.asarray(doc_lengths, dtype="float32")[order]
+
+        df = np.bincount(term_ids, minlength=len(terms))
+        offsets = np.concatenate([[0], np.cumsum(df)]).astype("int64")
+
+        # Precompute BM25 weights: idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+        n_docs = len(np.unique(doc_ids))
+        avgdl = float(doc_lengths.mean()) if len(doc_lengths) else 1.0
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype("float32")
+        weights = idf[term_ids] * tfs * (k1 + 1) / (tfs + k1 * (1 - b + b * doc_lengths / avgdl))
+        return cls(terms, offsets, doc_ids, weights.astype("float32"))
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        """Loads an index saved with `save`."""
+        with np.load(path) as data:
+            return cls(data["terms"], data["offsets"], data["doc_ids"], data["weights"])
+
+    def save(self, path: str):
+        """Saves the index as an uncompressed `.npz` file (atomically replaced)."""
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez(f, terms=self.terms, offsets=self.offsets, doc_ids=self.doc_ids, weights=self.weights)
+        os.replace(f"{path}.tmp", path)
+
+    def search(self, query: str, k: int = 10, allowed_ids: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Scores chunks against a query with BM25.
+
+        Args:
+            query (str): Query text.
+            k (int): Number of results.
+            allowed_ids (np.ndarray, optional): Sorted chunk IDs the search is restricted to.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Chunk IDs and BM25 scores, best first (at most k).
+        """
+        tokens = np.unique(tokenize(query))
+        if not len(tokens) or not len(self.terms):
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+
+        # Binary-search the vocabulary; tokens that are not in it have no postings
+        positions = np.searchsorted(self.terms, tokens)
+        found = positions < len(self.terms)
+        found[found] = self.terms[positions[found]] == tokens[found]
+        positions = positions[found]
+        if not len(positions):
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+
+        docs = np.concatenate([self.doc_ids[self.offsets[p]:self.offsets[p + 1]] for p in positions])
+        weights = np.concatenate([self.weights[self.offsets[p]:self.offsets[p + 1]] for p in positions])
+        if allowed_ids is not None:
+            keep = np.isin(docs, allowed_ids, assume_unique=False)
+            docs, weights = docs[keep], weights[keep]
+
+        # Sum the contributions per chunk over the touched postings only
+        unique_docs, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights).astype("float32")
+        top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return unique_docs[top], scores[top]
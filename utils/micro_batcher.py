@@ -0,0 +1,117 @@
+# utils/micro_batcher.py
+
+"""
+Module: micro_batcher
+---------------------
+Groups concurrent asyncio requests into batches for one blocking batch call.
+
+A request waits at most `max_wait_ms` for others to join its batch; a batch
+is sent as soon as it holds `max_batch_size` requests. Only requests with the
+same key (e.g. the same k, filters and search mode) share a batch. At most
+`max_concurrency` batches run at once, in worker threads; while they run, new
+requests keep accumulating, so batches grow with the load instead of requests
+queueing up one by one.
+
+Used by the HTTP service (`api.py`) to send concurrent searches through one
+batched embedding call and one FAISS batch search (`search_many`).
+"""
+
+import asyncio
+import contextvars
+from typing import Any, Callable, Hashable
+
+
+class MicroBatcher:
+    """
+    Collects concurrent `submit` calls into batches of `func(key, items)`.
+
+    Args:
+        func (Callable[[Hashable, list], list]): Blocking batch function; returns one
+            result per item, in order. Runs in a worker thread.
+        max_batch_size (int): Maximum items per batch.
+        max_wait_ms (float): Longest time the first item of a batch waits for others.
+        max_concurrency (int): Maximum batches running at the same time.
+    """
+
+    def __init__(self, func: Callable[[Hashable, list], list], max_batch_size: int = 64,
+                 max_wait_ms: float = 5.0, max_concurrency: int = 2):
+        self.func = func
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.max_concurrency = max(1, max_concurrency)
+        self.stats = {"batches": 0, "items": 0, "largest_batch": 0}
+        self._pending = {}   # key -> [(item, future), ...]
+        self._timers = {}    # key -> asyncio.TimerHandle of the oldest pending item
+        self._ready = {}     # keys whose batch is due, in order (dict as ordered set)
+        self._running = 0
+        self._tasks = set()
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        """
+        Adds an item to the next batch of its key and waits for its result.
+
+        Args:
+            key (Hashable): Items with equal keys may share a batch.
+            item (Any): Input of the batch function.
+
+        Returns:
+            Any: The batch function's result for this item (its exception is re-raised).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._pending.setdefault(key, [])
+        queue.append((item, future))
+        if len(queue) >= self.max_batch_size:
+            self._mark_ready(key)
+        elif key not in self._timers and key not in self._ready:
+            self._timers[key] = loop.call_later(self.max_wait, self._mark_ready, key)
+        return await future
+
+    def _mark_ready(self, key: Hashable):
+        """Marks the pending items of a key as due and starts batches if possible."""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        self._ready[key] = None
+        self._drain()
+
+    def _drain(self):
+        """Starts due batches while fewer than `max_concurrency` are running."""
+        while self._ready and self._running < self.max_concurrency:
+            key = next(iter(self._ready))
+            queue = self._pending.pop(key, [])
+            batch, rest = queue[:self.max_batch_size], queue[self.max_batch_size:]
+            if rest:
+                self._pending[key] = rest
+            else:
+                del self._ready[key]
+            # Skip requests whose caller went away (e.g. a client disconnect)
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+            self._running += 1
+            # A fresh context, so a batch is not attributed to the request that started it
+            task = asyncio.get_running_loop().create_task(self._run(key, batch), context=contextvars.Context())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable, batch: list):
+        """Runs one batch in a worker thread and resolves its futures."""
+        self.stats["batches"] += 1
+        self.stats["items"] += len(batch)
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+        try:
+            results = await asyncio.to_thread(self.func, key, [item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._running -= 1
+            self._drain()
@@ -0,0 +1,195 @@
+# utils/pipeline.py
+
+"""
+Module: pipeline
+----------------
+Runs the retrieval steps of a RAG query as an instrumented asyncio pipeline.
+
+Stages (in order):
+- route:   answer pure lookups ("List members of the Data Science team in
+           Tokyo") straight from the metadata columns; the remaining stages
+           and the LLM call are skipped for them (see `utils.query_router`)
+- embed:   embed the query (served from the query cache when possible;
+           skipped in lexical-only mode)
+- search:  FAISS and/or BM25 search plus reranking / rank fusion (a fixed
+           top-N, or every chunk passing a `ScoreCutoff`)
+- prompt:  materialize the hit rows and build the LLM prompt
+
+Each stage runs in a worker thread and reports `StageEvent`s ("started" and
+"finished", with the measured duration), so callers can show real progress
+instead of fixed delays. The finer-grained spans of the stages (see
+`utils.tracing`) are collected into a "query" trace, or into the caller's
+trace when one is active. Once the chunks are known, opening the connection to
+the chat endpoint starts in the background, concurrently with the prompt
+stage - unless the answer cache already holds the answer or the pool still
+has a recently used connection.
+The answer itself is then streamed with `utils.answer_generator.stream_answer`.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+import pandas as pd
+
+from utils.answer_generator import build_prompt, prepare_completion
+from utils.artifacts import lookup_rows
+from utils.config import QUERY_ROUTER, ROUTER_MAX_ROWS
+from utils.embedder import get_query_embedding
+from utils.query_router import route_query
+from utils.resources import resources
+from utils.search_engine import ScoreCutoff, hits_to_frame, hybrid_search, resolve_search_mode, select_ids
+from utils.tracing import trace
+
+STAGES = ("route", "embed", "search", "prompt")
+
+# Background work that must not hold up the pipeline (asyncio.run waits for its own executor)
+_background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline-warm-up")
+
+
+@dataclass
+class StageEvent:
+    """
+    Progress notification for one pipeline stage.
+
+    Attributes:
+        stage (str): One of STAGES.
+        status (str): "started" or "finished".
+        seconds (float | None): Duration of the stage (set when finished).
+    """
+    stage: str
+    status: str
+    seconds: float | None = None
+
+
+@dataclass
+class RetrievalResult:
+    """
+    Output of the retrieval pipeline for one query.
+
+    Attributes:
+        query (str): The user query.
+        results (pd.DataFrame): Reranked metadata rows with "Score", indexed by chunk ID.
+        chunks (list[str]): TextChunks of `results`, best first.
+        prompt (str): Prompt built from `chunks` and the query ("" for routed queries).
+        timings (dict[str, float]): Seconds spent in each stage.
+        answer (str | None): Answer of a structured query, computed from the metadata;
+            None if the query needs the LLM.
+        total (int | None): With a score cutoff, the number of chunks that passed it (more
+            than `len(results)` when the results were cut at SEARCH_MAX_RESULTS).
+    """
+    query: str
+    results: pd.DataFrame
+    chunks: list[str]
+    prompt: str
+    timings: dict[str, float] = field(default_factory=dict)
+    answer: str | None = None
+    total: int | None = None
+
+
+async def _run_stage(stage: str, timings: dict, on_event: Callable[[StageEvent], None] | None,
+                     func, *args):
+    """Runs one blocking stage in a worker thread, timing it and reporting events."""
+    if on_event:
+        on_event(StageEvent(stage, "started"))
+    start = time.perf_counter()
+    value = await asyncio.to_thread(func, *args)
+    timings[stage] = time.perf_counter() - start
+    if on_event:
+        on_event(StageEvent(stage, "finished", timings[stage]))
+    return value
+
+
+def _route_stage(query: str, timings: dict, on_event: Callable[[StageEvent], None] | None,
+                 allowed_ids) -> RetrievalResult | None:
+    """Answers a structured query from the metadata (inline: it takes well under a millisecond)."""
+    if on_event:
+        on_event(StageEvent("route", "started"))
+    start = time.perf_counter()
+    routed = route_query(query, allowed_ids)
+    timings["route"] = time.perf_counter() - start
+    if on_event:
+        on_event(StageEvent("route", "finished", timings["route"]))
+    if routed is None:
+        return None
+    results = lookup_rows(resources.metadata, routed.ids[:ROUTER_MAX_ROWS])
+    return RetrievalResult(query=query, results=results, chunks=results["TextChunk"].tolist(), prompt="",
+                           timings=timings, answer=routed.text)
+
+
+def _prompt_stage(query: str, hits) -> tuple[pd.DataFrame, list[str], str]:
+    """Materializes the hit rows and builds the prompt."""
+    results = hits_to_frame(hits)
+    chunks = results["TextChunk"].tolist()
+    return results, chunks, build_prompt(chunks, query)
+
+
+async def run_retrieval(query: str, k: int = 10, rerank_top_n: int = 5,
+                        on_event: Callable[[StageEvent], None] | None = None,
+                        warm_up: bool = True, filters: dict | None = None,
+                        mode: str | None = None, cutoff: ScoreCutoff | None = None) -> RetrievalResult:
+    """
+    Embeds, searches and builds the prompt for a query, reporting stage events.
+
+    Structured lookups are answered in the "route" stage instead (with QUERY_ROUTER);
+    their result carries the `answer` and no prompt.
+
+    Args:
+        query (str): User's natural language query.
+        k (int): Number of initial top-k results to retrieve from FAISS.
+        rerank_top_n (int): Number of results to keep after reranking.
+        on_event (Callable[[StageEvent], None], optional): Called on the event loop's
+            thread (the caller's thread) whenever a stage starts or finishes.
+        warm_up (bool): Open the chat connection in the background if the answer needs the LLM.
+        filters (dict, optional): Structured filters; see `utils.filters`.
+        mode (str, optional): "hybrid", "vector" or "lexical" (default: SEARCH_MODE).
+        cutoff (ScoreCutoff, optional): Retrieve every chunk passing the cutoff (variable k)
+            instead of the top `rerank_top_n`.
+
+    Returns:
+        RetrievalResult: Rows, chunks, prompt and per-stage timings.
+    """
+    timings = {}
+    mode = resolve_search_mode(mode)
+    with trace("query", query=query, mode=mode):
+        allowed_ids = select_ids(filters)
+        if QUERY_ROUTER:
+            routed = _route_stage(query, timings, on_event, allowed_ids)
+            if routed is not None:
+                return routed
+        embedding = None
+        if mode != "lexical":
+            embedding = await _run_stage("embed", timings, on_event, get_query_embedding, query)
+        hits = await _run_stage("search", timings, on_event, hybrid_search,
+                                [query], k, rerank_top_n, allowed_ids, mode, embedding, cutoff)
+        if warm_up:
+            _background.submit(prepare_completion, query, hits.ids[0][hits.ids[0] >= 0], embedding)
+        results, chunks, prompt = await _run_stage("prompt", timings, on_event, _prompt_stage, query, hits)
+    total = None if hits.totals is None else int(hits.totals[0])
+    return RetrievalResult(query=query, results=results, chunks=chunks, prompt=prompt, timings=timings, total=total)
+
+
+def retrieve(query: str, k: int = 10, rerank_top_n: int = 5,
+             on_event: Callable[[StageEvent], None] | None = None,
+             warm_up: bool = True, filters: dict | None = None,
+             mode: str | None = None, cutoff: ScoreCutoff | None = None) -> RetrievalResult:
+    """
+    Synchronous entry point for `run_retrieval` (e.g. from a Streamlit script).
+
+    Args:
+        query (str): User's natural language query.
+        k (int): Number of initial top-k results to retrieve from FAISS.
+        rerank_top_n (int): Number of results to keep after reranking.
+        on_event (Callable[[StageEvent], None], optional): Stage event callback.
+        warm_up (bool): Open the chat connection in the background if the answer needs the LLM.
+        filters (dict, optional): Structured filters; see `utils.filters`.
+        mode (str, optional): "hybrid", "vector" or "lexical" (default: SEARCH_MODE).
+        cutoff (ScoreCutoff, optional): Retrieve every chunk passing the cutoff (variable k)
+            instead of the top `rerank_top_n`.
+
+    Returns:
+        RetrievalResult: Rows, chunks, prompt and per-stage timings.
+    """
+    return asyncio.run(run_retrieval(query, k, rerank_top_n, on_event, warm_up, filters, mode, cutoff))
@@ -0,0 +1,225 @@
+# utils/projection.py
+
+"""
+Module: projection
+------------------
+Reduces the dimension of embeddings between the embedding backend and the
+FAISS index.
+
+Methods:
+- pca:      projection onto the top principal components of the build's chunk
+            vectors (fitted at build time on a sample of them)
+- truncate: the first N coordinates (Matryoshka-style; only meaningful for
+            models trained for it, such as OpenAI's text-embedding-3-*)
+
+Projected vectors are L2-normalized again, so the index keeps returning
+cosine similarities. A projection is saved next to the index
+(`<index>.projection.npz`) and described in the manifest under
+`embedding.reduction` (method, input and output dimension, checksum, retained
+variance and the recall@10 of reduced against full-width exact search).
+`utils.search_engine` loads it with the index, refuses a projection that does
+not match the manifest, and projects query embeddings before searching.
+
+Vectors in the hash -> vector store stay at full width, so changing the
+dimension needs a rebuild but no re-embedding. The other way to get shorter
+vectors is the embedding API's `dimensions` parameter (EMBEDDING_API_DIMENSIONS),
+which needs no projection at all.
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass
+
+import faiss
+import numpy as np
+
+from utils.embedding_backends import EmbeddingMismatchError
+from utils.index_factory import normalize
+
+REDUCTIONS = ("pca", "truncate")
+
+
+@dataclass
+class Projection:
+    """
+    Linear map from backend vectors to index vectors.
+
+    Attributes:
+        method (str): "pca" or "truncate".
+        input_dimension (int): Dimension of the backend's vectors.
+        dimension (int): Dimension of the index vectors.
+        components (np.ndarray | None): PCA basis, shape (dimension, input_dimension).
+        mean (np.ndarray | None): PCA centering vector, shape (input_dimension,).
+        retained_variance (float | None): Share of the sample's variance (pca) or squared
+            norm (truncate) kept by the projection.
+    """
+    method: str
+    input_dimension: int
+    dimension: int
+    components: np.ndarray | None = None
+    mean: np.ndarray | None = None
+    retained_variance: float | None = None
+
+    def apply(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Projects vectors into the index space.
+
+        Args:
+            vectors (np.ndarray): Backend vectors, shape (n, input_dimension).
+
+        Returns:
+            np.ndarray: L2-normalized float32 vectors, shape (n, dimension).
+
+        Raises:
+            EmbeddingMismatchError: If the vectors do not have the input dimension.
+        """
+        vectors = np.asarray(vectors, dtype="float32")
+        if vectors.shape[1] != self.input_dimension:
+            raise EmbeddingMismatchError(
+                f"The projection expects {self.input_dimension}-dimensional embeddings, got {vectors.shape[1]}."
+            )
+        if self.method == "truncate":
+            return normalize(vectors[:, :self.dimension])
+        return normalize((vectors - self.mean) @ self.components.T)
+
+    @property
+    def checksum(self) -> str:
+        """Short fingerprint of the projection parameters."""
+        digest = hashlib.blake2b(f"{self.method}:{self.input_dimension}:{self.dimension}".encode(), digest_size=8)
+        for array in (self.components, self.mean):
+            if array is not None:
+                digest.update(np.ascontiguousarray(array, dtype="float32").tobytes())
+        return digest.hexdigest()
+
+    def describe(self) -> dict:
+        """Returns the manifest entry (`embedding.reduction`) of this projection."""
+        entry = {"method": self.method, "input_dimension": self.input_dimension,
+                 "dimension": self.dimension, "checksum": self.checksum}
+        if self.retained_variance is not None:
+            entry["retained_variance"] = round(self.retained_variance, 4)
+        return entry
+
+    def save(self, path: str):
+        """Saves the projection atomically (readers of the old file are not disturbed)."""
+        arrays = {"method": np.array(self.method), "input_dimension": np.array(self.input_dimension),
+                  "dimension": np.array(self.dimension)}
+        if self.components is not None:
+            arrays.update(components=self.components, mean=self.mean)
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "Projection":
+        """Loads a projection written by `save`."""
+        with np.load(path) as data:
+            return cls(
+                method=str(data["method"]),
+                input_dimension=int(data["input_dimension"]),
+                dimension=int(data["dimension"]),
+                components=data["components"] if "components" in data else None,
+                mean=data["mean"] if "mean" in data else None,
+            )
+
+
+def projection_path(index_path: str) -> str:
+    """Returns the projection location for a FAISS index file."""
+    return f"{index_path}.projection.npz"
+
+
+def fit_projection(vectors: np.ndarray, method: str, dimension: int,
+                   sample: int = 100_000, seed: int = 0) -> Projection:
+    """
+    Fits a projection on (a sample of) the chunk vectors.
+
+    Args:
+        vectors (np.ndarray): Normalized backend vectors, shape (n, d).
+        method (str): One of REDUCTIONS.
+        dimension (int): Output dimension, below d.
+        sample (int): Vectors used to fit PCA.
+        seed (int): Sampling seed.
+
+    Returns:
+        Projection: The fitted projection.
+
+    Raises:
+        ValueError: For unknown methods or an output dimension not below the input's.
+    """
+    if method not in REDUCTIONS:
+        raise ValueError(f"Unknown reduction '{method}'; use one of {REDUCTIONS}")
+    input_dimension = vectors.shape[1]
+    if not 0 < dimension < input_dimension:
+        raise ValueError(f"Reduced dimension must be between 1 and {input_dimension - 1}, got {dimension}")
+
+    rows = np.random.default_rng(seed).choice(len(vectors), size=min(sample, len(vectors)), replace=False)
+    data = np.asarray(vectors[np.sort(rows)], dtype="float32")
+    if method == "truncate":
+        squared = np.square(data)
+        retained = squared[:, :dimension].sum(dtype="float64") / max(squared.sum(dtype="float64"), 1e-12)
+        return Projection(method, input_dimension, dimension, retained_variance=float(retained))
+
+    # Eigenvectors of the d x d covariance: cheaper than an SVD of the sample for n >> d.
+    # The Gram matrix is accumulated in float64 blocks, so no float64 copy of the sample is made.
+    mean = data.mean(axis=0, dtype="float64")
+    gram = np.zeros((input_dimension, input_dimension))
+    for start in range(0, len(data), 8192):
+        block = data[start:start + 8192].astype("float64")
+        gram += block.T @ block
+    covariance = (gram - len(data) * np.outer(mean, mean)) / max(len(data) - 1, 1)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    top = np.argsort(eigenvalues)[::-1][:dimension]
+    retained = eigenvalues[top].sum() / max(eigenvalues.sum(), 1e-12)
+    return Projection(method, input_dimension, dimension,
+                      components=eigenvectors[:, top].T.astype("float32"),
+                      mean=mean.astype("float32"), retained_variance=float(retained))
+
+
+def neighbor_recall(full: np.ndarray, reduced: np.ndarray, k: int = 10, n_queries: int = 200) -> float:
+    """
+    Measures how many exact full-width neighbours exact search over the reduced vectors finds.
+
+    A sample of the corpus vectors is used as queries. A reduced-space neighbour
+    counts as found when its full-width score reaches the k-th best full-width
+    score, so chunks tied at the boundary (common with near-duplicate chunks) are
+    not counted as misses.
+
+    Args:
+        full (np.ndarray): Normalized full-width vectors.
+        reduced (np.ndarray): The same vectors after projection.
+        k (int): Number of neighbours compared.
+        n_queries (int): Number of sampled query vectors.
+
+    Returns:
+        float: Mean fraction of the full-width top-k found in the reduced space.
+    """
+    k = min(k, len(full))
+    sample = np.random.default_rng(1).choice(len(full), size=min(n_queries, len(full)), replace=False)
+    queries = full[sample]
+    expected, _ = faiss.knn(queries, full, k, metric=faiss.METRIC_INNER_PRODUCT)
+    _, found = faiss.knn(reduced[sample], reduced, k, metric=faiss.METRIC_INNER_PRODUCT)
+    found_scores = np.einsum("qd,qkd->qk", queries, full[found])
+    return float(np.mean(found_scores >= expected[:, -1:] - 1e-5))
+
+
+def load_projection(index_path: str, reduction: dict) -> Projection:
+    """
+    Loads the projection of an index and checks it against the manifest.
+
+    Args:
+        index_path (str): Path of the FAISS index file.
+        reduction (dict): The manifest's `embedding.reduction` entry.
+
+    Returns:
+        Projection: The projection the index was built with.
+
+    Raises:
+        EmbeddingMismatchError: If the file is missing or differs from the manifest.
+    """
+    path = projection_path(index_path)
+    if not os.path.exists(path):
+        raise EmbeddingMismatchError(f"The index was built with a {reduction['method']} projection "
+                                     f"but {path} is missing; rebuild the index.")
+    projection = Projection.load(path)
+    if projection.checksum != reduction.get("checksum"):
+        raise EmbeddingMismatchError(f"{path} does not match the index manifest; rebuild the index.")
+    return projection
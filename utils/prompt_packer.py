@@ -0,0 +1,200 @@
+# utils/prompt_packer.py
+
+"""
+Module: prompt_packer
+---------------------
+Packs retrieved chunks into the prompt context within a token budget.
+
+Packing, in rank order:
+1. Near-duplicate chunks (word-set Jaccard similarity of at least
+   PROMPT_DEDUP_THRESHOLD with an earlier chunk) are skipped.
+2. Chunks in the dataset's sentence format ("X is part of the F team, based
+   in L, and recently E.") are written without the repeated sentence
+   structure: rows that share a team and location become one block, and the
+   remaining rows one table:
+
+       Marketing team, Hanoi, Vietnam:
+       - Alice Ly: attended ai for business leaders webinar
+       - Binh Tran: joined global marketing summit
+       Person | Team | Location | Recent event
+       Chi Vu | Sales | Tokyo, Japan | spoke at the annual finance forum
+
+3. Chunks are added until the next one would exceed the budget; the best
+   ranked chunk is always kept.
+
+Tokens are counted with `tiktoken` when it is installed (PROMPT_TOKENIZER
+encoding), otherwise estimated at ~4 characters per token.
+"""
+
+import re
+from dataclasses import dataclass
+
+from utils.batch_embedder import estimate_tokens
+from utils.config import PROMPT_COMPACT_TABLES, PROMPT_DEDUP_THRESHOLD, PROMPT_TOKEN_BUDGET, PROMPT_TOKENIZER
+from utils.lexical_index import tokenize
+
+# Sentence format produced by utils.ingest.text_chunks
+CHUNK_PATTERN = re.compile(
+    r"^(?P<People>.+?) is part of the (?P<Families>.+?) team, based in (?P<Locations>.+?), "
+    r"and recently (?P<Events>.+?)\.?$"
+)
+
+# Bump whenever the packed context changes for the same chunks and settings; cached answers
+# generated from the old packing are then no longer served (see `packing_settings`)
+PACKER_VERSION = 1
+
+_encoding = None
+
+
+@dataclass
+class PackedContext:
+    """
+    Context text selected for a prompt.
+
+    Attributes:
+        text (str): Context to insert into the prompt template.
+        tokens (int): Tokens of `text`.
+        used (int): Chunks included.
+        duplicates (int): Near-duplicate chunks skipped.
+        dropped (int): Chunks left out by the token budget.
+    """
+    text: str
+    tokens: int
+    used: int
+    duplicates: int
+    dropped: int
+
+
+def packing_settings() -> str:
+    """
+    Describes everything that decides the packed context besides the chunks themselves.
+
+    Returns:
+        str: Packer version, token budget, deduplication threshold, table mode and tokenizer
+        (the estimate when `tiktoken` is unavailable), for the answer cache key.
+    """
+    count_tokens("")  # Resolves the tokenizer
+    tokenizer = PROMPT_TOKENIZER if _encoding else "estimate"
+    return (f"packer-v{PACKER_VERSION}:budget={PROMPT_TOKEN_BUDGET}:dedup={PROMPT_DEDUP_THRESHOLD}:"
+            f"compact={PROMPT_COMPACT_TABLES}:tokenizer={tokenizer}")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens of a text with the local tokenizer.
+
+    Args:
+        text (str): Input text.
+
+    Returns:
+        int: Token count (estimated when `tiktoken` or its encoding is unavailable).
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(PROMPT_TOKENIZER)
+        except Exception:  # Not installed, unknown encoding, or encoding file not downloadable
+            _encoding = False
+    if _encoding is False:
+        return estimate_tokens(text)
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def deduplicate(chunks: list[str], threshold: float = PROMPT_DEDUP_THRESHOLD) -> tuple[list[str], int]:
+    """
+    Drops chunks whose word set is nearly identical to an earlier chunk's.
+
+    Args:
+        chunks (list[str]): Chunks, best first.
+        threshold (float): Jaccard similarity at or above which a chunk is a duplicate.
+
+    Returns:
+        tuple[list[str], int]: Kept chunks (in order) and the number dropped.
+    """
+    kept, kept_words = [], []
+    for chunk in chunks:
+        words = set(tokenize(chunk))
+        duplicate = any(
+            len(words & other) / max(len(words | other), 1) >= threshold for other in kept_words
+        )
+        if not duplicate:
+            kept.append(chunk)
+            kept_words.append(words)
+    return kept, len(chunks) - len(kept)
+
+
+def render_context(chunks: list[str], compact: bool = PROMPT_COMPACT_TABLES) -> str:
+    """
+    Renders chunks as prompt context, compacting sentence-format rows.
+
+    Args:
+        chunks (list[str]): Chunks, best first.
+        compact (bool): Merge sentence-format chunks into per-(team, location)
+            blocks and a table of the remaining rows.
+
+    Returns:
+        str: Context text.
+    """
+    if not compact:
+        return "\n".join(chunks)
+
+    parsed = [CHUNK_PATTERN.match(chunk.strip()) for chunk in chunks]
+    groups = {}
+    for match in parsed:
+        if match is not None:
+            groups.setdefault((match["Families"], match["Locations"]), []).append(match)
+
+    # Blocks and the table of remaining rows appear at the rank of their best chunk
+    lines, rendered, table = [], set(), []
+    for chunk, match in zip(chunks, parsed):
+        if match is None:
+            lines.append(chunk)
+            continue
+        key = (match["Families"], match["Locations"])
+        if len(groups[key]) == 1:
+            if not table:
+                lines.append(table)
+            table.append(f"{match['People']} | {match['Families']} | {match['Locations']} | {match['Events']}")
+        elif key not in rendered:
+            rendered.add(key)
+            lines.append(f"{key[0]} team, {key[1]}:")
+            lines.extend(f"- {m['People']}: {m['Events']}" for m in groups[key])
+    lines = [
+        "\n".join(["Person | Team | Location | Recent event"] + line) if isinstance(line, list) else line
+        for line in lines
+    ]
+    return "\n".join(lines)
+
+
+def pack_context(chunks: list[str], budget: int | None = None, compact: bool = PROMPT_COMPACT_TABLES,
+                 dedup_threshold: float = PROMPT_DEDUP_THRESHOLD) -> PackedContext:
+    """
+    Deduplicates, compacts and truncates chunks to fit a token budget.
+
+    Args:
+        chunks (list[str]): Retrieved chunks, best first.
+        budget (int, optional): Maximum context tokens; None means unlimited.
+        compact (bool): Compact sentence-format rows (see `render_context`).
+        dedup_threshold (float): Jaccard similarity at or above which a chunk is a duplicate.
+
+    Returns:
+        PackedContext: The context text and packing statistics.
+    """
+    unique, duplicates = deduplicate(chunks, dedup_threshold)
+    text = render_context(unique, compact)
+    tokens = count_tokens(text)
+    if budget is None or tokens <= budget:
+        return PackedContext(text, tokens, len(unique), duplicates, 0)
+
+    # Grow the context chunk by chunk (re-rendering, since merged blocks change the cost)
+    used = 1
+    text = render_context(unique[:1], compact)
+    tokens = count_tokens(text)
+    for n in range(2, len(unique) + 1):
+        candidate = render_context(unique[:n], compact)
+        candidate_tokens = count_tokens(candidate)
+        if candidate_tokens > budget:
+            break
+        used, text, tokens = n, candidate, candidate_tokens
+    return PackedContext(text, tokens, used, duplicates, len(unique) - used)
@@ -0,0 +1,306 @@
+# utils/query_router.py
+
+"""
+Module: query_router
+--------------------
+Answers pure lookup questions from the metadata columns, without embedding,
+FAISS or an LLM call.
+
+A query is matched against the distinct values of the People, Families,
+Locations and Events columns (and their comma-separated parts, so "Tokyo"
+matches "Tokyo, Japan"): every token span that equals a value becomes a
+constraint, longest span first. The query is routed to the structured path
+only when
+- at least one constraint was found,
+- no span matches values of two different columns,
+- no two values of one column are joined by "and" ("in Tokyo and Berlin"
+  could mean either; OR would silently answer the wrong question), and
+- every remaining word is question/template vocabulary ("list", "members",
+  "of", "the", "team", "based", "in", ...).
+
+The question must ask for something the metadata answers. By default the
+matching people are listed (or counted). "Which/what teams | events |
+locations ...", "where ...", "list the teams ..." and "how many teams ..."
+ask for another column: they are answered with (the number of) its distinct
+values among the matching rows. Any other interrogative ("why", "when", a
+bare "what"/"which") and plural attribute nouns outside those phrases are not
+template vocabulary, so such queries go to the LLM.
+
+So "List members of the Data Science team based in Tokyo." becomes
+{"Families": ["Data Science"], "Locations": ["Tokyo"]} ("Where does the
+Sales team work?" becomes {"Families": ["Sales"]} asking for Locations) and
+is answered from
+the filter postings (`utils.filters`), while "Who attended AI-related events
+in Singapore?" keeps unexplained words ("attended", "ai", "related") and goes
+through `search_top_k` -> `generate_answer` as before.
+
+Values of one column are OR-ed and columns are AND-ed, as in structured
+filters. "How many ..." questions are answered with the count only.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from utils.config import QUERY_ROUTER, ROUTER_MAX_ROWS
+from utils.filters import FILTER_COLUMNS, FilterIndex
+from utils.lexical_index import tokenize
+from utils.resources import resources
+from utils.search_engine import filter_index
+from utils.tracing import span
+
+# Words that may surround the constraints of a lookup question. Interrogatives and plural
+# attribute nouns are not among them: they are only accepted as part of a recognised request
+# (see `_requested_column`), so anything else asking for an attribute leaves the query unmatched.
+TEMPLATE_WORDS = frozenset("""
+    a all an and any anyone are at based belong belongs by did do does employee employees event
+    everyone every for from has have how in is list located many me member members name names number
+    of on or part people person persons please s show staff take taken team that the there
+    to took was were who whom with work working works
+""".split())
+
+# Wording of each column in structured answers
+COLUMN_NAMES = {"People": "person", "Families": "team", "Locations": "location", "Events": "event"}
+COLUMN_PLURALS = {"People": "people", "Families": "teams", "Locations": "locations", "Events": "events"}
+
+# Nouns that name the column a question asks for ("which teams", "how many events", ...)
+ATTRIBUTE_NOUNS = {
+    "team": "Families", "teams": "Families",
+    "event": "Events", "events": "Events", "activities": "Events",
+    "location": "Locations", "locations": "Locations", "city": "Locations", "cities": "Locations",
+    "country": "Locations", "countries": "Locations", "office": "Locations", "offices": "Locations",
+    "people": "People", "person": "People", "persons": "People", "employees": "People",
+    "members": "People", "staff": "People",
+}
+# Words that introduce the requested attribute, and determiners that may follow them
+_ASKING_WORDS = frozenset({"which", "what", "list", "show", "many"})
+_DETERMINERS = frozenset({"the", "all"})
+
+_COUNT_PATTERN = re.compile(r"\b(how many|number of)\b", re.IGNORECASE)
+
+
+def _requested_column(tokens: list[str]) -> tuple[str, set[int]]:
+    """
+    Finds the column a question asks for.
+
+    Recognised requests are "where" (Locations) and "which / what / list / show / how many",
+    optionally followed by "the" or "all", followed by an attribute noun ("teams", "events",
+    "people", ...).
+
+    Args:
+        tokens (list[str]): Tokens of the query.
+
+    Returns:
+        tuple[str, set[int]]: The requested column ("People" when nothing else is asked for) and
+        the token positions of the request, which are not matched as values or vocabulary.
+    """
+    for i, token in enumerate(tokens):
+        if token == "where":
+            return "Locations", {i}
+        if token in _ASKING_WORDS:
+            j = i + 1
+            while j < len(tokens) and tokens[j] in _DETERMINERS:
+                j += 1
+            if j < len(tokens) and tokens[j] in ATTRIBUTE_NOUNS:
+                return ATTRIBUTE_NOUNS[tokens[j]], set(range(i, j + 1))
+    return "People", set()
+
+
+@dataclass
+class RoutedQuery:
+    """
+    Outcome of matching a query against the column values.
+
+    Attributes:
+        query (str): The query.
+        structured (bool): True if the query can be answered from the metadata alone.
+        filters (dict[str, list[str]]): Matched constraints per column.
+        intent (str): "list" or "count" for structured queries, "open" otherwise.
+        unmatched (list[str]): Words that are neither constraints nor template vocabulary.
+        column (str): Column the query asks for ("People": the matching people themselves).
+    """
+    query: str
+    structured: bool
+    filters: dict = field(default_factory=dict)
+    intent: str = "open"
+    unmatched: list = field(default_factory=list)
+    column: str = "People"
+
+
+@dataclass
+class StructuredAnswer:
+    """
+    Answer of a structured query.
+
+    Attributes:
+        text (str): Answer text (Markdown list).
+        ids (np.ndarray): Sorted IDs of all matching chunks.
+        filters (dict[str, list[str]]): Constraints the answer was computed from.
+        intent (str): "list" or "count".
+    """
+    text: str
+    ids: np.ndarray
+    filters: dict
+    intent: str
+
+
+class QueryRouter:
+    """
+    Phrase matcher over the distinct column values of a filter index.
+
+    Args:
+        index (FilterIndex): Filter index whose labels and postings are used.
+        columns (Iterable[str]): Columns whose values are matched.
+    """
+
+    def __init__(self, index: FilterIndex, columns=FILTER_COLUMNS):
+        self.index = index
+        self.phrases = {}  # token tuple -> {column: label}
+        for column in columns:
+            for label in index.values(column):
+                tokens = tuple(tokenize(label))
+                if tokens:
+                    self.phrases.setdefault(tokens, {}).setdefault(column, label)
+        self.max_length = max((len(tokens) for tokens in self.phrases), default=0)
+
+    def route(self, query: str) -> RoutedQuery:
+        """
+        Matches a query against the column values.
+
+        Args:
+            query (str): Natural language query.
+
+        Returns:
+            RoutedQuery: The constraints found, and whether the query is a pure lookup.
+        """
+        tokens = tokenize(query)
+        column, request = _requested_column(tokens)
+        filters, unmatched, ambiguous = {}, [], False
+        last_column, joined = None, False  # Column of the previous value; "and" seen since
+        i = 0
+        while i < len(tokens):
+            if i in request:
+                i += 1
+                continue
+            # Longest value starting at this token
+            for length in range(min(self.max_length, len(tokens) - i), 0, -1):
+                match = self.phrases.get(tuple(tokens[i:i + length]))
+                if match is not None:
+                    break
+            else:
+                match, length = None, 1
+
+            if match is None or (length == 1 and tokens[i] in TEMPLATE_WORDS):
+                if tokens[i] not in TEMPLATE_WORDS:
+                    unmatched.append(tokens[i])
+                joined |= tokens[i] == "and"
+            elif len(match) > 1:
+                ambiguous = True
+                unmatched.append(" ".join(tokens[i:i + length]))
+            else:
+                (value_column, label), = match.items()
+                # "Tokyo and Berlin": nobody is in both, and OR-ing them changes the question
+                ambiguous |= joined and value_column == last_column
+                if label not in filters.setdefault(value_column, []):
+                    filters[value_column].append(label)
+                last_column, joined = value_column, False
+            i += length
+
+        # "Which team is in the Sales team?" asks for a column it also constrains
+        ambiguous |= column != "People" and column in filters
+        structured = bool(filters) and not unmatched and not ambiguous
+        intent = ("count" if _COUNT_PATTERN.search(query) else "list") if structured else "open"
+        return RoutedQuery(query, structured, filters, intent, unmatched, column)
+
+    def answer(self, routed: RoutedQuery, metadata, allowed_ids: np.ndarray | None = None,
+               max_rows: int = ROUTER_MAX_ROWS) -> StructuredAnswer:
+        """
+        Answers a structured query from the filter postings and the metadata rows.
+
+        Args:
+            routed (RoutedQuery): A structured query from `route`.
+            metadata (pa.Table): Metadata table; row position == chunk ID.
+            allowed_ids (np.ndarray, optional): Sorted chunk IDs the answer is restricted to
+                (e.g. the user's own filters).
+            max_rows (int): Matching rows listed in the answer.
+
+        Returns:
+            StructuredAnswer: The answer text and the matching chunk IDs.
+        """
+        ids = self.index.select(routed.filters)
+        constraints = "; ".join(
+            f"{COLUMN_NAMES.get(column, column)}: {' or '.join(values)}" for column, values in routed.filters.items()
+        )
+        if allowed_ids is not None:
+            ids = np.intersect1d(ids, allowed_ids, assume_unique=True)
+            constraints += " (within the selected filters)"
+        if not len(ids):
+            return StructuredAnswer(f"No records match {constraints}.", ids, routed.filters, routed.intent)
+
+        if routed.column != "People":
+            return self._answer_values(routed, metadata, ids, constraints, max_rows)
+
+        noun = "record matches" if len(ids) == 1 else "records match"
+        if routed.intent == "count":
+            return StructuredAnswer(f"{len(ids)} {noun} {constraints}.", ids, routed.filters, routed.intent)
+
+        # Plain Python rows: building a DataFrame would cost more than the whole lookup
+        rows = metadata.select(list(FILTER_COLUMNS)).take(pa.array(ids[:max_rows])).to_pylist()
+        lines = [f"{len(ids)} {noun} {constraints}:"]
+        for row in rows:
+            event = str(row["Events"])
+            lines.append(f"- {row['People']} — {row['Families']} team, {row['Locations']}; "
+                         f"recently {event[:1].lower() + event[1:]}")
+        if len(ids) > max_rows:
+            lines.append(f"- … and {len(ids) - max_rows} more")
+        return StructuredAnswer("\n".join(lines), ids, routed.filters, routed.intent)
+
+    @staticmethod
+    def _answer_values(routed: RoutedQuery, metadata, ids: np.ndarray, constraints: str,
+                       max_rows: int) -> StructuredAnswer:
+        """Answers with the distinct values of the requested column among the matching rows."""
+        counts = pc.value_counts(metadata.column(routed.column).take(pa.array(ids))).to_pylist()
+        counts.sort(key=lambda item: (-item["counts"], str(item["values"])))
+        noun = COLUMN_NAMES[routed.column] if len(counts) == 1 else COLUMN_PLURALS[routed.column]
+        verb = "matches" if len(counts) == 1 else "match"
+        if routed.intent == "count":
+            return StructuredAnswer(f"{len(counts)} {noun} {verb} {constraints}.", ids, routed.filters,
+                                    routed.intent)
+
+        lines = [f"{len(counts)} {noun} {verb} {constraints}:"]
+        for item in counts[:max_rows]:
+            records = "record" if item["counts"] == 1 else "records"
+            lines.append(f"- {item['values']} ({item['counts']} {records})")
+        if len(counts) > max_rows:
+            lines.append(f"- … and {len(counts) - max_rows} more")
+        return StructuredAnswer("\n".join(lines), ids, routed.filters, routed.intent)
+
+
+resources.register("query_router", lambda: QueryRouter(filter_index()))
+
+
+def route_query(query: str, allowed_ids: np.ndarray | None = None) -> StructuredAnswer | None:
+    """
+    Answers a query from the metadata if it is a pure lookup.
+
+    Args:
+        query (str): Natural language query.
+        allowed_ids (np.ndarray, optional): Sorted chunk IDs the answer is restricted to.
+
+    Returns:
+        StructuredAnswer | None: The answer, or None for open-ended queries (and when
+        QUERY_ROUTER is disabled).
+    """
+    if not QUERY_ROUTER:
+        return None
+    with span("route") as s:
+        routed = resources.query_router.route(query)
+        s.set(routed=routed.structured, columns=",".join(routed.filters), asks=routed.column)
+        if not routed.structured:
+            return None
+        answer = resources.query_router.answer(routed, resources.metadata, allowed_ids)
+        s.set(rows=len(answer.ids))
+    return answer
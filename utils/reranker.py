@@ -3,33 +3,226 @@
 """
 Module: reranker
 ----------------
-Reranks retrieved text chunks based on cosine similarity
-between their embeddings and the query embedding.
+Reranks retrieved text chunks by their cosine similarity to the query.
+
+The index is built over L2-normalized vectors with an inner-product metric,
+so the scores returned by FAISS already are cosine similarities. Reranking
+therefore either reuses those scores directly, or, when a (possibly
+float16/int8) copy of the normalized vectors is stored, rescores the
+candidates exactly with a single matrix-vector product.
+
+On top of that, an optional second stage (`Reranker`) scores each
+(query, chunk) pair with a model that sees both texts together:
+- cross-encoder: local CPU cross-encoder (needs `pip install sentence-transformers`)
+- overlap:       word and word-pair overlap with the query (offline, no model)
+
+Pairs are scored in batches, only for a bounded number of first-stage
+candidates, and their scores are cached per (query, chunk) pair.
 """
 
+import threading
+from collections import OrderedDict
+
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
+from utils.embedding_cache import normalize_query
+from utils.lexical_index import tokenize
+from utils.vector_store import chunk_hash
 
-def rerank_chunks(query_embedding, chunks, chunk_embeddings, top_n=3):
+RERANKERS = ("none", "overlap", "cross-encoder")
+DEFAULT_CROSS_ENCODER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+def rerank_by_scores(scores, top_n=3):
     """
-    Reranks the retrieved chunks based on their similarity to the query embedding.
+    Orders candidates by descending similarity score.
 
     Args:
-        query_embedding (np.ndarray): The embedding of the user's query (1D vector).
-        chunks (List[str]): Original list of retrieved text chunks.
-        chunk_embeddings (np.ndarray): Embeddings for all chunks (2D array).
-        top_n (int): Number of top chunks to return based on similarity.
+        scores (np.ndarray): Similarity per candidate.
+        top_n (int): Number of positions to return.
 
     Returns:
-        List[str]: Top-N reranked chunks most relevant to the query.
+        np.ndarray: Positions of the top-N candidates, best first.
+    """
+    return np.argsort(-np.asarray(scores), kind="stable")[:top_n]
+
+
+def rescore_many(query_embeddings, candidate_embeddings, scale=None, normalized=True):
+    """
+    Computes exact cosine similarities from stored vectors for a batch of queries.
+
+    Args:
+        query_embeddings (np.ndarray): Query embeddings, shape (n_queries, d).
+        candidate_embeddings (np.ndarray): Candidate vectors per query, shape (n_queries, k, d).
+        scale (float, optional): int8 quantization scale recorded at build time.
+        normalized (bool): False for legacy raw vectors, which are normalized on the fly.
+
+    Returns:
+        np.ndarray: float32 similarities of shape (n_queries, k).
+    """
+    queries = np.asarray(query_embeddings, dtype="float32")
+    candidates = np.asarray(candidate_embeddings, dtype="float32")
+    if not normalized:
+        queries = queries / np.linalg.norm(queries, axis=-1, keepdims=True)
+        candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=-1, keepdims=True), 1e-12)
+    scores = np.einsum("qkd,qd->qk", candidates, queries)
+    return scores / scale if scale else scores
+
+
+def rerank_many_by_scores(scores, top_n=3):
+    """
+    Orders each row of a (n_queries, k) score matrix by descending score.
+
+    Args:
+        scores (np.ndarray): Similarity matrix; padding entries should be -inf.
+        top_n (int): Number of positions to return per query.
+
+    Returns:
+        np.ndarray: Positions of shape (n_queries, min(top_n, k)), best first.
+    """
+    return np.argsort(-np.asarray(scores), axis=1, kind="stable")[:, :top_n]
+
+
+class Reranker:
+    """
+    Second-stage reranker scoring (query, chunk) pairs, with a per-pair LRU score cache.
+
+    Subclasses implement `_score_pairs`.
+
+    Args:
+        batch_size (int): Pairs scored per model call.
+        cache_size (int): Maximum number of cached pair scores (0 disables the cache).
     """
-    # Compute cosine similarities between query and all chunks
-    similarities = cosine_similarity([query_embedding], chunk_embeddings)[0]
+    name = ""
 
-    # Sort indices based on descending similarity
-    sorted_indices = np.argsort(similarities)[::-1]
+    def __init__(self, batch_size: int = 32, cache_size: int = 10_000):
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.stats = {"cache_hits": 0, "scored": 0}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
 
-    # Select top-N most similar chunks
-    top_chunks = [chunks[i] for i in sorted_indices[:top_n]]
-    return top_chunks
+    def _score_pairs(self, query: str, texts: list[str]) -> np.ndarray:
+        """Scores one batch of chunks against a query."""
+        raise NotImplementedError
+
+    def score(self, query: str, texts: list[str]) -> np.ndarray:
+        """
+        Scores chunks against a query, reusing cached pair scores.
+
+        Args:
+            query (str): The user query.
+            texts (list[str]): Candidate chunk texts.
+
+        Returns:
+            np.ndarray: float32 relevance score per chunk (higher is better).
+        """
+        prefix = normalize_query(query)
+        keys = [(prefix, chunk_hash(text)) for text in texts]
+        scores = np.empty(len(texts), dtype="float32")
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+                else:
+                    missing.append(i)
+        self.stats["cache_hits"] += len(texts) - len(missing)
+        self.stats["scored"] += len(missing)
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            scores[batch] = self._score_pairs(query, [texts[i] for i in batch])
+
+        if self.cache_size and missing:
+            with self._lock:
+                for i in missing:
+                    self._cache[keys[i]] = float(scores[i])
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query: str, texts: list[str], top_n: int = 5) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Orders candidate chunks by pair score.
+
+        Args:
+            query (str): The user query.
+            texts (list[str]): Candidate chunk texts, in first-stage order.
+            top_n (int): Number of positions to return.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Positions into `texts` (best first) and their scores.
+        """
+        scores = self.score(query, texts)
+        order = rerank_by_scores(scores, top_n)
+        return order, scores[order]
+
+
+class OverlapReranker(Reranker):
+    """Scores chunks by the share of query words (and word pairs, double weight) they contain."""
+    name = "overlap"
+
+    def _score_pairs(self, query: str, texts: list[str]) -> np.ndarray:
+        tokens = tokenize(query)
+        words = set(tokens)
+        pairs = {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+        total = max(len(words) + 2 * len(pairs), 1)
+        scores = []
+        for text in texts:
+            chunk_tokens = tokenize(text)
+            chunk_pairs = {f"{a} {b}" for a, b in zip(chunk_tokens, chunk_tokens[1:])}
+            scores.append((len(words & set(chunk_tokens)) + 2 * len(pairs & chunk_pairs)) / total)
+        return np.asarray(scores, dtype="float32")
+
+
+class CrossEncoderReranker(Reranker):
+    """
+    Local CPU cross-encoder (sentence-transformers `CrossEncoder`).
+
+    Args:
+        model (str): Cross-encoder model name or path.
+        batch_size (int): Pairs per forward pass.
+        cache_size (int): Maximum number of cached pair scores.
+    """
+    name = "cross-encoder"
+
+    def __init__(self, model: str = DEFAULT_CROSS_ENCODER, batch_size: int = 32, cache_size: int = 10_000):
+        super().__init__(batch_size, cache_size)
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError("The cross-encoder reranker needs `pip install sentence-transformers`.") from e
+        self.model = CrossEncoder(model, device="cpu")
+
+    def _score_pairs(self, query: str, texts: list[str]) -> np.ndarray:
+        pairs = [(query, text) for text in texts]
+        return np.asarray(self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False),
+                          dtype="float32")
+
+
+def create_reranker(name: str, model: str | None = None, batch_size: int = 32,
+                    cache_size: int = 10_000) -> Reranker | None:
+    """
+    Creates a second-stage reranker by name.
+
+    Args:
+        name (str): One of RERANKERS ("none" returns None).
+        model (str, optional): Cross-encoder model name.
+        batch_size (int): Pairs per model call.
+        cache_size (int): Maximum number of cached pair scores.
+
+    Returns:
+        Reranker | None: The reranker, or None when reranking is disabled.
+
+    Raises:
+        ValueError: For unknown reranker names.
+    """
+    if name == "none":
+        return None
+    if name == "overlap":
+        return OverlapReranker(batch_size, cache_size)
+    if name == "cross-encoder":
+        return CrossEncoderReranker(model or DEFAULT_CROSS_ENCODER, batch_size, cache_size)
+    raise ValueError(f"Unknown reranker '{name}'; use one of {RERANKERS}")
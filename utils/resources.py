@@ -0,0 +1,138 @@
+# utils/resources.py
+
+"""
+Module: resources
+-----------------
+Loads heavy, shared resources (the FAISS index, metadata, caches, clients)
+on first use instead of at import time.
+
+Modules register a loader per resource name; `resources.get(name)` (or
+`resources.<name>`) runs the loader once per process, thread-safely, and
+keeps the result. Importing a module therefore costs only its own imports,
+and a process that never searches never opens the index.
+
+Entry points that want the loading cost paid up front call `warm_up()` -
+e.g. the app in a background thread while the page renders, or the HTTP
+service before it accepts requests. Load times are kept in `load_seconds`
+and traced as `resource_load` spans (see `utils.tracing`).
+"""
+
+import threading
+import time
+import warnings
+from typing import Any, Callable
+
+from utils.tracing import span
+
+
+class ResourceManager:
+    """Registry of lazily loaded resources."""
+
+    def __init__(self):
+        self._loaders = {}   # name -> loader, in registration order
+        self._values = {}    # name -> loaded value
+        self._lock = threading.RLock()  # Loaders may get() the resources they depend on
+        self.load_seconds = {}
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """
+        Registers the loader of a resource (replacing a previous registration).
+
+        Args:
+            name (str): Resource name.
+            loader (Callable[[], Any]): Returns the resource; called on first use.
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            self._values.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        """
+        Returns a resource, loading it on first use.
+
+        Raises:
+            KeyError: If no loader is registered under `name`.
+        """
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._values:
+                if name not in self._loaders:
+                    raise KeyError(f"Unknown resource '{name}'; registered: {list(self._loaders)}")
+                start = time.perf_counter()
+                with span("resource_load", resource=name):
+                    self._values[name] = self._loaders[name]()
+                self.load_seconds[name] = time.perf_counter() - start
+            return self._values[name]
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self.get(name)
+        except KeyError as e:
+            raise AttributeError(str(e)) from None
+
+    def loaded(self, name: str) -> bool:
+        """True if the resource has been loaded."""
+        return name in self._values
+
+    def warm_up(self, names: list[str] | None = None) -> dict[str, float]:
+        """
+        Loads resources ahead of their first use.
+
+        A resource that fails to load (e.g. the Azure client without credentials)
+        is reported with a RuntimeWarning and skipped; the error is raised again on
+        its first use.
+
+        Args:
+            names (list[str], optional): Resources to load (default: all registered, in order).
+
+        Returns:
+            dict[str, float]: Load seconds of every loaded resource (0 if it was already loaded).
+        """
+        names = list(self._loaders) if names is None else names
+        loaded = {}
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                warnings.warn(f"Could not warm up '{name}': {e}", RuntimeWarning, stacklevel=2)
+                continue
+            loaded[name] = self.load_seconds.get(name, 0.0)
+        return loaded
+
+    def warm_up_in_background(self, names: list[str] | None = None) -> threading.Thread:
+        """Starts `warm_up` in a daemon thread and returns the thread."""
+        thread = threading.Thread(target=self.warm_up, args=(names,), name="resource-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def reset(self, names: list[str] | None = None):
+        """Drops loaded resources (all by default) so they are reloaded on next use."""
+        with self._lock:
+            for name in list(self._values) if names is None else names:
+                self._values.pop(name, None)
+                self.load_seconds.pop(name, None)
+
+
+# Resources shared by the search, answer and client modules
+resources = ResourceManager()
+
+
+def warm_up(names: list[str] | None = None) -> dict[str, float]:
+    """
+    Imports the search and answer modules and loads their resources.
+
+    Args:
+        names (list[str], optional): Resources to load (default: all).
+
+    Returns:
+        dict[str, float]: Load seconds per resource.
+    """
+    import utils.answer_generator  # noqa: F401  (registers its resources)
+    import utils.query_router  # noqa: F401
+    import utils.search_engine  # noqa: F401
+    return resources.warm_up(names)
@@ -5,56 +5,725 @@ Module: search_engine
 ---------------------
 Performs vector-based semantic search using FAISS and reranks
 the results using cosine similarity for enhanced relevance.
+
+`search_top_k` answers one query with a DataFrame; `search_many` answers a
+batch of queries with batched embedding calls, one matrix FAISS search and
+vectorized reranking, returning a compact `SearchResults`.
+
+Retrieval is hybrid by default: the vector candidates and the candidates of
+a BM25 lexical index over TextChunk are fused with reciprocal rank fusion.
+Lexical-only mode answers from the BM25 index alone, without an embedding call.
+
+An optional second-stage reranker (RERANKER, e.g. a local cross-encoder)
+rescores the top RERANK_CANDIDATES first-stage hits per query.
+
+Indexes are built over L2-normalized vectors with an inner-product metric,
+so FAISS scores are cosine similarities and reranking reuses them. When the
+build stored a (float32/float16/int8) copy of the vectors, candidates are
+rescored exactly from it instead; the copy is optional.
+
+The index, embedding matrix and metadata are memory-mapped, so several
+processes on one machine share them through the OS page cache. They are
+opened on first use through `utils.resources` (importing this module loads
+no data); call `utils.resources.warm_up()` to load them up front.
+
+Searches can be restricted with structured filters on the People, Families,
+Locations and Events columns (see `utils.filters`). Small matching subsets
+are scored exactly from their own vectors, so a filtered query costs time
+proportional to the subset; larger ones are searched in FAISS through an
+ID selector.
+
+With a `ScoreCutoff`, a query gets a variable number of results instead of
+the top-N: every chunk whose cosine similarity reaches the cutoff's minimum
+(found with a FAISS range search) and lies within its margin of the query's
+best chunk, at most SEARCH_MAX_RESULTS of them. `score_cutoff()` returns the
+cutoff calibrated on labeled queries at build time. Hybrid search and the
+reranker then only reorder that set, and the reported scores stay cosine
+similarities; `SearchResults.totals` tells how many chunks passed the cutoff,
+so a cut at the cap is visible.
+
+Builds with a reduced dimension (see `utils.projection`) store their
+projection next to the index; it is checked against the manifest when the
+index is opened, and query embeddings pass through it (`project_queries`)
+before every vector search. Query embeddings are cached at full width.
+
+When the build is sharded and SEARCH_SHARD_WORKERS > 0, FAISS searches fan
+out to the shard indexes in worker processes and the per-shard top-k lists
+are merged (see `utils.sharding`).
 """
 
+import os
+import warnings
+from dataclasses import dataclass
+
 import faiss
 import pandas as pd
 import numpy as np
 
+from utils.artifacts import load_embeddings, load_index, load_metadata, lookup_rows
 from utils.config import (
     CHUNK_EMBEDDINGS_PATH,
+    FAISS_EF_SEARCH,
+    FAISS_NPROBE,
+    FILTER_BRUTE_FORCE_MAX,
+    METADATA_ARROW_PATH,
+    MMAP_ARTIFACTS,
     OUTPUT_METADATA_PATH,
-    OUTPUT_INDEX_PATH
+    OUTPUT_INDEX_PATH,
+    RERANK_BATCH_SIZE,
+    RERANK_CACHE_SIZE,
+    RERANK_CANDIDATES,
+    RERANKER,
+    RERANKER_MODEL,
+    RRF_K,
+    SEARCH_MAX_RESULTS,
+    SEARCH_MODE,
+    SEARCH_SCORE_MARGIN,
+    SEARCH_SCORE_THRESHOLD,
+    SEARCH_SHARD_WORKERS
 )
-from utils.reranker import rerank_chunks
-from utils.embedder import get_query_embedding
+from utils.embedding_backends import EmbeddingMismatchError, check_manifest
+from utils.filters import FilterIndex
+from utils.index_factory import apply_search_params, normalize, range_search_index, search_index
+from utils.index_manifest import read_manifest
+from utils.lexical_index import LexicalIndex, lexical_index_path
+from utils.projection import Projection, load_projection
+from utils.reranker import Reranker, create_reranker, rerank_many_by_scores, rescore_many
+from utils.resources import resources
+from utils.sharding import ShardedIndex, read_shard_layout
+from utils.embedder import get_backend, get_query_embedding, get_query_embeddings
+from utils.tracing import span
+
+
+SEARCH_MODES = ("hybrid", "vector", "lexical")
+
+
+# Search artifacts, opened on first use (see utils.resources)
+def _load_index():
+    """FAISS index for similarity search, checked against the embedding backend and tuned."""
+    index = load_index(OUTPUT_INDEX_PATH, mmap=MMAP_ARTIFACTS)
+    manifest = resources.manifest
+
+    # Refuse to query an index built with another embedding backend, model, dimension or projection
+    check_manifest(manifest, get_backend(), index.d)
+    resources.get("projection")
+
+    # Apply ANN runtime knobs (nprobe/efSearch) from the manifest, with .env overrides
+    search_params = dict(manifest.get("params", {}))
+    if FAISS_NPROBE:
+        search_params["nprobe"] = int(FAISS_NPROBE)
+    if FAISS_EF_SEARCH:
+        search_params["ef_search"] = int(FAISS_EF_SEARCH)
+    apply_search_params(index, search_params)
+    return index
+
+
+def _load_projection() -> Projection | None:
+    """Projection of a reduced-dimension build (checked against the manifest), or None."""
+    reduction = resources.manifest.get("embedding", {}).get("reduction")
+    return load_projection(OUTPUT_INDEX_PATH, reduction) if reduction else None
+
+
+def _load_chunk_embeddings():
+    """Optional rescoring vectors (row position == chunk ID), or None."""
+    if resources.manifest.get("embeddings_dtype", "float32") == "none":
+        return None
+    if not CHUNK_EMBEDDINGS_PATH or not os.path.exists(CHUNK_EMBEDDINGS_PATH):
+        return None
+    return load_embeddings(CHUNK_EMBEDDINGS_PATH, mmap=MMAP_ARTIFACTS)
+
+
+def _load_lexical_index():
+    """BM25 index over TextChunk (None for builds that predate hybrid search)."""
+    if not has_lexical_index():
+        return None
+    return LexicalIndex.load(lexical_index_path(OUTPUT_INDEX_PATH))
+
+
+def _create_reranker():
+    """The configured second-stage reranker, or None."""
+    if RERANKER == "none":
+        return None
+    return create_reranker(RERANKER, RERANKER_MODEL, RERANK_BATCH_SIZE, RERANK_CACHE_SIZE)
+
+
+# manifest: how the index was built (type, metric, tuned parameters); metadata: Arrow table,
+# row position == chunk ID
+resources.register("manifest", lambda: read_manifest(OUTPUT_INDEX_PATH))
+resources.register("index", _load_index)
+resources.register("projection", _load_projection)
+resources.register("metadata", lambda: load_metadata(METADATA_ARROW_PATH, OUTPUT_METADATA_PATH))
+resources.register("chunk_embeddings", _load_chunk_embeddings)
+resources.register("lexical_index", _load_lexical_index)
+resources.register("filter_index", lambda: FilterIndex.from_table(resources.metadata))
+resources.register("reranker", _create_reranker)
+
+# Module attributes that used to be loaded at import; still readable as search_engine.<name>
+_LAZY_ATTRIBUTES = {
+    "index": "index",
+    "metadata": "metadata",
+    "manifest": "manifest",
+    "df_embeddings": "chunk_embeddings",
+    "lexical_index": "lexical_index",
+}
+
+_sharded_index = None  # False once the shards were found missing or stale
+
+# Rows scored per step when brute-forcing a filtered subset
+_BRUTE_FORCE_BLOCK = 4096
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        return resources.get(_LAZY_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def has_lexical_index() -> bool:
+    """True if the build has a BM25 index (checked without loading it)."""
+    return os.path.exists(lexical_index_path(OUTPUT_INDEX_PATH))
+
+
+def is_normalized() -> bool:
+    """True if the index holds L2-normalized vectors (builds without a manifest entry predate it)."""
+    return resources.manifest.get("normalized", False)
+
+
+def is_reconstructable() -> bool:
+    """Flat and HNSW indexes (and legacy flat builds) can return their stored vectors by chunk ID."""
+    return resources.manifest.get("index_type", "flat") in ("flat", "hnsw")
+
+
+def score_cutoff() -> "ScoreCutoff | None":
+    """
+    Returns the cutoff for variable-k retrieval: SEARCH_SCORE_THRESHOLD / SEARCH_SCORE_MARGIN,
+    or the values calibrated at build time (None for builds without a threshold).
+    """
+    manifest = resources.manifest
+    min_score = float(SEARCH_SCORE_THRESHOLD) if SEARCH_SCORE_THRESHOLD else manifest.get("score_threshold")
+    if min_score is None:
+        return None
+    margin = float(SEARCH_SCORE_MARGIN) if SEARCH_SCORE_MARGIN else manifest.get("score_margin")
+    return ScoreCutoff(min_score=min_score, margin=margin)
+
+
+def filter_index() -> FilterIndex:
+    """Returns the structured-filter index over the metadata (built on first use)."""
+    return resources.filter_index
+
+
+def get_sharded_index() -> ShardedIndex | None:
+    """Returns the worker pool over the shard indexes (started on first use), or None."""
+    global _sharded_index
+    if _sharded_index is None and SEARCH_SHARD_WORKERS:
+        layout = read_shard_layout(OUTPUT_INDEX_PATH)
+        build = resources.manifest.get("build_fingerprint")
+        if layout is None or build is None or layout.get("build") != build:
+            if layout is not None:
+                warnings.warn("The shards were built from another index build; searching the single index. "
+                              "Run `python -m scripts.embed_and_index --shards-only` to update them.",
+                              RuntimeWarning, stacklevel=2)
+            _sharded_index = False
+            return None
+        # Shards keep their own tuned nprobe/efSearch unless overridden in .env
+        overrides = {}
+        if FAISS_NPROBE:
+            overrides["nprobe"] = int(FAISS_NPROBE)
+        if FAISS_EF_SEARCH:
+            overrides["ef_search"] = int(FAISS_EF_SEARCH)
+        _sharded_index = ShardedIndex(OUTPUT_INDEX_PATH, SEARCH_SHARD_WORKERS, overrides, mmap=MMAP_ARTIFACTS)
+    return _sharded_index or None
+
+
+def get_reranker() -> Reranker | None:
+    """Returns the configured second-stage reranker (created on first use), or None."""
+    return resources.reranker
+
+
+def project_queries(query_embeddings: np.ndarray) -> np.ndarray:
+    """
+    Maps backend query embeddings into the vector space of the index.
+
+    With a projection the embeddings are L2-normalized first, as the chunk vectors
+    are at build time (`to_index_space`), so PCA centering treats both alike.
+
+    Args:
+        query_embeddings (np.ndarray): Raw query embeddings, shape (n_queries, backend dimension).
+
+    Returns:
+        np.ndarray: Query vectors of the index dimension (unchanged for full-dimension builds).
+    """
+    projection = resources.projection
+    return query_embeddings if projection is None else projection.apply(normalize(query_embeddings))
+
+
+def select_ids(filters: dict | None) -> np.ndarray | None:
+    """Resolves structured filters to sorted chunk IDs (None when nothing is filtered)."""
+    if not filters or not any(filters.values()):
+        return None
+    return filter_index().select(filters)
+
+
+def _subset_vectors(ids: np.ndarray) -> np.ndarray:
+    """Returns float32 vectors of the given chunk IDs from the rescoring copy or the index."""
+    df_embeddings = resources.chunk_embeddings
+    if df_embeddings is not None:
+        embeddings_scale = resources.manifest.get("embeddings_scale")
+        vectors = np.asarray(df_embeddings[ids], dtype="float32")
+        return vectors / embeddings_scale if embeddings_scale else vectors
+    return resources.index.reconstruct_batch(ids)
+
+
+def _brute_force_search(queries: np.ndarray, ids: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Exact cosine top-k over a subset of chunks, in blocks of rows.
+
+    Args:
+        queries (np.ndarray): Query matrix (normalized when the build is).
+        ids (np.ndarray): Sorted chunk IDs to search.
+        k (int): Number of results per query.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Similarities and chunk IDs of shape (n_queries, k), best
+        first, padded with -inf / -1.
+    """
+    normalized = is_normalized()
+    if not normalized:
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    best_scores = np.full((len(queries), k), -np.inf, dtype="float32")
+    best_ids = np.full((len(queries), k), -1, dtype="int64")
+
+    for start in range(0, len(ids), _BRUTE_FORCE_BLOCK):
+        block = ids[start:start + _BRUTE_FORCE_BLOCK]
+        vectors = _subset_vectors(block)
+        if not normalized:
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        scores = np.concatenate([best_scores, queries @ vectors.T], axis=1)
+        candidates = np.concatenate([best_ids, np.broadcast_to(block, (len(queries), len(block)))], axis=1)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_ids = np.take_along_axis(candidates, top, axis=1)
+
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best_scores, order, axis=1), np.take_along_axis(best_ids, order, axis=1)
+
+
+@dataclass
+class SearchResults:
+    """
+    Compact results of a batched search.
+
+    Attributes:
+        ids (np.ndarray): int64 chunk IDs, shape (n_queries, top_n); -1 where a query had fewer hits.
+        scores (np.ndarray): float32 scores aligned with `ids` (cosine similarity, BM25 score or
+            RRF score, depending on the search mode); -inf for padding.
+        totals (np.ndarray | None): With a `ScoreCutoff`, the number of chunks passing it per
+            query; above SEARCH_MAX_RESULTS when results were cut at the cap (then only a lower
+            bound unless the index was range-searched). None for top-N searches.
+    """
+    ids: np.ndarray
+    scores: np.ndarray
+    totals: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def chunks(self, i: int) -> list[str]:
+        """Returns the reranked TextChunks of the i-th query."""
+        ids = self.ids[i][self.ids[i] >= 0]
+        return resources.metadata.column("TextChunk").take(ids).to_pylist()
+
+    def to_frame(self) -> pd.DataFrame:
+        """Returns all hits as one long DataFrame (query, rank, chunk_id, score, TextChunk)."""
+        query, rank = np.nonzero(self.ids >= 0)
+        ids = self.ids[query, rank]
+        return pd.DataFrame({
+            "query": query,
+            "rank": rank,
+            "chunk_id": ids,
+            "score": self.scores[query, rank],
+            "TextChunk": resources.metadata.column("TextChunk").take(ids).to_pylist(),
+        })
+
+
+@dataclass(frozen=True)
+class ScoreCutoff:
+    """
+    Variable-k cutoff over cosine similarities.
+
+    Attributes:
+        min_score (float): Lowest similarity a result may have.
+        margin (float | None): Largest gap between a result and the query's best chunk
+            (None: no per-query limit).
+    """
+    min_score: float
+    margin: float | None = None
+
+    def mask(self, scores: np.ndarray) -> np.ndarray:
+        """Marks the scores passing the cutoff in a (n_queries, k) matrix padded with -inf."""
+        passed = scores >= self.min_score
+        if self.margin is not None:
+            passed &= scores >= scores.max(axis=1, keepdims=True) - self.margin
+        return passed
+
+
+def search_vectors(query_embeddings: np.ndarray, k: int = 10, rerank_top_n: int = 5,
+                   allowed_ids: np.ndarray | None = None, cutoff: ScoreCutoff | None = None) -> SearchResults:
+    """
+    Runs one FAISS batch search for a matrix of query embeddings and reranks every row.
+
+    Args:
+        query_embeddings (np.ndarray): Raw query embeddings, shape (n_queries, d); projected
+            first for reduced-dimension builds.
+        k (int): Number of initial top-k results to retrieve from FAISS per query.
+        rerank_top_n (int): Number of results to keep per query after reranking.
+        allowed_ids (np.ndarray, optional): Sorted chunk IDs the search is restricted to.
+        cutoff (ScoreCutoff, optional): Return every chunk passing the cutoff (up to
+            SEARCH_MAX_RESULTS per query) instead of the top `rerank_top_n`.
+
+    Returns:
+        SearchResults: Reranked chunk IDs and scores for every query.
+    """
+    index, df_embeddings, normalized = resources.index, resources.chunk_embeddings, is_normalized()
+    queries = np.array(project_queries(query_embeddings), dtype="float32", order="C")
+    if queries.shape[1] != index.d:
+        raise EmbeddingMismatchError(f"Query embeddings have dimension {queries.shape[1]}, the index {index.d}.")
+    if normalized:
+        faiss.normalize_L2(queries)
+
+    totals = None
+    if cutoff is not None:
+        # One result past the cap, so a cut at the cap can be detected on every search path
+        k, rerank_top_n = SEARCH_MAX_RESULTS + 1, SEARCH_MAX_RESULTS
+
+    with span("ann_search", queries=len(queries), k=k) as s:
+        if allowed_ids is not None:
+            s.set(allowed=len(allowed_ids))
+        if cutoff is not None:
+            s.set(min_score=round(cutoff.min_score, 4), margin=cutoff.margin)
+        shards = get_sharded_index()
+        if (allowed_ids is not None and len(allowed_ids) <= FILTER_BRUTE_FORCE_MAX
+                and (df_embeddings is not None or is_reconstructable())):
+            s.set(path="brute_force")
+            D, I = _brute_force_search(queries, allowed_ids, k)
+        elif shards is not None:
+            s.set(path="shards", shards=len(shards.shards))
+            D, I = shards.search(queries, k, allowed_ids)
+        elif cutoff is not None:
+            s.set(path="range" if allowed_ids is None else "range_selector")
+            D, I, totals = range_search_index(index, queries, cutoff.min_score, k, allowed_ids, cutoff.margin)
+        else:
+            s.set(path="index" if allowed_ids is None else "selector")
+            D, I = search_index(index, queries, k, allowed_ids)
+        valid = I >= 0
+
+        # Score candidates by cosine similarity, padding slots with -inf
+        if df_embeddings is None:
+            scores = D.astype("float32")  # Inner product over normalized vectors == cosine similarity
+        else:
+            candidates = df_embeddings[np.where(valid, I, 0)]
+            scores = rescore_many(queries, candidates, resources.manifest.get("embeddings_scale"),
+                                  normalized=normalized)
+        scores = np.where(valid, scores, -np.inf).astype("float32")
+        if cutoff is not None:
+            valid &= cutoff.mask(scores)  # Exact scores decide when the candidates were rescored
+            scores = np.where(valid, scores, -np.inf).astype("float32")
+            # Beyond the cap, only the range search saw every passing chunk
+            passed = valid.sum(axis=1)
+            totals = passed if totals is None else np.where(passed > rerank_top_n, np.maximum(totals, passed), passed)
+            s.set(passed=int(passed.sum()))
+
+        order = rerank_many_by_scores(scores, top_n=rerank_top_n)
+        ids = np.take_along_axis(np.where(valid, I, -1), order, axis=1)
+    return SearchResults(ids=ids, scores=np.take_along_axis(scores, order, axis=1), totals=totals)
 
 
-# Preload all required data at module load time
-df_embeddings = np.load(CHUNK_EMBEDDINGS_PATH)  # Precomputed chunk embeddings (Numpy array)
-index = faiss.read_index(OUTPUT_INDEX_PATH)     # FAISS index for similarity search
-df = pd.read_csv(OUTPUT_METADATA_PATH)          # Metadata for each chunk (e.g., source info, text)
+def resolve_search_mode(mode: str | None = None) -> str:
+    """
+    Returns the search mode to use, defaulting to SEARCH_MODE.
+
+    Hybrid search falls back to vector search for builds without a lexical index.
+
+    Raises:
+        ValueError: For unknown modes, or lexical mode without a lexical index.
+    """
+    mode = mode or SEARCH_MODE
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}'; use one of {SEARCH_MODES}")
+    if not has_lexical_index():
+        if mode == "lexical":
+            raise ValueError("No lexical index found; rebuild with `python -m scripts.embed_and_index`.")
+        return "vector"
+    return mode
 
 
-def search_top_k(query: str, k: int = 10, rerank_top_n: int = 5) -> pd.DataFrame:
+def lexical_search(queries: list[str], k: int = 10, allowed_ids: np.ndarray | None = None) -> SearchResults:
+    """
+    BM25 search over TextChunk; makes no embedding call.
+
+    Args:
+        queries (list[str]): Natural language queries.
+        k (int): Number of results per query.
+        allowed_ids (np.ndarray, optional): Sorted chunk IDs the search is restricted to.
+
+    Returns:
+        SearchResults: Chunk IDs and BM25 scores, one row per query.
+    """
+    ids = np.full((len(queries), k), -1, dtype="int64")
+    scores = np.full((len(queries), k), -np.inf, dtype="float32")
+    with span("lexical_search", queries=len(queries), k=k):
+        for i, query in enumerate(queries):
+            found, found_scores = resources.lexical_index.search(query, k, allowed_ids)
+            ids[i, :len(found)] = found
+            scores[i, :len(found)] = found_scores
+    return SearchResults(ids=ids, scores=scores)
+
+
+def fuse_rrf(*rankings: SearchResults, top_n: int = 5, rrf_k: int = RRF_K) -> SearchResults:
+    """
+    Fuses ranked result lists with reciprocal rank fusion: score = sum(1 / (rrf_k + rank)).
+
+    Args:
+        *rankings (SearchResults): Results for the same queries, each best first.
+        top_n (int): Number of fused results to keep per query.
+        rrf_k (int): RRF damping constant.
+
+    Returns:
+        SearchResults: Fused chunk IDs and RRF scores.
+    """
+    ids = np.concatenate([r.ids for r in rankings], axis=1)
+    ranks = np.concatenate([np.broadcast_to(np.arange(1, r.ids.shape[1] + 1), r.ids.shape) for r in rankings], axis=1)
+    contributions = np.where(ids >= 0, 1.0 / (rrf_k + ranks), 0.0)
+
+    fused_ids = np.full((len(ids), top_n), -1, dtype="int64")
+    fused_scores = np.full((len(ids), top_n), -np.inf, dtype="float32")
+    for i in range(len(ids)):
+        valid = ids[i] >= 0
+        unique_ids, inverse = np.unique(ids[i][valid], return_inverse=True)
+        totals = np.bincount(inverse, weights=contributions[i][valid])
+        top = np.argsort(-totals, kind="stable")[:top_n]
+        fused_ids[i, :len(top)] = unique_ids[top]
+        fused_scores[i, :len(top)] = totals[top]
+    return SearchResults(ids=fused_ids, scores=fused_scores)
+
+
+def rerank_hits(queries: list[str], hits: SearchResults, reranker: Reranker, top_n: int = 5) -> SearchResults:
+    """
+    Reorders first-stage hits with a second-stage (query, chunk) reranker.
+
+    Args:
+        queries (list[str]): Natural language queries, one per row of `hits`.
+        hits (SearchResults): First-stage candidates, best first.
+        reranker (Reranker): Pair scorer.
+        top_n (int): Number of results to keep per query.
+
+    Returns:
+        SearchResults: Chunk IDs and reranker scores, one row per query.
+    """
+    ids = np.full((len(queries), top_n), -1, dtype="int64")
+    scores = np.full((len(queries), top_n), -np.inf, dtype="float32")
+    with span("rerank", reranker=type(reranker).__name__, queries=len(queries)) as s:
+        hits_before, scored_before = reranker.stats["cache_hits"], reranker.stats["scored"]
+        for i, query in enumerate(queries):
+            candidates = hits.ids[i][hits.ids[i] >= 0]
+            if not len(candidates):
+                continue
+            texts = resources.metadata.column("TextChunk").take(candidates).to_pylist()
+            order, order_scores = reranker.rerank(query, texts, top_n)
+            ids[i, :len(order)] = candidates[order]
+            scores[i, :len(order)] = order_scores
+        s.set(cache_hits=reranker.stats["cache_hits"] - hits_before,
+              cache_misses=reranker.stats["scored"] - scored_before)
+    return SearchResults(ids=ids, scores=scores)
+
+
+def _keep_similarities(hits: SearchResults, similarities: SearchResults) -> SearchResults:
+    """
+    Gives reordered variable-k hits back the cosine similarities they were selected by.
+
+    Args:
+        hits (SearchResults): Reordered hits (e.g. fused or reranked); a subset of `similarities`.
+        similarities (SearchResults): The range search results the hits were taken from.
+
+    Returns:
+        SearchResults: `hits` in their order, with cosine similarities and the totals of `similarities`.
+    """
+    scores = np.full(hits.ids.shape, -np.inf, dtype="float32")
+    for i in range(len(hits)):
+        lookup = dict(zip(similarities.ids[i].tolist(), similarities.scores[i].tolist()))
+        for j, chunk_id in enumerate(hits.ids[i].tolist()):
+            if chunk_id >= 0:
+                scores[i, j] = lookup[chunk_id]
+    return SearchResults(ids=hits.ids, scores=scores, totals=similarities.totals)
+
+
+def _lexical_within(queries: list[str], hits: SearchResults) -> SearchResults:
+    """BM25 ranking of each query's own vector hits (chunks without a matching term are left out)."""
+    ids = np.full(hits.ids.shape, -1, dtype="int64")
+    scores = np.full(hits.ids.shape, -np.inf, dtype="float32")
+    with span("lexical_search", queries=len(queries), k=hits.ids.shape[1]):
+        for i, query in enumerate(queries):
+            candidates = np.sort(hits.ids[i][hits.ids[i] >= 0])
+            if not len(candidates):
+                continue
+            found, found_scores = resources.lexical_index.search(query, len(candidates), candidates)
+            ids[i, :len(found)] = found
+            scores[i, :len(found)] = found_scores
+    return SearchResults(ids=ids, scores=scores)
+
+
+def first_stage_search(queries: list[str], k: int = 10, rerank_top_n: int = 5,
+                       allowed_ids: np.ndarray | None = None, mode: str | None = None,
+                       query_embeddings: np.ndarray | None = None,
+                       cutoff: ScoreCutoff | None = None) -> SearchResults:
+    """
+    Searches in the given mode: vector, lexical, or both fused with RRF.
+
+    Args:
+        queries (list[str]): Natural language queries.
+        k (int): Number of candidates per retriever and query.
+        rerank_top_n (int): Number of results to keep per query.
+        allowed_ids (np.ndarray, optional): Sorted chunk IDs the search is restricted to.
+        mode (str, optional): "hybrid", "vector" or "lexical" (default: SEARCH_MODE).
+        query_embeddings (np.ndarray, optional): Precomputed query embeddings.
+        cutoff (ScoreCutoff, optional): Variable-k retrieval: every chunk passing the cutoff
+            (see `search_vectors`); hybrid mode reorders them by RRF.
+
+    Returns:
+        SearchResults: Chunk IDs and scores, one row per query.
+
+    Raises:
+        ValueError: For a cutoff in lexical mode (BM25 scores have no calibrated cutoff).
+    """
+    mode = resolve_search_mode(mode)
+    if mode == "lexical":
+        if cutoff is not None:
+            raise ValueError("Variable-k retrieval needs similarity scores; use the hybrid or vector mode.")
+        return lexical_search(queries, rerank_top_n, allowed_ids)
+
+    if query_embeddings is None:
+        query_embeddings = get_query_embeddings(queries)
+    if mode == "vector":
+        return search_vectors(query_embeddings, k=k, rerank_top_n=rerank_top_n, allowed_ids=allowed_ids,
+                              cutoff=cutoff)
+
+    if cutoff is not None:
+        vector_hits = search_vectors(query_embeddings, allowed_ids=allowed_ids, cutoff=cutoff)
+        fused = fuse_rrf(vector_hits, _lexical_within(queries, vector_hits), top_n=vector_hits.ids.shape[1])
+        return _keep_similarities(fused, vector_hits)
+
+    vector_hits = search_vectors(query_embeddings, k=k, rerank_top_n=k, allowed_ids=allowed_ids)
+    lexical_hits = lexical_search(queries, k, allowed_ids)
+    return fuse_rrf(vector_hits, lexical_hits, top_n=rerank_top_n)
+
+
+def hybrid_search(queries: list[str], k: int = 10, rerank_top_n: int = 5,
+                  allowed_ids: np.ndarray | None = None, mode: str | None = None,
+                  query_embeddings: np.ndarray | None = None,
+                  cutoff: ScoreCutoff | None = None) -> SearchResults:
+    """
+    First-stage search (see `first_stage_search`), followed by the configured
+    second-stage reranker over the top RERANK_CANDIDATES hits, if any.
+
+    Args:
+        queries (list[str]): Natural language queries.
+        k (int): Number of candidates per retriever and query.
+        rerank_top_n (int): Number of results to keep per query.
+        allowed_ids (np.ndarray, optional): Sorted chunk IDs the search is restricted to.
+        mode (str, optional): "hybrid", "vector" or "lexical" (default: SEARCH_MODE).
+        query_embeddings (np.ndarray, optional): Precomputed query embeddings.
+        cutoff (ScoreCutoff, optional): Variable-k retrieval (see `first_stage_search`); the
+            reranker reorders all chunks passing the cutoff.
+
+    Returns:
+        SearchResults: Chunk IDs and scores, one row per query.
+    """
+    reranker = get_reranker()
+    if reranker is None:
+        return first_stage_search(queries, k, rerank_top_n, allowed_ids, mode, query_embeddings, cutoff)
+
+    if cutoff is not None:
+        candidates = first_stage_search(queries, k, rerank_top_n, allowed_ids, mode, query_embeddings, cutoff)
+        return _keep_similarities(rerank_hits(queries, candidates, reranker, candidates.ids.shape[1]), candidates)
+
+    budget = max(RERANK_CANDIDATES, rerank_top_n)
+    candidates = first_stage_search(queries, max(k, budget), budget, allowed_ids, mode, query_embeddings)
+    return rerank_hits(queries, candidates, reranker, rerank_top_n)
+
+
+def search_top_k(query: str, k: int = 10, rerank_top_n: int = 5, filters: dict | None = None,
+                 mode: str | None = None, cutoff: ScoreCutoff | None = None) -> pd.DataFrame:
     """
     Perform semantic search and rerank retrieved chunks based on relevance.
 
     Args:
         query (str): User's natural language question or search query.
-        k (int): Number of initial top-k results to retrieve from FAISS.
+        k (int): Number of initial top-k results to retrieve from FAISS (and BM25).
         rerank_top_n (int): Number of top results to return after reranking.
+        filters (dict, optional): Structured filters, e.g. {"Families": ["Marketing"],
+            "Locations": "Vietnam"}; see `utils.filters`.
+        mode (str, optional): "hybrid", "vector" or "lexical" (default: SEARCH_MODE).
+        cutoff (ScoreCutoff, optional): Return every chunk passing the cutoff (at most
+            SEARCH_MAX_RESULTS, e.g. `score_cutoff()`) instead of the top N.
 
     Returns:
-        pd.DataFrame: DataFrame containing the top-N reranked "TextChunk" results.
+        pd.DataFrame: Top-N reranked metadata rows (including "TextChunk" and the
+        "Score" of the search mode), indexed by chunk ID.
     """
 
-    # Generate embedding for the query
-    query_embedding = get_query_embedding(query)
-    query_embedding = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
+    # Embed the query (unless lexical-only), search, and rerank or fuse candidates
+    mode = resolve_search_mode(mode)
+    allowed_ids = select_ids(filters)
+    query_embeddings = None if mode == "lexical" else get_query_embedding(query)
+    hits = hybrid_search([query], k=k, rerank_top_n=rerank_top_n, allowed_ids=allowed_ids,
+                         mode=mode, query_embeddings=query_embeddings, cutoff=cutoff)
+    return hits_to_frame(hits)
 
-    # Perform FAISS similarity search
-    _, I = index.search(query_embedding, k)  # I is the list of indices of top-k similar chunks
 
-    # Retrieve the top-k matching chunks from metadata
-    matched_rows = df.iloc[I[0]]
-    chunks = matched_rows["TextChunk"].tolist()
+def hits_to_frame(hits: SearchResults, i: int = 0) -> pd.DataFrame:
+    """
+    Materializes the metadata rows of one query's hits.
 
-    # Select corresponding embeddings for reranking
-    chunk_embeddings = df_embeddings[I[0]]
+    Args:
+        hits (SearchResults): Results of `search_vectors` or `search_many`.
+        i (int): Row (query) of the results to materialize.
 
-    # Rerank the top-k chunks using cosine similarity
-    reranked_chunks = rerank_chunks(query_embedding[0], chunks, chunk_embeddings, top_n=rerank_top_n)
+    Returns:
+        pd.DataFrame: Metadata rows plus the cosine "Score", indexed by chunk ID, best first.
+    """
+    ids, scores = hits.ids[i], hits.scores[i]
+    valid = ids >= 0  # FAISS pads with -1 when fewer than k live chunks exist
+
+    # Return final top-N metadata rows; the index holds the chunk IDs
+    with span("metadata_lookup", rows=int(valid.sum())):
+        results = lookup_rows(resources.metadata, ids[valid])
+        results["Score"] = scores[valid]
+    return results
+
+
+def search_many(queries: list[str], k: int = 10, rerank_top_n: int = 5,
+                filters: dict | None = None, mode: str | None = None,
+                cutoff: ScoreCutoff | None = None) -> SearchResults:
+    """
+    Perform semantic search for many queries at once.
 
-    # Return final top-N chunks in DataFrame
-    return pd.DataFrame({"TextChunk": reranked_chunks})
+    Query embeddings come from the cache or from batched embedding calls, and all
+    queries share a single FAISS search and a vectorized rerank.
+
+    Args:
+        queries (list[str]): Natural language queries.
+        k (int): Number of initial top-k results to retrieve from FAISS per query.
+        rerank_top_n (int): Number of results to keep per query after reranking.
+        filters (dict, optional): Structured filters applied to every query.
+        mode (str, optional): "hybrid", "vector" or "lexical" (default: SEARCH_MODE).
+        cutoff (ScoreCutoff, optional): Variable-k retrieval cutoff (see `search_top_k`).
+
+    Returns:
+        SearchResults: Reranked chunk IDs and scores, one row per query.
+    """
+    if not queries:
+        empty = np.empty((0, rerank_top_n))
+        return SearchResults(ids=empty.astype("int64"), scores=empty.astype("float32"))
+    allowed_ids = select_ids(filters)
+    return hybrid_search(queries, k=k, rerank_top_n=rerank_top_n, allowed_ids=allowed_ids, mode=mode,
+                         cutoff=cutoff)
@@ -0,0 +1,297 @@
+# utils/sharding.py
+
+"""
+Module: sharding
+----------------
+Splits the vector index into shards and searches them in parallel worker
+processes.
+
+Build side (`build_shards`, called by `scripts/embed_and_index.py`):
+- Live chunks are assigned to N shards by content hash, or by the value of a
+  column ("Locations", "Families"). Column values are placed on the least
+  loaded shard the first time they are seen and keep their shard afterwards.
+- Each shard is its own ID-mapped FAISS index holding global chunk IDs, so
+  shard results need no ID translation.
+- A shard is only rebuilt when its set of chunk IDs (or the embedding backend
+  or index type) changed, or when it is requested explicitly; the other shard
+  files are left untouched.
+
+The layout records the fingerprint of the build its shards were made from
+(`build_fingerprint`: the chunk hashes, tombstones and embedding space), which
+the main manifest records as well; search falls back to the single index
+while the two differ, e.g. after an update that only tombstoned rows.
+
+Files next to the index:
+- `<index>.shards.json`:             layout (count, key, build, value -> shard mapping, per-shard info)
+- `<index>.shards.npy`:              shard of every chunk ID (-1 for tombstoned rows)
+- `<index>.shard-SS-of-NN` (+ .json): the shard indexes and their manifests
+
+Search side (`ShardedIndex`): a process pool whose workers memory-map all
+shards (the OS page cache shares them) and run single-threaded FAISS
+searches. A query batch is fanned out as one task per shard, and the per-shard
+top-k lists are merged with a heap, so throughput grows with the number of
+cores.
+"""
+
+import hashlib
+import heapq
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable
+
+import faiss
+import numpy as np
+import pandas as pd
+
+from utils.artifacts import load_index, write_index
+from utils.index_factory import apply_search_params, build_index, search_index
+from utils.index_manifest import read_manifest, write_manifest
+
+SHARD_KEYS = ("hash", "Locations", "Families")
+
+# Shard indexes opened by a worker process, keyed by shard number
+_worker_indexes = {}
+
+
+def shard_layout_path(index_path: str) -> str:
+    """Returns the shard layout location for a FAISS index file."""
+    return f"{index_path}.shards.json"
+
+
+def shard_assignment_path(index_path: str) -> str:
+    """Returns the location of the chunk ID -> shard array."""
+    return f"{index_path}.shards.npy"
+
+
+def shard_index_path(index_path: str, shard: int, count: int) -> str:
+    """Returns the file of one shard index."""
+    return f"{index_path}.shard-{shard:02d}-of-{count:02d}"
+
+
+def read_shard_layout(index_path: str) -> dict | None:
+    """Loads the shard layout of an index, or None if the index is not sharded."""
+    path = shard_layout_path(index_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_fingerprint(metadata: pd.DataFrame, embedding: dict | None) -> str:
+    """
+    Fingerprints the chunks of an index build.
+
+    Args:
+        metadata (pd.DataFrame): Metadata with ChunkHash and Deleted columns; row position == chunk ID.
+        embedding (dict, optional): Embedding backend entry of the main manifest.
+
+    Returns:
+        str: Hash of every chunk ID's content hash and tombstone flag, and of the embedding space.
+    """
+    digest = hashlib.sha1(json.dumps(embedding, sort_keys=True).encode("utf-8"))
+    digest.update(metadata["Deleted"].to_numpy(dtype=bool).tobytes())
+    digest.update("\n".join(metadata["ChunkHash"].astype(str)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def assign_shards(metadata: pd.DataFrame, count: int, by: str = "hash",
+                  mapping: dict | None = None) -> tuple[np.ndarray, dict]:
+    """
+    Assigns every live chunk to a shard.
+
+    Args:
+        metadata (pd.DataFrame): Metadata with ChunkHash and Deleted columns; row position == chunk ID.
+        count (int): Number of shards.
+        by (str): "hash", or the column whose values are kept together on one shard.
+        mapping (dict, optional): Value -> shard mapping of the previous build (column keys only).
+
+    Returns:
+        tuple[np.ndarray, dict]: int32 shard per chunk ID (-1 for tombstoned rows) and the
+        updated value -> shard mapping (empty for "hash").
+    """
+    if by not in SHARD_KEYS:
+        raise ValueError(f"Unknown shard key '{by}'; use one of {SHARD_KEYS}")
+    live = ~metadata["Deleted"].to_numpy(dtype=bool)
+    shard_of = np.full(len(metadata), -1, dtype="int32")
+    if by == "hash":
+        hashes = metadata["ChunkHash"].to_numpy()[live]
+        shard_of[live] = [int(h[:8], 16) % count for h in hashes]
+        return shard_of, {}
+
+    # Place new values, largest first, on the least loaded shard
+    values = metadata[by].astype(str).to_numpy()[live]
+    sizes = pd.Series(values).value_counts()
+    mapping = {value: shard for value, shard in (mapping or {}).items() if shard < count}
+    loads = np.zeros(count, dtype="int64")
+    for value, shard in mapping.items():
+        loads[shard] += sizes.get(value, 0)
+    for value, size in sizes.items():
+        if value not in mapping:
+            mapping[value] = int(np.argmin(loads))
+            loads[mapping[value]] += size
+    shard_of[live] = [mapping[value] for value in values]
+    return shard_of, mapping
+
+
+def build_shards(metadata: pd.DataFrame, get_vectors: Callable[[np.ndarray], np.ndarray], index_path: str,
+                 count: int, by: str = "hash", index_type: str = "auto", embedding: dict | None = None,
+                 rebuild: tuple = (), build: str | None = None) -> dict:
+    """
+    Builds the shard indexes of a corpus, rebuilding only shards that changed.
+
+    Args:
+        metadata (pd.DataFrame): Metadata with ChunkHash and Deleted columns; row position == chunk ID.
+        get_vectors (Callable[[np.ndarray], np.ndarray]): Returns normalized float32 vectors
+            for an array of chunk IDs.
+        index_path (str): Path of the main FAISS index; shard files are written next to it.
+        count (int): Number of shards.
+        by (str): One of SHARD_KEYS.
+        index_type (str): FAISS index type of every shard (see `utils.index_factory`).
+        embedding (dict, optional): Embedding backend entry of the main manifest.
+        rebuild (tuple[int]): Shards to rebuild even if unchanged.
+        build (str, optional): `build_fingerprint` of the main index the shards belong to.
+
+    Returns:
+        dict: The shard layout (also saved next to the index).
+    """
+    previous = read_shard_layout(index_path) or {}
+    reusable = previous.get("count") == count and previous.get("by") == by
+    shard_of, mapping = assign_shards(metadata, count, by, previous.get("mapping") if reusable else None)
+
+    shards = []
+    for shard in range(count):
+        ids = np.flatnonzero(shard_of == shard).astype("int64")
+        fingerprint = hashlib.sha1(
+            ids.tobytes() + json.dumps([embedding, index_type], sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        path = shard_index_path(index_path, shard, count)
+        old = previous.get("shards", [])[shard] if reusable else None
+        if (old and old["fingerprint"] == fingerprint and shard not in rebuild
+                and (not len(ids) or os.path.exists(path))):
+            shards.append(old)
+            continue
+
+        info = {"ntotal": int(len(ids)), "fingerprint": fingerprint}
+        if len(ids):
+            index, manifest = build_index(get_vectors(ids), ids, index_type=index_type,
+                                          metric=faiss.METRIC_INNER_PRODUCT)
+            manifest.update(metric="ip", normalized=True, embedding=embedding, ntotal=int(index.ntotal))
+            write_index(index, path)
+            write_manifest(path, manifest)
+            info["factory"] = manifest["factory"]
+        shards.append(info)
+        print(f"🧱 Shard {shard + 1}/{count}: {len(ids):,} chunks "
+              f"{'(' + info['factory'] + ')' if len(ids) else '(empty)'}")
+
+    layout = {"count": count, "by": by, "rows": len(metadata), "build": build, "mapping": mapping,
+              "shards": shards}
+    with open(f"{shard_assignment_path(index_path)}.tmp", "wb") as f:
+        np.save(f, shard_of)
+    os.replace(f"{shard_assignment_path(index_path)}.tmp", shard_assignment_path(index_path))
+    # Atomic: a search process starting now reads either the old or the new layout
+    with open(f"{shard_layout_path(index_path)}.tmp", "w", encoding="utf-8") as f:
+        json.dump(layout, f, indent=2)
+    os.replace(f"{shard_layout_path(index_path)}.tmp", shard_layout_path(index_path))
+    reused = sum(1 for old, new in zip(previous.get("shards", []), shards) if reusable and old is new)
+    print(f"♻️ {reused} of {count} shard(s) unchanged")
+    return layout
+
+
+def merge_topk(parts: list[tuple[np.ndarray, np.ndarray]], k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Merges per-shard top-k lists (best first, higher scores better) with a heap.
+
+    Args:
+        parts (list[tuple[np.ndarray, np.ndarray]]): (scores, IDs) of each shard,
+            shape (n_queries, k_shard), padded with ID -1.
+        k (int): Results to keep per query.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Merged scores and IDs, shape (n_queries, k),
+        padded with -inf / -1.
+    """
+    n_queries = len(parts[0][0]) if parts else 0
+    scores = np.full((n_queries, k), -np.inf, dtype="float32")
+    ids = np.full((n_queries, k), -1, dtype="int64")
+    for i in range(n_queries):
+        streams = [zip(D[i][I[i] >= 0].tolist(), I[i][I[i] >= 0].tolist()) for D, I in parts]
+        top = list(islice(heapq.merge(*streams, key=lambda hit: hit[0], reverse=True), k))
+        if top:
+            scores[i, :len(top)], ids[i, :len(top)] = zip(*top)
+    return scores, ids
+
+
+def _init_worker(index_path: str, layout: dict, params: dict, mmap: bool):
+    """Opens every non-empty shard in a worker process (single-threaded FAISS)."""
+    faiss.omp_set_num_threads(1)
+    for shard, info in enumerate(layout["shards"]):
+        if info["ntotal"]:
+            path = shard_index_path(index_path, shard, layout["count"])
+            index = load_index(path, mmap=mmap)
+            apply_search_params(index, {**read_manifest(path).get("params", {}), **params})
+            _worker_indexes[shard] = index
+
+
+def _search_shard(shard: int, queries: np.ndarray, k: int,
+                  allowed_ids: np.ndarray | None) -> tuple[np.ndarray, np.ndarray]:
+    """Searches one shard in a worker process."""
+    return search_index(_worker_indexes[shard], queries, k, allowed_ids)
+
+
+class ShardedIndex:
+    """
+    Fans searches out to the shards of an index in worker processes.
+
+    Args:
+        index_path (str): Path of the main FAISS index (the shard files sit next to it).
+        workers (int): Number of worker processes.
+        params (dict, optional): Runtime overrides ("nprobe", "ef_search") for every shard.
+        mmap (bool): Memory-map the shard files in the workers.
+    """
+
+    def __init__(self, index_path: str, workers: int, params: dict | None = None, mmap: bool = True):
+        self.layout = read_shard_layout(index_path)
+        if self.layout is None:
+            raise FileNotFoundError(f"No shard layout found for {index_path}")
+        self.shard_of = np.load(shard_assignment_path(index_path), mmap_mode="r")
+        self.shards = [shard for shard, info in enumerate(self.layout["shards"]) if info["ntotal"]]
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(index_path, self.layout, params or {}, mmap),
+        )
+
+    def search(self, queries: np.ndarray, k: int,
+               allowed_ids: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Searches all shards in parallel and merges their top-k lists.
+
+        Args:
+            queries (np.ndarray): float32 query matrix (normalized).
+            k (int): Number of results per query.
+            allowed_ids (np.ndarray, optional): Sorted chunk IDs the search is restricted to;
+                each shard only receives its own IDs, and shards without any are skipped.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Scores and chunk IDs, shape (n_queries, k).
+        """
+        tasks = []
+        for shard in self.shards:
+            ids = None
+            if allowed_ids is not None:
+                ids = allowed_ids[self.shard_of[allowed_ids] == shard]
+                if not len(ids):
+                    continue
+            tasks.append(self.pool.submit(_search_shard, shard, queries, k, ids))
+        if not tasks:
+            return (np.full((len(queries), k), -np.inf, dtype="float32"),
+                    np.full((len(queries), k), -1, dtype="int64"))
+        return merge_topk([task.result() for task in tasks], k)
+
+    def close(self):
+        """Stops the worker processes."""
+        self.pool.shutdown()
@@ -0,0 +1,296 @@
+# utils/tracing.py
+
+"""
+Module: tracing
+---------------
+Lightweight spans for the stages of a query, with a JSONL and a
+Prometheus-style exporter.
+
+Spans recorded by the search and answer code:
+- route:            structured query matching (routed, columns, rows of a routed query)
+- embed:            query embedding (attributes: cache_hits, cache_misses)
+- ann_search:       FAISS search, including exact rescoring (path: index / brute_force / selector /
+                    shards / range / range_selector)
+- lexical_search:   BM25 search
+- metadata_lookup:  materializing hit rows from the Arrow metadata
+- rerank:           second-stage reranker (cache_hits / cache_misses: pairs served from
+                    the pair cache / scored by the model)
+- prompt_build:     context packing and formatting (prompt_tokens, used / duplicates / dropped chunks)
+- answer_cache:     semantic answer cache lookup (cache_hits / cache_misses)
+- llm_call:         chat completion (tokens_in, tokens_out - counted locally when the response
+                    carries no usage -, ttft for streamed answers)
+
+Spans opened inside `trace(...)` are collected into that trace (also across
+`asyncio.to_thread` workers, which copy the context). Every span, traced or
+not, updates the process-wide metrics: a latency histogram per span plus
+counters of errors, tokens and cache lookups, taken from the attributes
+named above.
+
+Exporters:
+- JSONL: with TRACE_FILE set, every finished trace is appended as one line.
+- Prometheus: `prometheus_text()` renders the metrics in the text exposition
+  format; `start_metrics_server(port)` serves it at /metrics (METRICS_PORT).
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.config import TRACE_FILE, TRACING_ENABLED
+
+# Histogram bucket bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Span attributes aggregated into counters: attribute -> (metric, label name, label value)
+_COUNTED_ATTRIBUTES = {
+    "tokens_in": ("smart_search_tokens_total", "direction", "in"),
+    "tokens_out": ("smart_search_tokens_total", "direction", "out"),
+    "cache_hits": ("smart_search_cache_lookups_total", "result", "hit"),
+    "cache_misses": ("smart_search_cache_lookups_total", "result", "miss"),
+}
+
+
+@dataclass
+class Span:
+    """
+    One timed operation.
+
+    Attributes:
+        name (str): Span name (see the module docstring).
+        start (float): `time.perf_counter()` at the start.
+        seconds (float | None): Duration, set when the span ends.
+        attributes (dict): Counts and labels recorded by the instrumented code.
+    """
+    name: str
+    start: float
+    seconds: float | None = None
+    attributes: dict = field(default_factory=dict)
+
+    def set(self, **attributes):
+        """Adds or overwrites attributes."""
+        self.attributes.update(attributes)
+
+
+@dataclass
+class Trace:
+    """
+    The spans of one request.
+
+    Attributes:
+        name (str): Trace name, e.g. "query".
+        trace_id (str): Random hex ID.
+        started_at (float): Wall-clock start (UNIX time).
+        start (float): `time.perf_counter()` at the start.
+        attributes (dict): Request attributes (query, mode, ...).
+        spans (list[Span]): Finished spans in completion order.
+        seconds (float | None): Duration, set when the trace ends.
+    """
+    name: str
+    trace_id: str
+    started_at: float
+    start: float
+    attributes: dict = field(default_factory=dict)
+    spans: list = field(default_factory=list)
+    seconds: float | None = None
+
+    def stage_seconds(self) -> dict[str, float]:
+        """Total seconds spent per span name."""
+        totals = defaultdict(float)
+        for span in self.spans:
+            totals[span.name] += span.seconds
+        return dict(totals)
+
+    def to_dict(self) -> dict:
+        """JSON-serializable form; span offsets are seconds since the trace start."""
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            "attributes": self.attributes,
+            "spans": [
+                {"name": s.name, "offset": s.start - self.start, "seconds": s.seconds, "attributes": s.attributes}
+                for s in self.spans
+            ],
+        }
+
+
+class Metrics:
+    """Thread-safe latency histograms and counters, rendered in Prometheus text format."""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = {}            # span -> [bucket counts..., +Inf count, sum]
+        self._counters = defaultdict(float)  # (metric, ((label, value), ...)) -> value
+
+    def observe(self, span: Span, error: bool = False):
+        """Records a finished span."""
+        with self._lock:
+            histogram = self._histograms.setdefault(span.name, [0] * (len(self.buckets) + 1) + [0.0])
+            for i, bound in enumerate(self.buckets):
+                if span.seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += span.seconds
+            if error:
+                self._counters[("smart_search_span_errors_total", (("span", span.name),))] += 1
+            for attribute, (metric, label, value) in _COUNTED_ATTRIBUTES.items():
+                amount = span.attributes.get(attribute)
+                if amount:
+                    self._counters[(metric, (("span", span.name), (label, value)))] += amount
+
+    def render(self) -> str:
+        """Returns all metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP smart_search_span_seconds Duration of query stages.",
+            "# TYPE smart_search_span_seconds histogram",
+        ]
+        with self._lock:
+            for name, histogram in sorted(self._histograms.items()):
+                for bound, count in zip(self.buckets, histogram):
+                    lines.append(f'smart_search_span_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+                lines.append(f'smart_search_span_seconds_bucket{{span="{name}",le="+Inf"}} {histogram[-2]}')
+                lines.append(f'smart_search_span_seconds_sum{{span="{name}"}} {histogram[-1]:.6f}')
+                lines.append(f'smart_search_span_seconds_count{{span="{name}"}} {histogram[-2]}')
+
+            previous = None
+            for (metric, labels), value in sorted(self._counters.items()):
+                if metric != previous:
+                    lines.append(f"# TYPE {metric} counter")
+                    previous = metric
+                rendered = ",".join(f'{label}="{v}"' for label, v in labels)
+                lines.append(f"{metric}{{{rendered}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+# Most recent finished traces of this process, newest last
+recent_traces = deque(maxlen=100)
+
+_current_trace = contextvars.ContextVar("smart_search_trace", default=None)
+_export_lock = threading.Lock()
+_metrics_server = None
+
+
+def current_trace() -> Trace | None:
+    """Returns the trace of the current context, if any."""
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Times a block as a span; yields the `Span` so the block can add attributes.
+
+    Args:
+        name (str): Span name.
+        **attributes: Initial attributes.
+    """
+    current = Span(name, time.perf_counter(), attributes=dict(attributes))
+    error = False
+    try:
+        yield current
+    except BaseException as e:
+        error = not isinstance(e, GeneratorExit)
+        if error:
+            current.set(error=type(e).__name__)
+        raise
+    finally:
+        current.seconds = time.perf_counter() - current.start
+        if TRACING_ENABLED:
+            metrics.observe(current, error=error)
+            active = _current_trace.get()
+            if active is not None:
+                active.spans.append(current)
+
+
+@contextmanager
+def trace(name: str, **attributes):
+    """
+    Collects the spans of one request into a `Trace`; yields the trace.
+
+    Nested calls join the enclosing trace. When the outermost block ends, the
+    trace is kept in `recent_traces` and appended to TRACE_FILE (if set).
+
+    Args:
+        name (str): Trace name.
+        **attributes: Request attributes (must be JSON-serializable).
+    """
+    enclosing = _current_trace.get()
+    if enclosing is not None:
+        enclosing.attributes.update(attributes)
+        yield enclosing
+        return
+
+    current = Trace(name, uuid.uuid4().hex, time.time(), time.perf_counter(), dict(attributes))
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+        current.seconds = time.perf_counter() - current.start
+        if TRACING_ENABLED:
+            recent_traces.append(current)
+            if TRACE_FILE:
+                export_jsonl(current, TRACE_FILE)
+
+
+def export_jsonl(finished: Trace, path: str):
+    """Appends a finished trace to a JSONL file."""
+    line = json.dumps(finished.to_dict(), default=str)
+    with _export_lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def prometheus_text() -> str:
+    """Returns the process metrics in the Prometheus text exposition format."""
+    return metrics.render()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves `prometheus_text()` at /metrics."""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Serves the metrics at http://host:port/metrics from a daemon thread.
+
+    Only one server is started per process; later calls return it.
+
+    Args:
+        port (int): TCP port.
+        host (str): Interface to bind.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    global _metrics_server
+    if _metrics_server is None:
+        _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _metrics_server
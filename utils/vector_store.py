@@ -0,0 +1,114 @@
+# utils/vector_store.py
+
+"""
+Module: vector_store
+--------------------
+Content-addressed cache of chunk embeddings used by the index build.
+
+Every TextChunk is identified by a hash of its text, and its embedding is
+kept under that hash in a persistent `.npz` file. Rebuilding the index then
+only needs embedding calls for text that has never been embedded before.
+
+A store belongs to one embedding backend (its `identity`); loading it for a
+different backend starts an empty store, so vector spaces are never mixed.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+
+def chunk_hash(text: str) -> str:
+    """
+    Computes the content hash used to identify a text chunk.
+
+    Args:
+        text (str): The chunk text.
+
+    Returns:
+        str: 16-character hexadecimal digest.
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class VectorStore:
+    """
+    Persistent mapping of chunk hash -> embedding vector.
+
+    Vectors are held in one contiguous float32 matrix with a hash -> row
+    lookup table, and saved as an uncompressed `.npz` archive.
+    """
+
+    def __init__(self, hashes: np.ndarray | None = None, vectors: np.ndarray | None = None,
+                 identity: str = ""):
+        self.hashes = list(hashes) if hashes is not None else []
+        self.vectors = vectors
+        self.identity = identity
+        self._rows = {h: i for i, h in enumerate(self.hashes)}
+
+    @classmethod
+    def load(cls, path: str, identity: str = "", accept_legacy: bool = True) -> "VectorStore":
+        """
+        Loads the store from `path`.
+
+        Args:
+            path (str): `.npz` file.
+            identity (str): Identity of the embedding backend that will use the store.
+            accept_legacy (bool): Accept stores saved before identities were recorded.
+
+        Returns:
+            VectorStore: The stored vectors, or an empty store if the file does not exist
+            or belongs to another backend.
+        """
+        if not path or not os.path.exists(path):
+            return cls(identity=identity)
+        with np.load(path) as data:
+            stored = str(data["identity"]) if "identity" in data else None
+            if stored != identity and not (stored is None and accept_legacy):
+                return cls(identity=identity)
+            return cls(data["hashes"].astype(str), data["vectors"], identity)
+
+    def save(self, path: str):
+        """Writes the store to `path`."""
+        np.savez(path, hashes=np.array(self.hashes, dtype="U16"), vectors=self.vectors,
+                 identity=np.array(self.identity))
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def __contains__(self, h: str) -> bool:
+        return h in self._rows
+
+    def get_many(self, hashes: list[str]) -> np.ndarray:
+        """
+        Returns the stored vectors for the given hashes (all must be present).
+
+        Args:
+            hashes (list[str]): Chunk hashes to look up.
+
+        Returns:
+            np.ndarray: float32 matrix with one row per hash.
+        """
+        return self.vectors[[self._rows[h] for h in hashes]]
+
+    def add(self, hashes: list[str], vectors: np.ndarray):
+        """
+        Adds vectors for hashes that are not stored yet.
+
+        Args:
+            hashes (list[str]): Chunk hashes, one per vector row.
+            vectors (np.ndarray): float32 matrix of embeddings.
+        """
+        new, seen = [], set()
+        for i, h in enumerate(hashes):
+            if h not in self._rows and h not in seen:
+                seen.add(h)
+                new.append(i)
+        if not new:
+            return
+        vectors = np.asarray(vectors, dtype="float32")[new]
+        self.vectors = vectors if self.vectors is None else np.vstack([self.vectors, vectors])
+        for i in new:
+            self._rows[hashes[i]] = len(self.hashes)
+            self.hashes.append(hashes[i])